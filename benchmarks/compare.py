@@ -0,0 +1,52 @@
+"""Compares two result files of `benchmarks.suite` and flags regressions
+
+Run with `python -m benchmarks.compare OLD.json NEW.json [--threshold 0.1]`.
+A case regressed when its median time per operation grew by more than the
+threshold, the exit status is 1 if any case did.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def load_results(path: Path) -> dict[str, dict]:
+    return json.loads(path.read_text())["results"]
+
+
+def compare(old: dict[str, dict], new: dict[str, dict], threshold: float) -> list[str]:
+    """Prints a table of both runs and returns the names of the regressed cases"""
+    regressions: list[str] = []
+    print(f"{'case':>22}  {'old us/op':>12}  {'new us/op':>12}  {'change':>8}")
+    for name in sorted(old.keys() | new.keys()):
+        if name not in old or name not in new:
+            print(f"{name:>22}  {'only in ' + ('old' if name in old else 'new'):>36}")
+            continue
+        before: float = old[name]["median"]
+        after: float = new[name]["median"]
+        change: float = after / before - 1 if before else 0.0
+        flag: str = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:>22}  {before * 1e6:12.1f}  {after * 1e6:12.1f}  {change:+8.1%}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="benchmarks.compare", description="flag regressions between two runs")
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown, 0.1 is 10%%")
+    args = parser.parse_args()
+
+    regressions: list[str] = compare(load_results(args.old), load_results(args.new), args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
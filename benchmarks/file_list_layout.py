@@ -0,0 +1,62 @@
+"""Frame cost of the file list column for growing file lists
+
+Run with `python -m benchmarks.file_list_layout`.
+"""
+import time
+from pathlib import Path
+
+from image_sorter.ext.file_index import FileIndex
+from image_sorter.gui.layout import FileListLayout
+
+
+VISIBLE_ROWS = 60
+FRAMES = 200
+
+
+def build_index(num_files: int) -> FileIndex:
+    index = FileIndex("/nonexistent")
+    for i in range(num_files):
+        index.append(Path(f"/nonexistent/IMG_{i:08d}.jpg"))
+    return index
+
+
+def naive_frame(labels: list[str], scroll_pos: int) -> list[str]:
+    """The previous per-row layout computation over a list of labels, kept for comparison"""
+    lines: list[str] = []
+    for i in range(min(VISIBLE_ROWS, len(labels) - scroll_pos)):
+        file_index: int = scroll_pos + i
+        file_index_length: int = len(str(len(labels)))
+        max_line_length: int = max(len(f) for f in labels)
+        lines.append(f"{file_index:>{file_index_length}}  {labels[file_index]:<{max_line_length}}")
+    return lines
+
+
+def time_frames(render, files, remove, frames: int) -> float:
+    """Returns the mean frame time in microseconds while scrolling and moving files"""
+    start: float = time.perf_counter()
+    for frame in range(frames):
+        if frame % 10 == 0:
+            remove(len(files) // 2)  # a move invalidates the layout
+        render(files, (frame * 7) % (len(files) - VISIBLE_ROWS))
+    return (time.perf_counter() - start) / frames * 1e6
+
+
+def main() -> None:
+    print(f"{'files':>10}  {'cached (us/frame)':>18}  {'naive (us/frame)':>17}")
+    for num_files in (1_000, 10_000, 100_000, 1_000_000):
+        index: FileIndex = build_index(num_files)
+        layout = FileListLayout(index)
+
+        cached: float = time_frames(
+            lambda _, pos: layout.rows(pos, VISIBLE_ROWS), index, index.remove, FRAMES
+        )
+        naive: str = "-"
+        if num_files <= 10_000:
+            labels: list[str] = [index.label(i) for i in range(len(index))]
+            naive = f"{time_frames(naive_frame, labels, labels.pop, 20):.1f}"
+
+        print(f"{num_files:>10}  {cached:>18.1f}  {naive:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Memory used per file by the file list representations
+
+Run with `python -m benchmarks.file_store_memory [NUM_FILES]`.
+"""
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from image_sorter.ext.file_index import FileIndex
+from image_sorter.ext.get_files import format_file_name
+
+
+def synthetic_paths(num_files: int) -> list[str]:
+    """Paths spread over a few hundred directories, like a sorted photo inbox"""
+    return [
+        f"/data/inbox/{i % 300:03d}/camera_roll/IMG_{i:08d}.jpg"
+        for i in range(num_files)
+    ]
+
+
+def measure(build, *args) -> tuple[int, float]:
+    """Returns the bytes retained by the object built by `build` and the build time"""
+    tracemalloc.start()
+    start: float = time.perf_counter()
+    retained = build(*args)
+    elapsed: float = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del retained
+    return size, elapsed
+
+
+def build_lists(paths: list[str]):
+    """The previous representation: parallel lists of paths and labels plus a lookup set"""
+    raw_files: list[Path] = [Path(p) for p in paths]
+    files: list[str] = [format_file_name(f) for f in raw_files]
+    known: set[Path] = set(raw_files)
+    return raw_files, files, known
+
+
+def build_index(paths: list[str]):
+    """The scanner hands out transient `Path` objects, only the index is retained"""
+    index = FileIndex("/data/inbox")
+    index.extend(Path(p) for p in paths)
+    return index
+
+
+def main() -> None:
+    num_files: int = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    paths: list[str] = synthetic_paths(num_files)
+
+    print(f"{num_files} files")
+    for name, build, args in (
+        ("lists", build_lists, paths),
+        ("FileIndex", build_index, paths),
+    ):
+        size, elapsed = measure(build, args)
+        print(f"{name:>10}: {size / num_files:7.1f} bytes/file  {size / 2**20:8.1f} MiB  {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Synthetic image trees for the benchmarks
+
+Run with `python -m benchmarks.generate DIR [--files N] [--depth D] [--fanout F]
+[--size BYTES] [--formats png,jpg,...]`.
+
+Files carry a valid header of their format, so header parsing and format
+detection see realistic input, and are padded with random bytes to `size`.
+"""
+import argparse
+import os
+import random
+import struct
+import zlib
+from pathlib import Path
+
+
+FORMATS = ("png", "jpg", "tiff", "bmp")
+
+
+def png_header(width: int, height: int) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+
+def jpeg_header(width: int, height: int) -> bytes:
+    frame: bytes = struct.pack(">BHHB", 8, height, width, 3) + b"\x01\x22\x00\x02\x11\x01\x03\x11\x01"
+    return b"\xff\xd8" + b"\xff\xc0" + struct.pack(">H", len(frame) + 2) + frame
+
+
+def tiff_header(width: int, height: int) -> bytes:
+    entries: bytes = struct.pack("<HHII", 0x0100, 4, 1, width) + struct.pack("<HHII", 0x0101, 4, 1, height)
+    return b"II*\x00" + struct.pack("<I", 8) + struct.pack("<H", 2) + entries + struct.pack("<I", 0)
+
+
+def bmp_header(width: int, height: int) -> bytes:
+    return b"BM" + struct.pack("<IHHI", 0, 0, 0, 54) + struct.pack("<IiiHH", 40, width, height, 1, 24) + bytes(24)
+
+
+HEADERS = {"png": png_header, "jpg": jpeg_header, "tiff": tiff_header, "bmp": bmp_header}
+
+
+def tree_directories(root: Path, depth: int, fanout: int) -> list[Path]:
+    """Returns the root and every directory of a tree with `fanout` children per level"""
+    directories: list[Path] = [root]
+    level: list[Path] = [root]
+    for _ in range(depth):
+        level = [parent / f"dir_{i:02d}" for parent in level for i in range(fanout)]
+        directories.extend(level)
+    return directories
+
+
+def generate_tree(
+    root: Path,
+    files: int = 1000,
+    depth: int = 0,
+    fanout: int = 3,
+    size: int = 16 * 1024,
+    formats: tuple[str, ...] = FORMATS,
+    seed: int = 0,
+) -> list[Path]:
+    """Writes `files` images spread evenly over a directory tree and returns their paths"""
+    rng = random.Random(seed)
+    directories: list[Path] = tree_directories(root, depth, fanout)
+    for directory in directories:
+        directory.mkdir(parents=True, exist_ok=True)
+
+    padding: bytes = rng.randbytes(size)
+    paths: list[Path] = []
+    for i in range(files):
+        file_format: str = formats[i % len(formats)]
+        path: Path = directories[i % len(directories)] / f"IMG_{i:06d}.{file_format}"
+        header: bytes = HEADERS[file_format](rng.randint(640, 6000), rng.randint(480, 4000))
+        with open(path, "wb") as f:
+            f.write(header)
+            f.write(padding[:max(0, size - len(header))])
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="benchmarks.generate", description="write a synthetic image tree")
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=0, help="levels of subdirectories")
+    parser.add_argument("--fanout", type=int, default=3, help="subdirectories per directory")
+    parser.add_argument("--size", type=int, default=16 * 1024, help="bytes per file")
+    parser.add_argument("--formats", type=str, default=",".join(FORMATS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    formats: tuple[str, ...] = tuple(f.strip().lower() for f in args.formats.split(","))
+    unknown: set[str] = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"unknown formats {', '.join(sorted(unknown))}, expected {', '.join(FORMATS)}")
+
+    paths: list[Path] = generate_tree(
+        args.directory, args.files, args.depth, args.fanout, args.size, formats, args.seed
+    )
+    total: int = sum(os.path.getsize(p) for p in paths)
+    print(f"Wrote {len(paths)} files ({total / 2**20:.1f} MiB) to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
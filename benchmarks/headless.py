@@ -0,0 +1,28 @@
+"""An `ImageSorter` running against a virtual curses screen, for benchmarks
+
+Kitty output goes to a byte buffer.
+"""
+import contextlib
+import io
+
+from image_sorter.ext.parser import configure_parser
+from image_sorter.gui.input import ReplayInput
+from image_sorter.gui.virtual_screen import virtual_curses
+
+
+def parse_args(*argv: str):
+    return configure_parser().parse_args(list(argv))
+
+
+@contextlib.contextmanager
+def headless_sorter(*argv: str, height: int = 40, width: int = 160):
+    """Yields an `ImageSorter` for the command line `argv`, its files are not loaded yet"""
+    from main import ImageSorter  # the entry point module lives in the repository root
+
+    terminal = io.TextIOWrapper(io.BytesIO())
+    with virtual_curses(height, width) as stdscr, contextlib.redirect_stdout(terminal):
+        app = ImageSorter(stdscr, parse_args(*argv), keys=ReplayInput(()))
+        try:
+            yield app
+        finally:
+            app.close()
@@ -0,0 +1,226 @@
+"""Benchmarks of the sorter's hot paths on a synthetic image tree
+
+Run with `python -m benchmarks.suite [--files N] [--depth D] [--repeat R]
+[--only NAME] [--output results.json]` and compare two runs with
+`python -m benchmarks.compare old.json new.json`.
+
+Every case reports the seconds per operation of each repetition. The suite
+runs with HOME pointed at its scratch directory, so the journal, the caches
+and the logs of the user are never touched.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+
+Samples = tuple[list[float], int]  # seconds of each repetition, operations per repetition
+
+
+def sample(run: Callable[[], object], repeat: int, ops: int = 1, setup: Callable[[], object] | None = None) -> Samples:
+    """Times `run` `repeat` times, `setup` runs untimed before every repetition"""
+    seconds: list[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start: float = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+    return seconds, ops
+
+
+class Workspace:
+    """The synthetic trees and output directories shared by the cases"""
+
+    def __init__(self, root: Path, files: int, depth: int, size: int):
+        from benchmarks.generate import generate_tree
+
+        self.root = root
+        self.files = files
+        self.flat: Path = root / "flat"
+        self.tree: Path = root / "tree"
+        self.depth = depth
+        self.outputs: list[Path] = [root / "out" / f"target_{i}" for i in range(1, 11)]
+        for output in self.outputs:
+            output.mkdir(parents=True)
+        self.flat_paths: list[Path] = generate_tree(self.flat, files, 0, size=size)
+        generate_tree(self.tree, files, depth, size=size)
+
+    def argv(self, directory: Path, *extra: str) -> list[str]:
+        return ["-i", str(directory), "-o", *map(str, self.outputs), "--log-level", "off", *extra]
+
+
+def settle(app) -> None:
+    """Waits for the queued file operations and runs their completion callbacks"""
+    while app.operations.pending:
+        time.sleep(0.001)
+    app.loop.call_soon_threadsafe(lambda: None)  # run_once never blocks with a pending wakeup
+    app.loop.run_once()
+
+
+def bench_get_files(ws: Workspace, repeat: int) -> Samples:
+    from image_sorter.ext import get_files
+    return sample(lambda: get_files(str(ws.flat)), repeat)
+
+
+def bench_load_files_flat(ws: Workspace, repeat: int) -> Samples:
+    from benchmarks.headless import headless_sorter
+    with headless_sorter(*ws.argv(ws.flat)) as app:
+        return sample(app.load_files, repeat)
+
+
+def bench_load_files_tree(ws: Workspace, repeat: int) -> Samples:
+    from benchmarks.headless import headless_sorter
+    with headless_sorter(*ws.argv(ws.tree, "--tree", "--depth", str(ws.depth))) as app:
+        return sample(app.load_files, repeat)
+
+
+def bench_format_directories(ws: Workspace, repeat: int) -> Samples:
+    from image_sorter.ext import format_directories
+    dirs: list[str] = [f"/home/user/pictures/sorted/{year}/{month:02d}" for year in range(2000, 2030) for month in range(1, 13)]
+    return sample(lambda: [format_directories(dirs) for _ in range(100)], repeat, ops=100)
+
+
+def bench_next_filename(ws: Workspace, repeat: int) -> Samples:
+    from image_sorter.keybinding_actions.move import get_next_available_filename
+    target: Path = ws.root / "numbered"
+    target.mkdir(exist_ok=True)
+    for i in range(1, 2001):
+        (target / f"{i}.jpg").touch()
+    return sample(lambda: [get_next_available_filename(target) for _ in range(1000)], repeat, ops=1000)
+
+
+def bench_next_filename_cold(ws: Workspace, repeat: int) -> Samples:
+    """Every lookup scans the directory, like the first move into a target"""
+    from image_sorter.keybinding_actions import move
+    target: Path = ws.root / "numbered"
+
+    def run() -> None:
+        for _ in range(20):
+            move._allocators.clear()
+            move.get_next_available_filename(target)
+    return sample(run, repeat, ops=20, setup=lambda: bench_next_filename(ws, 0))
+
+
+def bench_move_file(ws: Workspace, repeat: int, copy_mode: bool) -> Samples:
+    from image_sorter.keybinding_actions import move_file
+    source: Path = ws.root / "moves"
+    target: Path = ws.outputs[0]
+
+    def setup() -> None:
+        shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(ws.flat, source)
+        target.mkdir()
+
+    def run() -> None:
+        for file_path in sorted(source.iterdir()):
+            move_file(file_path, str(target), 0, copy_mode)
+    return sample(run, repeat, ops=ws.files, setup=setup)
+
+
+def bench_keypress(ws: Workspace, repeat: int, keys: list[int], reset: bool) -> Samples:
+    """Replays keys through `handle_keypress` and a frame, like the event loop does"""
+    from benchmarks.headless import headless_sorter
+    source: Path = ws.root / "keys"
+    shutil.rmtree(source, ignore_errors=True)
+    shutil.copytree(ws.flat, source)
+
+    with headless_sorter(*ws.argv(source)) as app:
+        def setup() -> None:
+            settle(app)
+            if reset:  # bring the moved files back for the next repetition
+                for output in ws.outputs:
+                    for file_path in output.iterdir():
+                        file_path.rename(source / file_path.name)
+            app.load_files()
+            app.selected_item_pos = 0
+            app.draw()
+
+        def run() -> None:
+            for key in keys:
+                app.handle_keypress(key)
+                app.draw()
+
+        samples: Samples = sample(run, repeat, ops=len(keys), setup=setup)
+        settle(app)
+        return samples
+
+
+CASES: dict[str, Callable[[Workspace, int], Samples]] = {
+    "get_files.flat": bench_get_files,
+    "load_files.flat": bench_load_files_flat,
+    "load_files.tree": bench_load_files_tree,
+    "format_directories": bench_format_directories,
+    "next_filename.cached": bench_next_filename,
+    "next_filename.cold": bench_next_filename_cold,
+    "move_file.move": lambda ws, r: bench_move_file(ws, r, copy_mode=False),
+    "move_file.copy": lambda ws, r: bench_move_file(ws, r, copy_mode=True),
+    "keypress.navigate": lambda ws, r: bench_keypress(ws, r, [ord("j")] * 200 + [ord("k")] * 200, reset=False),
+    "keypress.move": lambda ws, r: bench_keypress(ws, r, [ord("1")] * min(200, ws.files), reset=True),
+}
+
+
+def summarize(samples: Samples) -> dict:
+    seconds, ops = samples
+    per_op: list[float] = [s / ops for s in seconds]
+    return {
+        "ops": ops,
+        "repeat": len(seconds),
+        "min": min(per_op),
+        "median": statistics.median(per_op),
+        "mean": statistics.fmean(per_op),
+        "stdev": statistics.stdev(per_op) if len(per_op) > 1 else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="benchmarks.suite", description="time the hot paths of the sorter")
+    parser.add_argument("--files", type=int, default=2000, help="files in each synthetic tree")
+    parser.add_argument("--depth", type=int, default=2, help="levels of the nested tree")
+    parser.add_argument("--size", type=int, default=16 * 1024, help="bytes per file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", type=str, action="append", metavar="NAME", help="run only cases starting with NAME")
+    parser.add_argument("--output", type=str, default=None, help="write the JSON results to a file instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="image_sorter-bench-") as tmp:
+        root: Path = Path(tmp)
+        os.environ["HOME"] = str(root / "home")  # read when the sorter modules are imported
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+        ws = Workspace(root, args.files, args.depth, args.size)
+        results: dict[str, dict] = {}
+        for name, case in CASES.items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            results[name] = summarize(case(ws, args.repeat))
+            print(f"{name:>22}: {results[name]['median'] * 1e6:12.1f} us/op", file=sys.stderr)
+
+    report: dict = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "files": args.files,
+            "depth": args.depth,
+            "size": args.size,
+        },
+        "results": results,
+    }
+    output: str = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
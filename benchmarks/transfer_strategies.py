@@ -0,0 +1,94 @@
+"""Throughput of the ways `move_file` can get a file into a target directory
+
+Run with `python -m benchmarks.transfer_strategies [SOURCE_DIR [TARGET_DIR]]`.
+Both directories default to a temporary directory; pass a target on another
+file system to measure the copies a move across devices needs.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from image_sorter.keybinding_actions.transfer import COPIERS
+
+
+FILE_SIZES = (256 * 1024, 8 * 1024 * 1024, 64 * 1024 * 1024)
+TOTAL_BYTES = 256 * 1024 * 1024  # data moved per size and strategy
+
+
+def create_files(directory: Path, size: int, count: int) -> list[Path]:
+    block: bytes = os.urandom(min(size, 1024 * 1024))
+    paths: list[Path] = []
+    for i in range(count):
+        path: Path = directory / f"src_{size}_{i}.jpg"
+        with open(path, "wb") as f:
+            for _ in range(size // len(block)):
+                f.write(block)
+        paths.append(path)
+    return paths
+
+
+def run(transfer, sources: list[Path], target: Path) -> float | None:
+    """Returns the seconds `transfer(source, destination)` took for all files, None if unsupported"""
+    os.sync()
+    start: float = time.perf_counter()
+    try:
+        for source in sources:
+            transfer(source, target / source.name)
+        os.sync()  # copies are only done once the data reached the disk
+    except OSError:
+        return None
+    return time.perf_counter() - start
+
+
+def forced(method: str):
+    """A copy that always uses one method instead of falling back like `TransferStrategy`"""
+    copier = COPIERS[method]
+
+    def copy(source: Path, destination: Path) -> None:
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            copier(src.fileno(), dst.fileno(), os.fstat(src.fileno()).st_size)
+    return copy
+
+
+def strategies(same_device: bool) -> dict:
+    transfers: dict = {"shutil.copy2": shutil.copy2}
+    transfers.update({method: forced(method) for method in COPIERS})
+    if same_device:
+        transfers["link"] = os.link
+        transfers["rename"] = os.rename
+    return transfers
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir: Path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(tmp) / "source"
+        target_root: Path = Path(sys.argv[2]) if len(sys.argv) > 2 else Path(tmp) / "target"
+        source_dir.mkdir(parents=True, exist_ok=True)
+        target_root.mkdir(parents=True, exist_ok=True)
+        same_device: bool = os.stat(source_dir).st_dev == os.stat(target_root).st_dev
+        print(f"{source_dir} -> {target_root} ({'same device' if same_device else 'across devices'})")
+
+        for size in FILE_SIZES:
+            count: int = max(1, TOTAL_BYTES // size)
+            print(f"\n{count} files of {size / 2**20:g} MiB")
+            for name, transfer in strategies(same_device).items():
+                sources: list[Path] = create_files(source_dir, size, count)
+                target: Path = Path(tempfile.mkdtemp(dir=target_root))
+                elapsed: float | None = run(transfer, sources, target)
+                if elapsed is None:
+                    print(f"{name:>16}: unsupported")
+                else:
+                    print(
+                        f"{name:>16}: {count / elapsed:9.1f} files/s  "
+                        f"{count * size / 2**20 / elapsed:9.1f} MB/s"
+                    )
+                for path in sources:
+                    path.unlink(missing_ok=True)
+                shutil.rmtree(target)
+
+
+if __name__ == "__main__":
+    main()
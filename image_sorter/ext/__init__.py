@@ -1,10 +1,13 @@
+from .file_index import FileIndex
 from .format_dirs import format_directories
-from .get_files import get_files
+from .get_files import get_files, iter_files
 from .validation import validate_args
 
 
 __all__ = [
+    "FileIndex",
     "format_directories",
     "get_files",
+    "iter_files",
     "validate_args",
 ]
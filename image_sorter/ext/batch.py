@@ -0,0 +1,264 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from argparse import Namespace
+from pathlib import Path
+
+from image_sorter.ext.catalog import Catalog
+from image_sorter.ext.file_index import FileIndex
+from image_sorter.ext.loggers import Logger
+from image_sorter.ext.metadata import Metadata, MetadataCache, MetadataLoader
+from image_sorter.ext.paths import DATA_DIR
+from image_sorter.ext.rules import Rule, load_rules, match_rules
+from image_sorter.keybinding_actions import Journal, Operation, OperationQueue, move_file
+
+
+BATCH_DIR: Path = DATA_DIR / "batch"
+
+
+class BatchProgress:
+    """Source files already sorted by a batch run, so an interrupted run can resume
+
+    The progress file is named after the input directory and the rules, it is
+    appended one path per line and removed once a run completes.
+    """
+
+    def __init__(self, input_dir: str, rules_file: str):
+        digest = hashlib.blake2b(digest_size=12)
+        digest.update(os.fsencode(os.path.abspath(input_dir)) + b"\0")
+        digest.update(Path(rules_file).read_bytes())
+        self.path: Path = BATCH_DIR / f"{digest.hexdigest()}.progress"
+        self.done: set[str] = set()
+        self._lock = threading.Lock()
+        self._file = None
+
+        try:
+            with open(self.path, "r", encoding="utf-8", errors="surrogateescape") as f:
+                self.done = {line.rstrip("\n") for line in f}
+        except FileNotFoundError:
+            pass
+
+    def __contains__(self, file_path: Path) -> bool:
+        return str(file_path) in self.done
+
+    def add(self, file_path: Path) -> None:
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", errors="surrogateescape")
+            self._file.write(f"{file_path}\n")
+            self._file.flush()  # survives a crash of the process, not of the machine
+
+    def close(self, completed: bool) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if completed:
+                self.path.unlink(missing_ok=True)
+
+
+class BatchStats:
+    """Counts sorted files and bytes for the throughput report"""
+
+    def __init__(self):
+        self.started: float = time.monotonic()
+        self.files: int = 0
+        self.bytes: int = 0
+        self.failed: int = 0
+        self.skipped: int = 0  # already sorted by an interrupted run
+
+    def record(self, size: int, failed: bool) -> None:
+        if failed:
+            self.failed += 1
+        else:
+            self.files += 1
+            self.bytes += size
+
+    def summary(self) -> str:
+        elapsed: float = max(time.monotonic() - self.started, 1e-6)
+        return (
+            f"{self.files} files, {self.bytes / 1024 ** 2:.1f} MB in {elapsed:.1f}s "
+            f"({self.files / elapsed:.1f} files/s, {self.bytes / 1024 ** 2 / elapsed:.1f} MB/s)"
+        )
+
+
+class BatchSorter:
+    """Sorts the files of the input directory by rules, without the curses interface
+
+    Files stream in from the scanner, their headers are read on the metadata
+    thread pool only when a rule needs them, and the matching moves run on an
+    `OperationQueue`. Files no rule matches are returned as leftovers.
+    """
+
+    REPORT_INTERVAL = 0.5  # seconds between progress lines
+
+    def __init__(self, args: Namespace, rules: list[Rule], logger: Logger | None = None):
+        self.args = args
+        self.rules = rules
+        self.logger = logger or Logger(level=args.log_level)
+        self.dry_run: bool = args.dry_run
+        self.catalog: Catalog | None = Catalog.open() if args.catalog else None
+        self.progress = BatchProgress(args.input_dir, args.batch)
+        self.stats = BatchStats()
+        self.leftovers: list[Path] = []
+        self.planned: dict[str, list[Path]] = {}
+        self.sizes: dict[Path, int] = {}
+        self.awaiting: set[Path] = set()  # files whose metadata has not arrived yet
+        self._lock = threading.Lock()
+        self._last_report: float = 0.0
+        self.interactive: bool = sys.stderr.isatty()  # progress lines are rewritten in place
+
+        self.journal: Journal | None = None if self.dry_run else Journal.open()
+        if self.journal is not None:
+            for message in self.journal.repair():
+                self.logger.log_message(message, "warning")
+        self.operations = OperationQueue(workers=args.batch_workers, on_done=self.on_operation_done)
+        self.metadata_loader: MetadataLoader | None = None
+        if any(rule.needs_metadata for rule in rules):
+            self.metadata_loader = MetadataLoader(
+                on_done=self.dispatch,
+                workers=args.batch_workers,
+                cache=MetadataCache.open()
+            )
+
+    def run(self) -> list[Path]:
+        """Sorts every file and returns the ones no rule matched"""
+        completed: bool = False
+        try:
+            index = FileIndex(
+                self.args.input_dir,
+                self.args.depth if self.args.tree else 0,
+                self.args.scan_workers,
+                scanner=self.catalog.scanner() if self.catalog is not None else None
+            )
+            for batch in index.iter_batches():
+                pending: list[Path] = [p for p in batch if p not in self.progress]
+                self.stats.skipped += len(batch) - len(pending)
+                if self.metadata_loader is not None:
+                    with self._lock:
+                        self.awaiting.update(pending)
+                    self.metadata_loader.request(pending)
+                else:
+                    self.dispatch([(file_path, None) for file_path in pending])
+
+            if self.metadata_loader is not None:
+                self.metadata_loader.shutdown()  # every file is matched before the last moves are awaited
+                self.metadata_loader = None
+            self.operations.shutdown()
+            completed = True
+        except KeyboardInterrupt:
+            if self.metadata_loader is not None:
+                self.metadata_loader.shutdown(cancel=True)
+                self.metadata_loader = None
+            self.operations.shutdown(cancel=True)
+            print("\nInterrupted, run the same command again to resume", file=sys.stderr)
+        finally:
+            if self.metadata_loader is not None:
+                self.metadata_loader.shutdown(cancel=True)
+            unread: int = self.collect_unread()
+            self.progress.close(completed and not self.dry_run and self.stats.failed == 0 and unread == 0)
+            if self.journal is not None:
+                self.journal.close()
+            if self.catalog is not None:
+                self.catalog.close()
+
+        self.report()
+        return sorted(self.leftovers)
+
+    def collect_unread(self) -> int:
+        """Leaves the files whose metadata never arrived for review and returns their number"""
+        unread: list[Path] = [p for p in self.awaiting if p.exists()]  # files that vanished need no review
+        self.awaiting.clear()
+        self.leftovers.extend(unread)
+        return len(unread)
+
+    def dispatch(self, results: list[tuple[Path, Metadata | None]]) -> None:
+        """Matches files against the rules and queues their moves, called from worker threads"""
+        if self.awaiting:
+            with self._lock:
+                self.awaiting.difference_update(file_path for file_path, _ in results)
+        for file_path, metadata in results:
+            rule: Rule | None = match_rules(self.rules, file_path, metadata)
+            if rule is None:
+                with self._lock:
+                    self.leftovers.append(file_path)
+                continue
+
+            if self.dry_run:
+                with self._lock:
+                    self.planned.setdefault(rule.target, []).append(file_path)
+                    self.sizes[file_path] = metadata.size if metadata is not None else file_size(file_path)
+                continue
+
+            with self._lock:
+                self.sizes[file_path] = metadata.size if metadata is not None else file_size(file_path)
+            target: str = str(Path(rule.target).resolve())
+            action: str = "link" if self.args.link else "copy" if self.args.copy_mode else "move"
+            move: tuple = (
+                move_file, file_path, rule.target, self.args.auto_rename, self.args.copy_mode, self.args.on_duplicate,
+                self.args.link
+            )
+            self.operations.submit(
+                Operation(action, file_path, target=target, keys=(file_path, os.path.join(target, file_path.name))),
+                *((self.journal.run, action, *move) if self.journal is not None else move)
+            )
+
+    def on_operation_done(self, operation: Operation) -> None:
+        self.logger.log_message(operation.message, operation.level)
+        if self.catalog is not None:
+            self.catalog.record_decision(
+                operation.action,
+                operation.file_path,
+                operation.target,
+                "failed" if operation.failed else "done",
+                operation.message
+            )
+        if not operation.failed:
+            self.progress.add(operation.file_path)
+        elif operation.file_path.exists():
+            with self._lock:
+                self.leftovers.append(operation.file_path)
+
+        with self._lock:
+            self.stats.record(self.sizes.pop(operation.file_path, 0), operation.failed)
+            now: float = time.monotonic()
+            if self.interactive and now - self._last_report >= self.REPORT_INTERVAL:
+                self._last_report = now
+                print(f"\r{self.stats.summary()}", end="", file=sys.stderr, flush=True)
+
+    def report(self) -> None:
+        if self.dry_run:
+            total: int = 0
+            for target, paths in sorted(self.planned.items()):
+                for file_path in sorted(paths):
+                    print(f"{file_path} -> {target}")
+                total += len(paths)
+            for target, paths in sorted(self.planned.items()):
+                size: int = sum(self.sizes.get(p, 0) for p in paths)
+                print(f"{len(paths):>8} files  {size / 1024 ** 2:>10.1f} MB  -> {target}")
+            print(f"Dry run: {total} files would be sorted, {len(self.leftovers)} left for review")
+            return
+
+        action: str = "Linked" if self.args.link else "Copied" if self.args.copy_mode else "Moved"
+        print(f"\r\033[K{action} {self.stats.summary()}" if self.interactive else f"{action} {self.stats.summary()}", file=sys.stderr)
+        details: list[str] = [f"{len(self.leftovers)} left for review"]
+        if self.stats.failed:
+            details.append(f"{self.stats.failed} failed")
+        if self.stats.skipped:
+            details.append(f"{self.stats.skipped} already sorted by an earlier run")
+        print(", ".join(details), file=sys.stderr)
+
+
+def file_size(file_path: Path) -> int:
+    try:
+        return file_path.stat().st_size
+    except OSError:
+        return 0
+
+
+def run_batch(args: Namespace) -> list[Path]:
+    """Sorts the input directory by the rules of --batch and returns the leftovers"""
+    return BatchSorter(args, load_rules(args.batch, args.output_dirs)).run()
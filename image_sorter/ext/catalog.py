@@ -0,0 +1,289 @@
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from image_sorter.ext.get_files import ALLOWED_EXTENSIONS, scan_directory
+from image_sorter.ext.paths import DATA_DIR
+
+
+CATALOG_DB: Path = DATA_DIR / "catalog.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER  -- NULL until the listing below can be trusted
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories(parent);
+
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    width INTEGER,
+    height INTEGER,
+    taken REAL,
+    thumbnail TEXT  -- key in the thumbnail store
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files(directory);
+
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    action TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT,
+    status TEXT NOT NULL,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS decisions_time ON decisions(time);
+CREATE INDEX IF NOT EXISTS decisions_target ON decisions(target, time);
+"""
+
+Job = Callable[[sqlite3.Connection], None]
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    # connections stay with one thread, but are closed by the thread closing the catalog
+    db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent, only the last commits may be lost on power loss
+    return db
+
+
+class CatalogWriter(threading.Thread):
+    """Background thread applying queued catalog writes in batched transactions
+
+    Jobs are committed together when `batch_size` jobs are queued or
+    `flush_interval` seconds passed, so the UI never waits for SQLite.
+    """
+
+    STOP = object()
+
+    def __init__(self, path: Path, batch_size: int = 512, flush_interval: float = 1.0):
+        super().__init__(name="image_sorter-catalog", daemon=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue()
+        self._jobs: list[Job] = []
+
+    def put(self, job: Job) -> None:
+        self.queue.put(job)
+
+    def run(self) -> None:
+        db: sqlite3.Connection = connect(self.path)
+        last_flush: float = time.monotonic()
+        try:
+            while True:
+                timeout: float = max(0.0, last_flush + self.flush_interval - time.monotonic())
+                try:
+                    job = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    job = None
+
+                if job is self.STOP:
+                    self.flush(db)
+                    return
+                if job is not None:
+                    self._jobs.append(job)
+
+                expired: bool = time.monotonic() - last_flush >= self.flush_interval
+                if len(self._jobs) >= self.batch_size or (expired and self._jobs):
+                    self.flush(db)
+                if expired or not self._jobs:
+                    last_flush = time.monotonic()
+        finally:
+            db.close()
+
+    def flush(self, db: sqlite3.Connection) -> None:
+        try:
+            with db:  # one transaction per batch
+                for job in self._jobs:
+                    job(db)
+        except sqlite3.Error:
+            pass  # the catalog is a cache of the file system, losing a batch is harmless
+        self._jobs.clear()
+
+    def stop(self) -> None:
+        if not self.is_alive():
+            return
+        self.queue.put(self.STOP)
+        self.join()
+
+
+class Catalog:
+    """SQLite catalog of directory listings, file metadata and sorting decisions
+
+    Listings are reused while the modification time of their directory is
+    unchanged, so a session only rescans the directories that changed. All
+    writes go through a `CatalogWriter`, reads use one connection per thread.
+    """
+
+    RACY_SECONDS = 2.0  # listings of directories modified this recently are not trusted
+
+    def __init__(self, path: Path = CATALOG_DB):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with connect(path) as db:
+            db.executescript(SCHEMA)
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self.writer = CatalogWriter(path)
+        self.writer.start()
+
+    @classmethod
+    def open(cls, *args):
+        """Returns the catalog or None if the database cannot be opened"""
+        try:
+            return cls(*args)
+        except (OSError, sqlite3.Error):
+            return None
+
+    def reader(self) -> sqlite3.Connection:
+        db: sqlite3.Connection | None = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = connect(self.path)
+            db.execute("PRAGMA query_only=ON")
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+    def scanner(
+        self,
+        allowed_extensions: set[str] | None = None,
+        follow_symlinks: bool = True,
+    ) -> Callable[[Path], tuple[list[Path], list[Path]]]:
+        """Returns a drop-in replacement of `scan_directory` that reconciles with the catalog"""
+        allowed_extensions = allowed_extensions or ALLOWED_EXTENSIONS
+
+        def scan(directory: Path) -> tuple[list[Path], list[Path]]:
+            return self.scan_directory(directory, allowed_extensions, follow_symlinks)
+        return scan
+
+    def scan_directory(
+        self,
+        directory: Path,
+        allowed_extensions: set[str],
+        follow_symlinks: bool = True,
+    ) -> tuple[list[Path], list[Path]]:
+        """Returns the listing of a directory from the catalog if its mtime did not change"""
+        try:
+            mtime_ns: int = directory.stat().st_mtime_ns
+        except OSError:
+            return [], []
+
+        listing: tuple[list[Path], list[Path]] | None = self.cached_listing(directory, mtime_ns)
+        if listing is not None:
+            return listing
+
+        files, subdirs = scan_directory(directory, allowed_extensions, follow_symlinks)
+        trusted: bool = time.time() - mtime_ns / 1e9 > self.RACY_SECONDS
+        self.store_listing(directory, mtime_ns if trusted else None, files, subdirs)
+        return files, subdirs
+
+    def cached_listing(self, directory: Path, mtime_ns: int) -> tuple[list[Path], list[Path]] | None:
+        try:
+            db: sqlite3.Connection = self.reader()
+            row = db.execute("SELECT mtime_ns FROM directories WHERE path = ?", (str(directory),)).fetchone()
+            if row is None or row[0] != mtime_ns:
+                return None
+
+            files: list[Path] = [
+                Path(path) for path, in
+                db.execute("SELECT path FROM files WHERE directory = ?", (str(directory),))
+            ]
+            subdirs: list[Path] = [
+                Path(path) for path, in
+                db.execute("SELECT path FROM directories WHERE parent = ?", (str(directory),))
+            ]
+        except sqlite3.Error:
+            return None
+        return files, subdirs
+
+    def store_listing(
+        self,
+        directory: Path,
+        mtime_ns: int | None,
+        files: list[Path],
+        subdirs: list[Path],
+    ) -> None:
+        """Replaces the catalog listing of a directory, keeping the rows of files that remain"""
+        dir_name: str = str(directory)
+        file_names: set[str] = {str(f) for f in files}
+        subdir_names: set[str] = {str(d) for d in subdirs}
+
+        def job(db: sqlite3.Connection) -> None:
+            known: set[str] = {
+                path for path, in db.execute("SELECT path FROM files WHERE directory = ?", (dir_name,))
+            }
+            db.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in known - file_names))
+            db.executemany(
+                "INSERT INTO files (path, directory) VALUES (?, ?)",
+                ((p, dir_name) for p in file_names - known)
+            )
+
+            known_dirs: set[str] = {
+                path for path, in db.execute("SELECT path FROM directories WHERE parent = ?", (dir_name,))
+            }
+            db.executemany("DELETE FROM directories WHERE path = ?", ((p,) for p in known_dirs - subdir_names))
+            db.executemany(
+                "INSERT OR IGNORE INTO directories (path, parent, mtime_ns) VALUES (?, ?, NULL)",
+                ((p, dir_name) for p in subdir_names - known_dirs)
+            )
+            db.execute(
+                "INSERT INTO directories (path, parent, mtime_ns) VALUES (?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns",
+                (dir_name, str(directory.parent), mtime_ns)
+            )
+
+        self.writer.put(job)
+
+    def record_metadata(self, rows: list[tuple[Path, int, float, int, int, float | None]]) -> None:
+        """Stores (path, size, mtime, width, height, taken) of files"""
+        params: list[tuple] = [(size, mtime, w, h, taken, str(p)) for p, size, mtime, w, h, taken in rows]
+        self.writer.put(lambda db: db.executemany(
+            "UPDATE files SET size = ?, mtime = ?, width = ?, height = ?, taken = ? WHERE path = ?",
+            params
+        ))
+
+    def record_thumbnail(self, file_path: Path, key: str) -> None:
+        self.writer.put(lambda db: db.execute(
+            "UPDATE files SET thumbnail = ? WHERE path = ?", (key, str(file_path))
+        ))
+
+    def record_decision(
+        self,
+        action: str,
+        source: Path,
+        target: str | None,
+        status: str,
+        message: str = "",
+    ) -> None:
+        row: tuple = (time.time(), action, str(source), target, status, message)
+        self.writer.put(lambda db: db.execute(
+            "INSERT INTO decisions (time, action, source, target, status, message) VALUES (?, ?, ?, ?, ?, ?)",
+            row
+        ))
+
+    def decisions(self, since: float, target: str | None = None) -> list[tuple]:
+        """Returns (time, action, source, target, status) of the decisions since a timestamp"""
+        query: str = "SELECT time, action, source, target, status FROM decisions WHERE time >= ?"
+        params: tuple = (since,)
+        if target is not None:
+            query += " AND target = ?"
+            params += (target,)
+        return self.reader().execute(query + " ORDER BY time", params).fetchall()
+
+    def close(self) -> None:
+        """Commits the queued writes and closes every connection"""
+        self.writer.stop()
+        with self._lock:
+            for db in self._connections:
+                db.close()
+            self._connections.clear()
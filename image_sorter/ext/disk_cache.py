@@ -0,0 +1,48 @@
+import dbm
+import struct
+import threading
+from os import stat_result
+from pathlib import Path
+
+
+class StatCache:
+    """Small binary records kept in a dbm file across sessions
+
+    Every record starts with the modification time and size of the file it
+    describes and is ignored once they no longer match, so stale entries are
+    simply overwritten instead of being invalidated explicitly.
+    """
+
+    HEADER = struct.Struct("<qq")  # mtime_ns, size
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = dbm.open(str(path), "c")
+        self._lock = threading.Lock()  # dbm handles are not safe to share between threads
+
+    @classmethod
+    def open(cls, *args):
+        """Returns the cache or None if the database cannot be opened, e.g. it is locked"""
+        try:
+            return cls(*args)
+        except (OSError, *dbm.error):
+            return None
+
+    def read(self, key: bytes, stat: stat_result) -> bytes | None:
+        with self._lock:
+            record: bytes | None = self._db.get(key)
+        if record is None or len(record) < self.HEADER.size:
+            return None
+
+        if self.HEADER.unpack_from(record) != (stat.st_mtime_ns, stat.st_size):
+            return None
+        return record[self.HEADER.size:]
+
+    def write(self, key: bytes, stat: stat_result, payload: bytes) -> None:
+        record: bytes = self.HEADER.pack(stat.st_mtime_ns, stat.st_size) + payload
+        with self._lock:
+            self._db[key] = record
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,253 @@
+import multiprocessing
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from os import stat_result
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, it is only needed to find duplicates
+    np = None
+
+from image_sorter.ext.disk_cache import StatCache
+from image_sorter.ext.identical import group_identical
+from image_sorter.ext.images import Image, pillow_available
+from image_sorter.ext.paths import DATA_DIR
+
+
+HASHES_DB: Path = DATA_DIR / "hashes"
+HASH_METHODS = ("ahash", "dhash", "phash")
+DUPLICATE_METHODS = ("exact",) + HASH_METHODS
+
+
+def duplicates_available(method: str = "phash") -> bool:
+    return method == "exact" or (np is not None and pillow_available())
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def load_grayscale(file_path: Path, size: tuple[int, int]):
+    """Decodes an image into a grayscale array of the given width and height"""
+    try:
+        with Image.open(file_path) as image:
+            image.draft("L", (size[0] * 4, size[1] * 4))  # JPEG files are decoded at a reduced scale
+            image = image.convert("L").resize(size, Image.Resampling.LANCZOS)
+            return np.asarray(image, dtype=np.float32)
+    except (OSError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def dct_matrix(n: int):
+    """DCT-II basis, the 2D transform of a block is `D @ block @ D.T`"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+
+
+def bits_to_int(bits) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def average_hash(pixels) -> int:
+    return bits_to_int(pixels > pixels.mean())
+
+
+def difference_hash(pixels) -> int:
+    return bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def perceptual_hash(pixels) -> int:
+    dct = dct_matrix(pixels.shape[0])
+    low_frequencies = (dct @ pixels @ dct.T)[:8, :8]
+    return bits_to_int(low_frequencies > np.median(low_frequencies))
+
+
+HASHERS = {
+    "ahash": (average_hash, (8, 8)),
+    "dhash": (difference_hash, (9, 8)),
+    "phash": (perceptual_hash, (32, 32)),
+}
+
+
+def image_hash(file_path: Path, method: str = "phash") -> int | None:
+    """Computes a 64-bit perceptual hash of an image, runs in a worker process"""
+    func, size = HASHERS[method]
+    pixels = load_grayscale(file_path, size)
+    if pixels is None:
+        return None
+    return func(pixels)
+
+
+class HashCache(StatCache):
+    """Perceptual hashes kept on disk across sessions, keyed by method and path"""
+
+    RECORD = struct.Struct("<Q")
+
+    def __init__(self, path: Path = HASHES_DB):
+        super().__init__(path)
+
+    @staticmethod
+    def key(file_path: Path, method: str) -> bytes:
+        return method.encode() + b":" + bytes(file_path)
+
+    def get(self, file_path: Path, method: str, stat: stat_result) -> int | None:
+        record: bytes | None = self.read(self.key(file_path, method), stat)
+        if record is None or len(record) != self.RECORD.size:
+            return None
+        return self.RECORD.unpack(record)[0]
+
+    def put(self, file_path: Path, method: str, stat: stat_result, value: int) -> None:
+        self.write(self.key(file_path, method), stat, self.RECORD.pack(value))
+
+
+def compute_hashes(
+    paths: list[Path],
+    method: str = "phash",
+    cache: HashCache | None = None,
+    workers: int | None = None,
+) -> dict[Path, int]:
+    """Returns the hashes of the readable images, missing ones are computed in parallel processes"""
+    hashes: dict[Path, int] = {}
+    missing: list[tuple[Path, stat_result]] = []
+    for file_path in paths:
+        try:
+            stat: stat_result = file_path.stat()
+        except OSError:
+            continue
+
+        value: int | None = cache.get(file_path, method, stat) if cache is not None else None
+        if value is None:
+            missing.append((file_path, stat))
+        else:
+            hashes[file_path] = value
+
+    if not missing:
+        return hashes
+
+    # The interface calls this from a worker thread: forking a process that runs
+    # threads can copy a lock some other thread holds, so the workers start clean
+    start_method: str = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method)) as pool:
+        results = pool.map(image_hash, [p for p, _ in missing], repeat(method), chunksize=32)
+        for (file_path, stat), value in zip(missing, results):
+            if value is None:
+                continue
+            hashes[file_path] = value
+            if cache is not None:
+                cache.put(file_path, method, stat, value)
+    return hashes
+
+
+class BKTree:
+    """Burkhard-Keller tree of 64-bit hashes under the Hamming distance
+
+    Children are keyed by their distance to the parent, so a lookup within
+    `radius` only descends into edges in `[d - radius, d + radius]`.
+    """
+
+    def __init__(self):
+        self._root: tuple[int, list, dict] | None = None  # hash, items, children
+
+    def add(self, value: int, item) -> None:
+        if self._root is None:
+            self._root = (value, [item], {})
+            return
+
+        node: tuple[int, list, dict] = self._root
+        while True:
+            distance: int = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, [item], {})
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> list:
+        """Returns the items whose hash is at most `radius` bits away"""
+        found: list = []
+        stack: list = [self._root] if self._root is not None else []
+        while stack:
+            node_value, items, children = stack.pop()
+            distance: int = hamming(value, node_value)
+            if distance <= radius:
+                found.extend(items)
+            for edge, child in children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+def find_clusters(hashes: dict[Path, int], max_distance: int) -> list[list[Path]]:
+    """Groups files whose hashes are connected by steps of at most `max_distance` bits"""
+    tree = BKTree()
+    for file_path, value in hashes.items():
+        tree.add(value, file_path)
+
+    parent: dict[Path, Path] = {file_path: file_path for file_path in hashes}
+
+    def root(file_path: Path) -> Path:
+        while parent[file_path] != file_path:
+            parent[file_path] = parent[parent[file_path]]
+            file_path = parent[file_path]
+        return file_path
+
+    for file_path, value in hashes.items():
+        for match in tree.search(value, max_distance):
+            a, b = root(file_path), root(match)
+            if a != b:
+                parent[b] = a
+
+    clusters: dict[Path, list[Path]] = {}
+    for file_path in hashes:
+        clusters.setdefault(root(file_path), []).append(file_path)
+
+    return sorted(
+        (sorted(members) for members in clusters.values() if len(members) > 1),
+        key=lambda members: members[0]
+    )
+
+
+def find_duplicates(
+    paths: list[Path],
+    method: str = "phash",
+    max_distance: int = 6,
+    workers: int | None = None,
+) -> list[list[Path]]:
+    """Returns clusters of duplicate and near-duplicate images, using the on-disk hash cache
+
+    An exact pass runs first: files with identical content are hashed only once,
+    and with the "exact" method the perceptual hashes are skipped entirely.
+    """
+    identical: list[list[Path]] = group_identical(paths)
+    if method == "exact":
+        return identical
+
+    copy_of: dict[Path, Path] = {
+        file_path: group[0]
+        for group in identical
+        for file_path in group[1:]
+    }
+
+    cache: HashCache | None = HashCache.open()
+    try:
+        hashes: dict[Path, int] = compute_hashes(
+            [file_path for file_path in paths if file_path not in copy_of],
+            method, cache, workers
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+    for file_path, original in copy_of.items():
+        if original in hashes:
+            hashes[file_path] = hashes[original]
+    return find_clusters(hashes, max_distance)
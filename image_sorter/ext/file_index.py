@@ -0,0 +1,146 @@
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+
+from image_sorter.ext.file_store import FileStore
+from image_sorter.ext.get_files import (
+    ALLOWED_EXTENSIONS,
+    abbreviate_name,
+    iter_files,
+)
+
+
+class FileIndex:
+    """In-memory index of the files shown in the file list
+
+    The index is built once by `scan` and then kept up to date by the
+    keybinding actions, which remove, insert or rename the single affected
+    entry instead of rescanning the whole directory. Entries are kept in a
+    compact `FileStore`, paths and labels are created on demand.
+    """
+
+    def __init__(
+        self,
+        directory_path: str,
+        depth: int = 0,
+        workers: int = 1,
+        scanner: Callable[[Path], tuple[list[Path], list[Path]]] | None = None,
+    ):
+        self.directory_path = directory_path
+        self.depth = depth  # levels of subdirectories included in the list
+        self.workers = workers
+        self.scanner = scanner  # lists a single directory, see `iter_files`
+        self.store = FileStore()
+        self._label_lengths: Counter[int] = Counter()
+        self.version: int = 0  # bumped on every change of the list
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __contains__(self, file_path: Path) -> bool:
+        return file_path in self.store
+
+    def scan(self) -> None:
+        """Rebuild the index from the files on disk"""
+        self.clear()
+        for batch in self.iter_batches():
+            self.extend(batch)
+
+    def iter_batches(self) -> Iterator[list[Path]]:
+        """Streams the files on disk in batches without touching the index"""
+        return iter_files(self.directory_path, self.depth, workers=self.workers, scanner=self.scanner)
+
+    def clear(self) -> None:
+        self.store = FileStore()
+        self._label_lengths = Counter()
+        self.version += 1
+
+    def extend(self, file_paths: Iterable[Path]) -> None:
+        """Appends a batch of files that are not indexed yet"""
+        for file_path in self.store.extend(file_paths):
+            self._label_lengths[len(abbreviate_name(file_path.name))] += 1
+        self.version += 1
+
+    def path(self, pos: int) -> Path:
+        return self.store.path(pos)
+
+    def name(self, pos: int) -> str:
+        return self.store.name(pos)
+
+    @staticmethod
+    def key_of(file_path: Path) -> int:
+        return FileStore.key(file_path)
+
+    def key(self, pos: int) -> int:
+        """Identity of the entry at a position, equal to `FileStore.key` of its path"""
+        return self.store.key_at(pos)
+
+    def label(self, pos: int) -> str:
+        return abbreviate_name(self.store.name(pos))
+
+    def max_label_length(self) -> int:
+        """Returns the longest label, labels are abbreviated so only a few lengths exist"""
+        return max((n for n, count in self._label_lengths.items() if count > 0), default=0)
+
+    def position(self, file_path: Path) -> int:
+        """Returns the position of a file in the index or -1 if it is not indexed"""
+        return self.store.position(file_path)
+
+    def positions_of(self, key: int) -> list[int]:
+        """Returns the positions of the files with a `key`, without scanning the list"""
+        return self.store.positions_of(key)
+
+    def is_allowed(self, file_path: Path) -> bool:
+        return file_path.suffix.lower() in ALLOWED_EXTENSIONS
+
+    def insert(self, pos: int, file_path: Path) -> None:
+        if self.store.insert(pos, file_path):
+            self._label_lengths[len(abbreviate_name(file_path.name))] += 1
+            self.version += 1
+
+    def append(self, file_path: Path) -> None:
+        self.insert(len(self.store), file_path)
+
+    def remove(self, pos: int) -> Path:
+        self._label_lengths[len(self.label(pos))] -= 1
+        file_path: Path = self.store.remove(pos)
+        self.version += 1
+        return file_path
+
+    def discard(self, file_path: Path) -> int:
+        """Removes a file by path and returns its former position or -1"""
+        pos: int = self.position(file_path)
+        if pos >= 0:
+            self.remove(pos)
+        return pos
+
+    def add_directory(self, directory: Path, depth: int = 0) -> None:
+        """Appends the files of a directory that appeared in the tree"""
+        for batch in iter_files(directory, depth, scanner=self.scanner):
+            self.extend(batch)
+
+    def discard_directory(self, directory: Path) -> None:
+        """Drops all entries located in a directory that left the tree"""
+        prefix: str = f"{directory}/"
+        self.filter(lambda pos: not f"{self.store.directory(pos)}/".startswith(prefix))
+
+    def filter(self, keep: Callable[[int], bool]) -> None:
+        """Keeps only the entries whose position passes `keep`"""
+        if self.store.filter(keep):
+            self._label_lengths = Counter(len(self.label(pos)) for pos in range(len(self.store)))
+            self.version += 1
+
+    def sort(self, key: Callable[[int], object], reverse: bool = False) -> None:
+        """Stable sort by a key computed from the position of each entry"""
+        if self.store.sort(key, reverse):
+            self.version += 1
+
+    def rename(self, pos: int, new_path: Path) -> bool:
+        """Renames an entry, returns False if the new path is already indexed and nothing changed"""
+        old_length: int = len(self.label(pos))
+        if not self.store.replace(pos, new_path):
+            return False
+        self._label_lengths[old_length] -= 1
+        self._label_lengths[len(abbreviate_name(new_path.name))] += 1
+        self.version += 1
+        return True
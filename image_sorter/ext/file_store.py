@@ -0,0 +1,260 @@
+import os
+import sys
+from array import array
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+
+class FileStore:
+    """Compact array-backed list of file paths
+
+    Directory prefixes are interned once, file names live in a single bytes
+    buffer addressed by offset and length arrays. `Path` objects and labels
+    are only created for the rows that are actually requested.
+
+    Paths are found through a map from `key` to position. Keys are hashes,
+    so a path whose key is already taken by another path is kept in a
+    separate map of colliding paths instead of being dropped.
+    """
+
+    def __init__(self):
+        self._dirs: list[str] = []
+        self._dir_ids: dict[str, int] = {}
+        self._names = bytearray()
+        self._offsets: array = array("Q")
+        self._lengths: array = array("H")
+        self._dir_of: array = array("I")
+        self._hashes: array = array("q")
+        self._positions: dict[int, int] = {}  # key -> position of the first stored path with that key
+        self._collisions: dict[Path, int] = {}  # paths whose key another stored path has -> position
+        self._stale_from: int = sys.maxsize  # positions in the maps from here on may be out of date
+        self._garbage: int = 0  # bytes of removed names still in the buffer
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __contains__(self, file_path: Path) -> bool:
+        return self.find(file_path, self.key(file_path)) >= 0
+
+    @staticmethod
+    def key(file_path: Path) -> int:
+        return hash(os.fsencode(file_path))
+
+    @staticmethod
+    def split(encoded: bytes) -> tuple[str, bytes]:
+        """Splits an encoded path into directory and name, a bare name gets "" so it stays relative"""
+        directory, slash, name = encoded.rpartition(b"/")
+        return os.fsdecode(directory or slash), name
+
+    def intern_dir(self, directory: str) -> int:
+        dir_id: int | None = self._dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = self._dir_ids[directory] = len(self._dirs)
+            self._dirs.append(directory)
+        return dir_id
+
+    def name(self, pos: int) -> str:
+        start: int = self._offsets[pos]
+        return os.fsdecode(bytes(self._names[start:start + self._lengths[pos]]))
+
+    def directory(self, pos: int) -> str:
+        return self._dirs[self._dir_of[pos]]
+
+    def key_at(self, pos: int) -> int:
+        """Returns `key` of the path stored at a position without rebuilding the path"""
+        return self._hashes[pos]
+
+    def path(self, pos: int) -> Path:
+        return Path(self.directory(pos), self.name(pos))
+
+    def position(self, file_path: Path) -> int:
+        """Returns the position of a path or -1"""
+        return self.find(file_path, self.key(file_path))
+
+    def find(self, file_path: Path, value: int) -> int:
+        pos: int | None = self._positions.get(value)
+        if pos is None:
+            return -1
+        if pos >= self._stale_from or self._collisions:
+            self.refresh()
+            pos = self._positions[value]
+        if self.path(pos) == file_path:
+            return pos
+        return self._collisions.get(file_path, -1)
+
+    def positions_of(self, value: int) -> list[int]:
+        """Returns the positions of the paths with a key, more than one only if their keys collide"""
+        pos: int | None = self._positions.get(value)
+        if pos is None:
+            return []
+        if pos >= self._stale_from or self._collisions:
+            self.refresh()
+            pos = self._positions[value]
+        return [pos, *(other for other in self._collisions.values() if self._hashes[other] == value)]
+
+    def link(self, file_path: Path, value: int, pos: int) -> None:
+        """Maps a path that is not stored yet to its position"""
+        if value in self._positions:
+            self._collisions[file_path] = pos
+        else:
+            self._positions[value] = pos
+
+    def unlink(self, pos: int) -> None:
+        """Removes the entry at a position from the maps, a colliding path takes over its key"""
+        value: int = self._hashes[pos]
+        if not self._collisions:
+            del self._positions[value]
+            return
+
+        self.refresh()
+        if self._positions[value] != pos:
+            del self._collisions[self.path(pos)]
+            return
+        del self._positions[value]
+        for file_path, other in self._collisions.items():
+            if self._hashes[other] == value:
+                del self._collisions[file_path]
+                self._positions[value] = other
+                return
+
+    def moved(self, pos: int) -> None:
+        """Marks the positions from `pos` on as out of date after entries were inserted or removed"""
+        self._stale_from = min(self._stale_from, pos)
+
+    def refresh(self) -> None:
+        """Brings the positions of the moved entries up to date"""
+        if self._stale_from < len(self):
+            if self._collisions:
+                self.rebuild()
+            else:
+                self._positions.update(zip(self._hashes[self._stale_from:], range(self._stale_from, len(self))))
+        self._stale_from = sys.maxsize
+
+    def rebuild(self) -> None:
+        self._positions.clear()
+        self._positions.update(zip(self._hashes, range(len(self))))
+        self._collisions.clear()
+        if len(self._positions) < len(self):  # some paths share a key
+            self._positions.clear()
+            for pos in range(len(self)):
+                self.link(self.path(pos), self._hashes[pos], pos)
+        self._stale_from = sys.maxsize
+
+    def insert(self, pos: int, file_path: Path) -> bool:
+        """Inserts a path at a position, returns False if it is already stored"""
+        encoded: bytes = os.fsencode(file_path)
+        value: int = hash(encoded)
+        if self.find(file_path, value) >= 0:
+            return False
+
+        directory, name = self.split(encoded)
+        self._offsets.insert(pos, len(self._names))
+        self._lengths.insert(pos, len(name))
+        self._dir_of.insert(pos, self.intern_dir(directory))
+        self._hashes.insert(pos, value)
+        self._names += name
+        self.moved(pos)
+        self.link(file_path, value, pos)
+        return True
+
+    def extend(self, file_paths: Iterable[Path]) -> list[Path]:
+        """Appends paths that are not stored yet and returns them"""
+        added: list[Path] = []
+        positions: dict[int, int] = self._positions
+        dir_ids: dict[bytes, int] = {}  # interned ids of the encoded directories of this batch
+        offsets, lengths, dir_of, hashes, names = self._offsets, self._lengths, self._dir_of, self._hashes, self._names
+        for file_path in file_paths:
+            encoded: bytes = os.fsencode(file_path)
+            value: int = hash(encoded)
+            if value in positions:
+                if self.find(file_path, value) >= 0:
+                    continue
+                self._collisions[file_path] = len(offsets)
+            else:
+                positions[value] = len(offsets)
+
+            directory, slash, name = encoded.rpartition(b"/")
+            directory = directory or slash  # a bare name keeps "", so it stays relative
+            dir_id: int | None = dir_ids.get(directory)
+            if dir_id is None:
+                dir_id = dir_ids[directory] = self.intern_dir(os.fsdecode(directory))
+            offsets.append(len(names))
+            lengths.append(len(name))
+            dir_of.append(dir_id)
+            hashes.append(value)
+            names += name
+            added.append(file_path)
+        return added
+
+    def remove(self, pos: int) -> Path:
+        file_path: Path = self.path(pos)
+        self._garbage += self._lengths[pos]
+        self.unlink(pos)
+
+        del self._offsets[pos]
+        del self._lengths[pos]
+        del self._dir_of[pos]
+        del self._hashes[pos]
+        self.moved(pos)
+
+        if self._garbage > len(self._names) // 2:
+            self.compact()
+        return file_path
+
+    def replace(self, pos: int, file_path: Path) -> bool:
+        """Points an entry to a new path, e.g. after it was renamed, returns False if the path is already stored"""
+        encoded: bytes = os.fsencode(file_path)
+        value: int = hash(encoded)
+        other: int = self.find(file_path, value)
+        if other >= 0:
+            return other == pos
+
+        directory, name = self.split(encoded)
+        self._garbage += self._lengths[pos]
+        self.unlink(pos)
+
+        self._offsets[pos] = len(self._names)
+        self._lengths[pos] = len(name)
+        self._dir_of[pos] = self.intern_dir(directory)
+        self._names += name
+
+        self._hashes[pos] = value
+        self.link(file_path, value, pos)
+        return True
+
+    def filter(self, keep: Callable[[int], bool]) -> bool:
+        """Keeps only the entries whose position passes `keep`, returns True if any was dropped"""
+        order: list[int] = [pos for pos in range(len(self)) if keep(pos)]
+        if len(order) == len(self):
+            return False
+        self.reorder(order)
+        return True
+
+    def sort(self, key: Callable[[int], object], reverse: bool = False) -> bool:
+        """Stable sort of the entries by a key computed from their position, returns True if any moved"""
+        order: list[int] = sorted(range(len(self)), key=key, reverse=reverse)
+        if order == list(range(len(self))):
+            return False
+        self.reorder(order)
+        return True
+
+    def reorder(self, order: list[int]) -> None:
+        """Rebuilds the arrays in the given order of positions, dropping the others"""
+        names = bytearray()
+        offsets: array = array("Q")
+        for pos in order:
+            start: int = self._offsets[pos]
+            offsets.append(len(names))
+            names += self._names[start:start + self._lengths[pos]]
+
+        self._names = names
+        self._offsets = offsets
+        self._lengths = array("H", (self._lengths[pos] for pos in order))
+        self._dir_of = array("I", (self._dir_of[pos] for pos in order))
+        self._hashes = array("q", (self._hashes[pos] for pos in order))
+        self.rebuild()
+        self._garbage = 0
+
+    def compact(self) -> None:
+        """Drops the bytes of removed names from the buffer"""
+        self.reorder(list(range(len(self))))
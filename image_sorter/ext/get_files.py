@@ -1,27 +1,127 @@
+import os
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
 
 
+ALLOWED_EXTENSIONS: set[str] = {".png", ".jpg", ".jpeg", ".tiff", ".bmp"}
+
+
 def get_files(
     directory_path: str,
     allowed_extensions: set[str] | None = None,
     max_file_len: int = 24,
 ) -> tuple[list[Path], list[str]]:
     """Retrieve a list of files with specified extensions from a given directory"""
-    allowed_extensions: set[str] = allowed_extensions or {".png", ".jpg", ".jpeg", ".tiff", ".bmp"}
-    directory: Path = Path(directory_path)
+    files: list[Path] = []
+    for batch in iter_files(directory_path, allowed_extensions=allowed_extensions):
+        files.extend(batch)
+
+    formatted_files: list[str] = [format_file_name(file, max_file_len) for file in files]
+    return files, formatted_files
+
+
+def iter_files(
+    directory_path: str,
+    max_depth: int = 0,
+    allowed_extensions: set[str] | None = None,
+    workers: int = 1,
+    follow_symlinks: bool = True,
+    scanner: Callable[[Path], tuple[list[Path], list[Path]]] | None = None,
+) -> Iterator[list[Path]]:
+    """Stream batches of files with specified extensions, one batch per directory
+
+    Subdirectories are descended into up to `max_depth` levels. The type
+    information of `os.scandir` entries is reused, so files cost no extra
+    `stat` call. With `workers` > 1 subtrees are scanned in parallel, which
+    helps on network or slow disks. A `scanner` replaces the listing of a
+    single directory, e.g. to serve unchanged directories from the catalog.
+    """
+    allowed_extensions = allowed_extensions or ALLOWED_EXTENSIONS
+    root: Path = Path(directory_path)
 
+    try:
+        root_stat = root.stat()
+    except OSError:
+        return
+    visited: set[tuple[int, int]] = {(root_stat.st_dev, root_stat.st_ino)}
+
+    def scan(directory: Path) -> tuple[list[Path], list[Path]]:
+        if scanner is not None:
+            return scanner(directory)
+        return scan_directory(directory, allowed_extensions, follow_symlinks)
+
+    def accept(directory: Path) -> bool:
+        """Skips directories that were already visited, e.g. through a symlink loop"""
+        try:
+            stat = directory.stat()
+        except OSError:
+            return False
+        identity: tuple[int, int] = (stat.st_dev, stat.st_ino)
+        if identity in visited:
+            return False
+        visited.add(identity)
+        return True
+
+    if workers <= 1:
+        pending: deque[tuple[Path, int]] = deque([(root, 0)])
+        while pending:
+            directory, depth = pending.popleft()
+            files, subdirs = scan(directory)
+            if files:
+                yield files
+            if depth < max_depth:
+                pending.extend((d, depth + 1) for d in subdirs if accept(d))
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image_sorter-scan") as pool:
+        futures: dict[Future, int] = {pool.submit(scan, root): 0}
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                depth: int = futures.pop(future)
+                files, subdirs = future.result()
+                if depth < max_depth:
+                    for d in subdirs:
+                        if accept(d):
+                            futures[pool.submit(scan, d)] = depth + 1
+                if files:
+                    yield files
+
+
+def scan_directory(
+    directory: Path,
+    allowed_extensions: set[str],
+    follow_symlinks: bool = True,
+) -> tuple[list[Path], list[Path]]:
+    """Returns the matching files and the subdirectories of a single directory"""
     files: list[Path] = []
-    formatted_files: list[str] = []
+    subdirs: list[Path] = []
 
-    if not directory.exists() or not directory.is_dir():
-        return [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file(follow_symlinks=follow_symlinks):
+                        if os.path.splitext(entry.name)[1].lower() in allowed_extensions:
+                            files.append(directory / entry.name)
+                    elif entry.is_dir(follow_symlinks=follow_symlinks):
+                        subdirs.append(directory / entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
 
-    for file in directory.iterdir():
-        if file.is_file() and file.suffix.lower() in allowed_extensions:
-            abbr_filename: str = f"{file.name[:max_file_len-4]}~{file.suffix}"
-            formatted_file: str = abbr_filename if len(file.name) > max_file_len else file.name
+    return files, subdirs
 
-            files.append(file)
-            formatted_files.append(formatted_file)
 
-    return files, formatted_files
+def format_file_name(file: Path, max_file_len: int = 24) -> str:
+    """Abbreviate a file name to fit into the file list column"""
+    return abbreviate_name(file.name, max_file_len)
+
+
+def abbreviate_name(name: str, max_file_len: int = 24) -> str:
+    if len(name) > max_file_len:
+        return f"{name[:max_file_len-4]}~{os.path.splitext(name)[1]}"
+    return name
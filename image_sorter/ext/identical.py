@@ -0,0 +1,121 @@
+import hashlib
+import mmap
+import os
+from collections.abc import Iterable
+from pathlib import Path
+
+
+BLOCK_SIZE = 64 * 1024  # bytes hashed at each end of a file in the second stage
+CHUNK_SIZE = 8 * 1024 * 1024  # bytes fed to the hash at once in the full pass
+
+
+def edge_digest(file_path: Path, size: int) -> bytes | None:
+    """Hashes the first and the last block of a file"""
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        fd: int = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return None
+
+    try:
+        digest.update(os.pread(fd, BLOCK_SIZE, 0))
+        if size > BLOCK_SIZE:
+            digest.update(os.pread(fd, BLOCK_SIZE, max(BLOCK_SIZE, size - BLOCK_SIZE)))
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    return digest.digest()
+
+
+def full_digest(file_path: Path) -> bytes | None:
+    """Hashes the whole file through a memory map, without copying it into Python buffers"""
+    digest = hashlib.blake2b(digest_size=32)
+    try:
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return digest.digest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for start in range(0, len(mapped), CHUNK_SIZE):
+                        digest.update(view[start:start + CHUNK_SIZE])
+                finally:
+                    view.release()
+    except (OSError, ValueError):
+        return None
+    return digest.digest()
+
+
+def split_by(paths: list[Path], key) -> list[list[Path]]:
+    """Splits a bucket by a key computed per file, dropping unique and unreadable files"""
+    buckets: dict = {}
+    for file_path in paths:
+        value = key(file_path)
+        if value is not None:
+            buckets.setdefault(value, []).append(file_path)
+    return [bucket for bucket in buckets.values() if len(bucket) > 1]
+
+
+def group_identical(paths: Iterable[Path]) -> list[list[Path]]:
+    """Groups files with identical content
+
+    Files are bucketed by size first, only same-sized files get their first
+    and last blocks hashed, and only files still colliding after that are
+    hashed completely. Hard links of the same inode are counted once.
+    """
+    sizes: dict[int, list[Path]] = {}
+    inodes: set[tuple[int, int]] = set()
+    for file_path in paths:
+        try:
+            stat = file_path.stat()
+        except OSError:
+            continue
+        if stat.st_size == 0 or (stat.st_dev, stat.st_ino) in inodes:
+            continue
+        inodes.add((stat.st_dev, stat.st_ino))
+        sizes.setdefault(stat.st_size, []).append(file_path)
+
+    groups: list[list[Path]] = []
+    for size, bucket in sizes.items():
+        if len(bucket) < 2:
+            continue
+        for candidates in split_by(bucket, lambda p: edge_digest(p, size)):
+            if size <= 2 * BLOCK_SIZE:  # the edge blocks already covered the whole file
+                groups.append(candidates)
+            else:
+                groups.extend(split_by(candidates, full_digest))
+
+    return sorted((sorted(group) for group in groups), key=lambda group: group[0])
+
+
+def find_identical(file_path: Path, directory: Path) -> Path | None:
+    """Returns a file in `directory` with the same content as `file_path`, if there is one"""
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return None
+
+    candidates: list[Path] = [file_path]
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file() or entry.stat().st_size != stat.st_size:
+                        continue
+                    if entry.stat().st_ino == stat.st_ino and entry.stat().st_dev == stat.st_dev:
+                        if entry.name == file_path.name:
+                            continue  # the file itself already lives in the directory
+                        return Path(entry.path)
+                except OSError:
+                    continue
+                candidates.append(Path(entry.path))
+    except OSError:
+        return None
+
+    if len(candidates) < 2:
+        return None
+    for group in group_identical(candidates):
+        if file_path in group:
+            return next(p for p in group if p != file_path)
+    return None
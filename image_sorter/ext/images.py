@@ -0,0 +1,59 @@
+import io
+import struct
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, PNG files can still be shown without it
+    Image = None
+    ImageOps = None
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+Thumbnail = tuple[bytes, int, int]  # PNG data, width, height
+
+
+def pillow_available() -> bool:
+    return Image is not None
+
+
+def read_png_size(file_path: Path) -> tuple[int, int] | None:
+    """Reads the pixel size from the IHDR chunk of a PNG file"""
+    try:
+        with open(file_path, "rb") as f:
+            header: bytes = f.read(24)
+    except OSError:
+        return None
+
+    if len(header) < 24 or not header.startswith(PNG_SIGNATURE) or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def encode_png(
+    file_path: Path,
+    mirror: str = "none",
+    max_size: tuple[int, int] | None = None,
+) -> Thumbnail | None:
+    """Decodes an image with Pillow and returns it as PNG bytes with its pixel size"""
+    if Image is None:
+        return None
+
+    try:
+        with Image.open(file_path) as image:
+            image = ImageOps.exif_transpose(image)
+            if max_size is not None:
+                image.thumbnail(max_size)
+            if mirror in ("horizontal", "both"):
+                image = ImageOps.mirror(image)
+            if mirror in ("vertical", "both"):
+                image = ImageOps.flip(image)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG", compress_level=1)
+            return buffer.getvalue(), image.width, image.height
+    except (OSError, ValueError):
+        return None
@@ -1,36 +1,234 @@
+import atexit
 import curses
+import queue
+import re
+import threading
+import time
 from pathlib import Path
 
+from image_sorter.ext.paths import DATA_DIR
+
+
+LEVELS: dict[str, int] = {
+    "debug": 10,
+    "info": 20,
+    "success": 20,
+    "warning": 30,
+    "error": 40,
+    "off": 100,
+}
+
+
+class LogWriter(threading.Thread):
+    """Background thread appending queued log lines to their files in batches
+
+    Lines are flushed when `batch_size` lines are buffered, when
+    `flush_interval` seconds passed since the last flush and at exit. A file
+    is rotated to `<name>.1` ... `<name>.<backups>` once it would grow over
+    `max_bytes`. When the queue is full new lines are dropped instead of
+    blocking the UI thread.
+    """
+
+    STOP = object()
+
+    def __init__(
+        self,
+        max_bytes: int = 5 * 1024 * 1024,
+        backups: int = 3,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+        queue_size: int = 10000,
+    ):
+        super().__init__(name="image_sorter-logger", daemon=True)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.dropped: int = 0
+        self._buffer: dict[Path, list[str]] = {}
+        self._buffered: int = 0
+
+    def put(self, path: Path, line: str) -> None:
+        try:
+            self.queue.put_nowait((path, line))
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self) -> None:
+        last_flush: float = time.monotonic()
+        while True:
+            timeout: float = max(0.0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is self.STOP:
+                self.flush()
+                return
+            if item is not None:
+                path, line = item
+                self._buffer.setdefault(path, []).append(line)
+                self._buffered += 1
+
+            expired: bool = time.monotonic() - last_flush >= self.flush_interval
+            if self._buffered >= self.batch_size or (expired and self._buffered):
+                self.flush()
+            if expired or self._buffered == 0:
+                last_flush = time.monotonic()
+
+    def flush(self) -> None:
+        if self.dropped:
+            for path in self._buffer:
+                self._buffer[path].append(f"__WARNING__: {self.dropped} log lines dropped\n")
+                break
+            self.dropped = 0
+
+        for path, lines in self._buffer.items():
+            data: str = "".join(lines)
+            try:
+                self.rotate(path, len(data.encode()))
+                with open(path, "a") as f:
+                    f.write(data)
+            except OSError:
+                pass  # logging must never take the application down
+        self._buffer.clear()
+        self._buffered = 0
+
+    def rotate(self, path: Path, incoming: int) -> None:
+        try:
+            size: int = path.stat().st_size
+        except FileNotFoundError:
+            return
+        if self.max_bytes <= 0 or size + incoming <= self.max_bytes:
+            return
+
+        if self.backups <= 0:
+            path.unlink()
+            return
+
+        for n in range(self.backups - 1, 0, -1):
+            older: Path = path.with_name(f"{path.name}.{n}")
+            if older.exists():
+                older.replace(path.with_name(f"{path.name}.{n + 1}"))
+        path.replace(path.with_name(f"{path.name}.1"))
+
+    def stop(self) -> None:
+        """Flushes everything that is queued and stops the thread"""
+        if not self.is_alive():
+            return
+        self.queue.put(self.STOP)
+        self.join()
+
+
+_writers: dict[Path, LogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(log_dir: Path, **options) -> LogWriter:
+    """Returns the writer thread shared by all loggers of a directory"""
+    with _writers_lock:
+        writer: LogWriter | None = _writers.get(log_dir)
+        if writer is None:
+            writer = _writers[log_dir] = LogWriter(**options)
+            writer.start()
+            atexit.register(writer.stop)
+        return writer
+
 
 class Logger:
-    def __init__(self, log_dir=None):
+    def __init__(
+        self,
+        log_dir=None,
+        level: str = "info",
+        max_bytes: int = 5 * 1024 * 1024,
+        backups: int = 3,
+    ):
         if log_dir is None:
-            self.log_dir = Path.home() / ".local/share" / "image_sorter"
+            self.log_dir = DATA_DIR
         else:
             self.log_dir = Path(log_dir).expanduser().resolve()
 
         self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.level: int = LEVELS.get(level.lower(), LEVELS["info"])
+        self.writer = get_writer(self.log_dir, max_bytes=max_bytes, backups=backups)
 
         self.main_log = self.log_dir / "main.log"
         self.keys_log = self.log_dir / "keys.log"
         self.custom_log = self.log_dir / "custom.log"
 
+    def is_enabled(self, level: str) -> bool:
+        return LEVELS.get(level.lower(), LEVELS["info"]) >= self.level
+
     def log_message(self, message: str, level: str = "info") -> None:
         """Logs a message with a specified log level (INFO, ERROR, etc)"""
-        with open(self.main_log, "a") as f:
-            f.write(f"__{level.upper()}__: {message}\n")
+        if self.is_enabled(level):
+            self.writer.put(self.main_log, f"__{level.upper()}__: {message}\n")
 
     def log_key_press(self, key: int) -> None:
         """Logs key press events"""
-        with open(self.keys_log, "a") as f:
-            if key == curses.KEY_DOWN:
-                f.write(f"KEY_DOWN is pressed: {key}\n")
-            elif key == curses.KEY_UP:
-                f.write(f"KEY_UP is pressed: {key}\n")
-            else:
-                f.write(f"Key pressed: {key}\n")
+        if not self.is_enabled("info"):
+            return
+
+        if key == curses.KEY_DOWN:
+            self.writer.put(self.keys_log, f"KEY_DOWN is pressed: {key}\n")
+        elif key == curses.KEY_UP:
+            self.writer.put(self.keys_log, f"KEY_UP is pressed: {key}\n")
+        else:
+            self.writer.put(self.keys_log, f"Key pressed: {key}\n")
 
     def log_custom_event(self, event: str, *args) -> None:
         """Logs custom events with additional variables"""
-        with open(self.custom_log, "a") as f:
-            f.write(f"{event}: {', '.join(map(str, args))}\n")
+        if self.is_enabled("info"):
+            self.writer.put(self.custom_log, f"{event}: {', '.join(map(str, args))}\n")
+
+
+KEY_LOG_LINE = re.compile(r"(?:Key pressed|KEY_\w+ is pressed): (-?\d+)$")
+KEY_TOKEN = re.compile(r"<(\w+)>")
+KEY_NAMES: dict[str, int] = {"ENTER": 10, "ESC": 27, "TAB": 9, "SPACE": 32, "LT": ord("<")}
+
+
+def parse_key_token(token: str) -> int:
+    """Converts the inside of `<...>`, a key code or a name like `DOWN`, `KEY_F2` or `ESC`"""
+    if token.isdigit():
+        return int(token)
+    name: str = token.upper()
+    code: int | None = KEY_NAMES.get(name, getattr(curses, name if name.startswith("KEY_") else f"KEY_{name}", None))
+    if not isinstance(code, int):
+        raise ValueError(f'unknown key "<{token}>"')
+    return code
+
+
+def read_keys(path: str | Path) -> list[int]:
+    """Reads a key stream, e.g. the `keys.log` of a session
+
+    Besides the lines of `keys.log` a line can hold typed characters like
+    `jjj1`, with special keys written as `<ENTER>`, `<DOWN>`, `<F2>` or a
+    key code like `<10>`. Empty lines and lines starting with `#` are
+    skipped. Raises ValueError if the file cannot be read or parsed.
+    """
+    try:
+        lines: list[str] = Path(path).expanduser().read_text().splitlines()
+    except (OSError, UnicodeDecodeError) as e:
+        raise ValueError(f'cannot read the key file "{path}": {e}')
+
+    keys: list[int] = []
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        match: re.Match | None = KEY_LOG_LINE.match(line)
+        if match is not None:
+            keys.append(int(match.group(1)))
+            continue
+        pos: int = 0
+        for token in KEY_TOKEN.finditer(line):
+            keys.extend(map(ord, line[pos:token.start()]))
+            try:
+                keys.append(parse_key_token(token.group(1)))
+            except ValueError as e:
+                raise ValueError(f'key file "{path}", line {number}: {e}')
+            pos = token.end()
+        keys.extend(map(ord, line[pos:]))
+    return keys
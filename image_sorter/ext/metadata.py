@@ -0,0 +1,292 @@
+import math
+import os
+import struct
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from os import stat_result
+from pathlib import Path
+from typing import NamedTuple
+
+from image_sorter.ext.disk_cache import StatCache
+from image_sorter.ext.images import PNG_SIGNATURE
+from image_sorter.ext.paths import DATA_DIR
+
+
+METADATA_DB: Path = DATA_DIR / "metadata"
+
+# TIFF tags
+IMAGE_WIDTH = 0x0100
+IMAGE_LENGTH = 0x0101
+MODEL = 0x0110
+ORIENTATION = 0x0112
+DATE_TIME = 0x0132
+EXIF_IFD = 0x8769
+DATE_TIME_ORIGINAL = 0x9003
+
+TIFF_TYPES = {1: "B", 2: "s", 3: "H", 4: "I", 7: "B", 9: "i"}  # BYTE, ASCII, SHORT, LONG, UNDEFINED, SLONG
+
+
+class Metadata(NamedTuple):
+    size: int
+    mtime: float
+    width: int = 0
+    height: int = 0
+    taken: float | None = None  # capture time from EXIF as a timestamp
+    camera: str = ""  # camera model from EXIF
+
+    @property
+    def date(self) -> float:
+        """Capture time, or the modification time for images without EXIF"""
+        return self.taken if self.taken is not None else self.mtime
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+def parse_exif_date(value: bytes) -> float | None:
+    try:
+        text: str = value.split(b"\0", 1)[0].decode("ascii").strip()
+        return datetime.strptime(text, "%Y:%m:%d %H:%M:%S").timestamp()
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def parse_tiff(read_at: Callable[[int, int], bytes]) -> dict[int, object]:
+    """Reads the tags used for sorting from a TIFF structure, also the body of an EXIF block
+
+    `read_at(offset, length)` returns bytes relative to the TIFF header, so
+    the same parser works on an in-memory EXIF block and on a TIFF file.
+    """
+    header: bytes = read_at(0, 8)
+    if header[:4] == b"II*\0":
+        endian = "<"
+    elif header[:4] == b"MM\0*":
+        endian = ">"
+    else:
+        return {}
+
+    tags: dict[int, object] = {}
+    offsets: list[int] = [struct.unpack(endian + "I", header[4:8])[0]]
+    visited: set[int] = set()
+    while offsets:
+        offset: int = offsets.pop()
+        if offset in visited:
+            continue
+        visited.add(offset)
+        count_bytes: bytes = read_at(offset, 2)
+        if len(count_bytes) < 2:
+            continue
+        count: int = struct.unpack(endian + "H", count_bytes)[0]
+        entries: bytes = read_at(offset + 2, 12 * count)
+
+        for i in range(len(entries) // 12):
+            tag, kind, n, value = struct.unpack_from(endian + "HHI4s", entries, 12 * i)
+            if tag not in (IMAGE_WIDTH, IMAGE_LENGTH, MODEL, ORIENTATION, DATE_TIME, EXIF_IFD, DATE_TIME_ORIGINAL):
+                continue
+            code: str | None = TIFF_TYPES.get(kind)
+            if code is None:
+                continue
+
+            size: int = struct.calcsize(code) * n
+            data: bytes = value[:size] if size <= 4 else read_at(struct.unpack(endian + "I", value)[0], size)
+            if code == "s":
+                tags[tag] = data
+            elif len(data) >= struct.calcsize(code):
+                tags[tag] = struct.unpack_from(endian + code, data)[0]
+
+            if tag == EXIF_IFD and isinstance(tags[tag], int):
+                offsets.append(tags[tag])
+    return tags
+
+
+def read_tiff_file(fd: int) -> tuple[int, int, float | None, str]:
+    tags: dict[int, object] = parse_tiff(lambda offset, length: os.pread(fd, length, offset))
+    return (
+        int_tag(tags, IMAGE_WIDTH, 0),
+        int_tag(tags, IMAGE_LENGTH, 0),
+        exif_date(tags),
+        exif_text(tags, MODEL),
+    )
+
+
+def int_tag(tags: dict[int, object], tag: int, default: int) -> int:
+    """A numeric tag, or the default when a malformed file stored it as text or a negative number"""
+    value = tags.get(tag)
+    return value if isinstance(value, int) and value >= 0 else default
+
+
+def exif_date(tags: dict[int, object]) -> float | None:
+    for tag in (DATE_TIME_ORIGINAL, DATE_TIME):
+        value = tags.get(tag)
+        if isinstance(value, bytes):
+            taken: float | None = parse_exif_date(value)
+            if taken is not None:
+                return taken
+    return None
+
+
+def exif_text(tags: dict[int, object], tag: int) -> str:
+    value = tags.get(tag)
+    if not isinstance(value, bytes):
+        return ""
+    return value.split(b"\0", 1)[0].decode("ascii", "replace").strip()
+
+
+def read_jpeg(fd: int) -> tuple[int, int, float | None, str]:
+    """Walks the JPEG markers up to the frame header, the entropy coded data is never read"""
+    offset: int = 2
+    width = height = 0
+    taken: float | None = None
+    camera: str = ""
+    orientation: int = 1
+
+    while True:
+        marker: bytes = os.pread(fd, 4, offset)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            break
+        code: int = marker[1]
+        if code == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if code == 0x01 or 0xD0 <= code <= 0xD8:  # markers without a length
+            offset += 2
+            continue
+        if code in (0xD9, 0xDA):  # end of image, start of scan
+            break
+
+        length: int = struct.unpack(">H", marker[2:4])[0]
+        if code == 0xE1 and taken is None:
+            segment: bytes = os.pread(fd, length - 2, offset + 4)
+            if segment.startswith(b"Exif\0\0"):
+                tiff: bytes = segment[6:]
+                tags: dict[int, object] = parse_tiff(lambda start, size: tiff[start:start + size])
+                taken = exif_date(tags)
+                camera = exif_text(tags, MODEL)
+                orientation = int_tag(tags, ORIENTATION, 1)
+        elif 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):  # start of frame
+            frame: bytes = os.pread(fd, 5, offset + 4)
+            if len(frame) == 5:
+                height, width = struct.unpack(">xHH", frame)
+            break
+        offset += 2 + length
+
+    if orientation in (5, 6, 7, 8):  # rotated by 90 degrees when displayed
+        width, height = height, width
+    return width, height, taken, camera
+
+
+def read_header(file_path: Path) -> tuple[int, int, float | None, str]:
+    """Returns width, height, capture time and camera model, reading only the header of the image"""
+    try:
+        fd: int = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return 0, 0, None, ""
+
+    try:
+        head: bytes = os.pread(fd, 32, 0)
+        if head.startswith(PNG_SIGNATURE) and head[12:16] == b"IHDR":
+            width, height = struct.unpack(">II", head[16:24])
+            return width, height, None, ""
+        if head.startswith(b"\xff\xd8"):
+            return read_jpeg(fd)
+        if head[:4] in (b"II*\0", b"MM\0*"):
+            return read_tiff_file(fd)
+        if head.startswith(b"BM") and len(head) >= 26:
+            width, height = struct.unpack("<ii", head[18:26])
+            return width, abs(height), None, ""
+    except (OSError, ValueError, struct.error):
+        pass
+    finally:
+        os.close(fd)
+    return 0, 0, None, ""
+
+
+class MetadataCache(StatCache):
+    """Image headers kept on disk across sessions, keyed by path"""
+
+    RECORD = struct.Struct("<IIdH")  # width, height, capture time or NaN, length of the camera model that follows
+
+    def __init__(self, path: Path = METADATA_DB):
+        super().__init__(path)
+
+    def get(self, file_path: Path, stat: stat_result) -> Metadata | None:
+        record: bytes | None = self.read(bytes(file_path), stat)
+        if record is None or len(record) < self.RECORD.size:
+            return None
+
+        width, height, taken, camera_length = self.RECORD.unpack_from(record)
+        camera: bytes = record[self.RECORD.size:]
+        if len(camera) != camera_length:
+            return None
+        return Metadata(
+            stat.st_size, stat.st_mtime, width, height,
+            None if math.isnan(taken) else taken, camera.decode("utf-8", "replace")
+        )
+
+    def put(self, file_path: Path, stat: stat_result, metadata: Metadata) -> None:
+        taken: float = metadata.taken if metadata.taken is not None else math.nan
+        camera: bytes = metadata.camera.encode()[:0xFFFF]
+        record: bytes = self.RECORD.pack(metadata.width, metadata.height, taken, len(camera)) + camera
+        self.write(bytes(file_path), stat, record)
+
+
+def read_metadata(file_path: Path, cache: MetadataCache | None = None) -> Metadata | None:
+    """Returns the metadata of a file or None if it no longer exists"""
+    try:
+        stat: stat_result = file_path.stat()
+    except OSError:
+        return None
+
+    if cache is not None:
+        metadata: Metadata | None = cache.get(file_path, stat)
+        if metadata is not None:
+            return metadata
+
+    metadata = Metadata(stat.st_size, stat.st_mtime, *read_header(file_path))
+    if cache is not None:
+        cache.put(file_path, stat, metadata)
+    return metadata
+
+
+class MetadataLoader:
+    """Reads image headers on a thread pool and reports them in batches
+
+    Header parsing is dominated by small reads, so threads overlap the I/O
+    well. Results go through the persistent cache, which makes the second
+    pass over a large directory a matter of lookups.
+    """
+
+    BATCH_SIZE = 256
+
+    def __init__(
+        self,
+        on_done: Callable[[list[tuple[Path, Metadata]]], None],
+        workers: int = 4,
+        cache: MetadataCache | None = None,
+    ):
+        self.on_done = on_done
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image_sorter-metadata")
+
+    def request(self, paths: list[Path]) -> None:
+        for start in range(0, len(paths), self.BATCH_SIZE):
+            self._pool.submit(self.load_batch, paths[start:start + self.BATCH_SIZE])
+
+    def load_batch(self, paths: list[Path]) -> None:
+        results: list[tuple[Path, Metadata]] = []
+        for file_path in paths:
+            try:
+                metadata: Metadata | None = read_metadata(file_path, self.cache)
+            except Exception:  # one unreadable file must not lose the rest of the batch
+                continue
+            if metadata is not None:
+                results.append((file_path, metadata))
+        self.on_done(results)
+
+    def shutdown(self, cancel: bool = False) -> None:
+        """Waits for the requested batches, the ones not started yet are dropped if `cancel` is set"""
+        self._pool.shutdown(wait=True, cancel_futures=cancel)
+        if self.cache is not None:
+            self.cache.close()
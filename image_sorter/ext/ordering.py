@@ -0,0 +1,133 @@
+import operator
+import os
+import re
+from collections.abc import Callable
+from datetime import datetime
+from fnmatch import fnmatch
+
+from image_sorter.ext.metadata import Metadata
+
+
+SORT_KEYS = ("name", "natural", "mtime", "size", "date", "dimensions")
+FILTER_FIELDS = ("name", "ext", "camera", "size", "width", "height", "pixels", "date", "mtime")
+
+SortKey = Callable[[str, Metadata | None], tuple]
+
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+OPERATORS = {
+    "<=": operator.le,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt,
+    "~": lambda name, pattern: fnmatch(name.lower(), pattern.lower()),
+}
+FILTER_PATTERN = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>|~)\s*(.+?)\s*$")
+
+
+def natural_key(name: str) -> list:
+    """Orders "img2" before "img10", digits and text alternate so the parts always compare"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def parse_sort(spec: str) -> tuple[str, bool]:
+    """Parses a sort key like "date" or "-size" (descending)"""
+    reverse: bool = spec.startswith("-")
+    name: str = spec.removeprefix("-")
+    if name not in SORT_KEYS:
+        raise ValueError(f'unknown sort key "{name}", expected one of {", ".join(SORT_KEYS)}')
+    return name, reverse
+
+
+def sort_needs_metadata(name: str) -> bool:
+    return name not in ("name", "natural")
+
+
+def sort_key(name: str, reverse: bool = False) -> SortKey:
+    """Returns a key for a stable sort, files without metadata yet stay at the end"""
+    pending: tuple = (0,) if reverse else (1,)
+    known: int = 1 if reverse else 0
+
+    def key(file_name: str, metadata: Metadata | None) -> tuple:
+        if name == "name":
+            return (known, file_name.lower())
+        if name == "natural":
+            return (known, natural_key(file_name))
+        if metadata is None:
+            return pending
+        if name == "mtime":
+            return (known, metadata.mtime)
+        if name == "size":
+            return (known, metadata.size)
+        if name == "date":
+            return (known, metadata.date)
+        return (known, metadata.pixels, metadata.width)
+
+    return key
+
+
+def parse_size(value: str) -> int:
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([kmg]?)i?b?", value.lower())
+    if match is None:
+        raise ValueError(f'invalid size "{value}", expected e.g. 500K or 2M')
+    return int(float(match[1]) * SIZE_UNITS[match[2]])
+
+
+def parse_date(value: str) -> float:
+    for layout in ("%Y-%m-%d", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(value, layout).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f'invalid date "{value}", expected YYYY-MM-DD or YYYY-MM-DD HH:MM')
+
+
+class FileFilter:
+    """A single condition like `width >= 1920`, `size < 2M`, `date >= 2024-01-01`, `name ~ IMG_*` or `camera ~ *Pixel*`"""
+
+    def __init__(self, expression: str):
+        match = FILTER_PATTERN.match(expression)
+        if match is None:
+            raise ValueError(f'invalid filter "{expression}", expected FIELD OP VALUE')
+
+        self.field, op, raw_value = match.groups()
+        if self.field not in FILTER_FIELDS:
+            raise ValueError(f'unknown filter field "{self.field}", expected one of {", ".join(FILTER_FIELDS)}')
+
+        text_field: bool = self.field in ("name", "ext", "camera")
+        if (text_field and op not in ("~", "==", "!=")) or (not text_field and op == "~"):
+            raise ValueError(f'operator "{op}" cannot be used with "{self.field}"')
+
+        self.compare = OPERATORS[op]
+        if self.field == "name":
+            self.value = raw_value
+        elif self.field == "ext":
+            self.value = "." + raw_value.lower().lstrip(".")
+        elif self.field == "camera":
+            self.value = raw_value.lower()
+        elif self.field == "size":
+            self.value = parse_size(raw_value)
+        elif self.field in ("date", "mtime"):
+            self.value = parse_date(raw_value)
+        else:
+            try:
+                self.value = int(raw_value)
+            except ValueError:
+                raise ValueError(f'"{self.field}" must be compared with an integer') from None
+
+    @property
+    def needs_metadata(self) -> bool:
+        return self.field not in ("name", "ext")
+
+    def matches(self, file_name: str, metadata: Metadata | None) -> bool | None:
+        """Returns whether the file passes, or None while its metadata is not known yet"""
+        if self.field == "name":
+            return self.compare(file_name, self.value)
+        if self.field == "ext":
+            return self.compare(os.path.splitext(file_name)[1].lower(), self.value)
+        if metadata is None:
+            return None
+        if self.field == "camera":
+            return self.compare(metadata.camera.lower(), self.value)
+        return self.compare(getattr(metadata, self.field), self.value)
@@ -2,6 +2,8 @@ import argparse
 
 # TODO: implement dynamic argument completion with `argcomplete` for tab completion support
 
+DEFAULT_GRID = "4x3"  # columns and rows of the thumbnail grid
+
 
 def configure_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
@@ -31,12 +33,53 @@ def configure_parser() -> argparse.ArgumentParser:
         default=False,
         help="list all files in the first level of the target directory tree"
     )
+    cmd.add_argument(
+        "--depth",
+        type=int,
+        default=1,
+        metavar="N",
+        help="number of subdirectory levels listed with --tree"
+    )
+    cmd.add_argument(
+        "--scan-workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="scan subdirectories in N parallel threads, useful on network or slow disks"
+    )
+    cmd.add_argument(
+        "--sort",
+        type=str,
+        default=None,
+        metavar="KEY",
+        help="sort by name, natural, mtime, size, date (EXIF capture time) or dimensions, reverse with a - prefix as in --sort=-date"
+    )
+    cmd.add_argument(
+        "--filter",
+        type=str,
+        action="append",
+        default=None,
+        metavar="EXPR",
+        help="only list files matching e.g. 'width >= 1920', 'size < 2M', 'date >= 2024-01-01' or 'name ~ IMG_*', repeatable"
+    )
+    cmd.add_argument(
+        "-w", "--watch",
+        action="store_true",
+        default=False,
+        help="watch the input directory and show new files as they arrive"
+    )
     cmd.add_argument(
         "-c", "--copy_mode",
         action="store_true",
         default=False,
         help="enable copy mode instead of moving files"
     )
+    cmd.add_argument(
+        "--link",
+        action="store_true",
+        default=False,
+        help="hard link files into the target directories instead of copying them, copies across devices"
+    )
     cmd.add_argument(
         "--safe-delete",
         action="store_true",
@@ -51,6 +94,135 @@ def configure_parser() -> argparse.ArgumentParser:
         default="0",
         help="automatically rename files using the specified numeral base"
     )
+    cmd.add_argument(
+        "--prefetch",
+        type=int,
+        default=4,
+        metavar="N",
+        help="decode N images before and after the selected one in the background"
+    )
+    cmd.add_argument(
+        "--grid",
+        type=str,
+        nargs="?",
+        const=DEFAULT_GRID,
+        default=None,
+        metavar="COLSxROWS",
+        help=f"start with a grid of thumbnails around the selected image, {DEFAULT_GRID} by default, toggled with g"
+    )
+    cmd.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        metavar="MB",
+        help="memory limit of the decoded image cache in megabytes"
+    )
+    cmd.add_argument(
+        "--thumbnail-cache-size",
+        type=int,
+        default=1024,
+        metavar="MB",
+        help="disk limit of the thumbnail cache shared across sessions, 0 disables it"
+    )
+    cmd.add_argument(
+        "--warm-cache",
+        action="store_true",
+        default=False,
+        help="generate thumbnails for the input directory in parallel before sorting"
+    )
+    cmd.add_argument(
+        "--find-duplicates",
+        type=str,
+        nargs="?",
+        const="phash",
+        default=None,
+        choices=["exact", "ahash", "dhash", "phash"],
+        metavar="METHOD",
+        help="list only groups of duplicate images, compared by content (exact) or by ahash, dhash or phash (default)"
+    )
+    cmd.add_argument(
+        "--duplicates-in-output",
+        action="store_true",
+        default=False,
+        help="also mark files that already have an identical or similar copy in the output directories"
+    )
+    cmd.add_argument(
+        "--on-duplicate",
+        type=str,
+        default="copy",
+        choices=["copy", "skip", "link"],
+        help="when an identical file already exists in the target directory: move or copy anyway, refuse, or hard link to it"
+    )
+    cmd.add_argument(
+        "--duplicate-distance",
+        type=int,
+        default=6,
+        metavar="BITS",
+        help="maximum number of differing hash bits for two images to be grouped"
+    )
+    cmd.add_argument(
+        "--batch",
+        type=str,
+        default=None,
+        metavar="RULES_FILE",
+        help="sort by the rules of a JSON file without the interface, files no rule matches are opened for review"
+    )
+    cmd.add_argument(
+        "--dry-run",
+        action="store_true",
+        default=False,
+        help="with --batch, only report where each file would go"
+    )
+    cmd.add_argument(
+        "--batch-workers",
+        type=int,
+        default=4,
+        metavar="N",
+        help="number of files read and moved in parallel by --batch"
+    )
+    cmd.add_argument(
+        "--catalog",
+        action="store_true",
+        default=False,
+        help="keep a catalog of files and sorting decisions, unchanged directories are not rescanned"
+    )
+    cmd.add_argument(
+        "--history",
+        type=str,
+        nargs="?",
+        const="all",
+        default=None,
+        metavar="TARGET",
+        help="print the decisions recorded in the catalog, optionally only those for a target number or directory"
+    )
+    cmd.add_argument(
+        "--history-since",
+        type=str,
+        default=None,
+        metavar="DATE",
+        help="start of the --history listing, e.g. 2024-05-01 or \"2024-05-01 14:00\" (default: today)"
+    )
+    cmd.add_argument(
+        "--replay",
+        type=str,
+        default=None,
+        metavar="KEYS_FILE",
+        help="handle the keys of a file, e.g. a keys.log, without a terminal and report the latency of every key"
+    )
+    cmd.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="time every stage of the interface and write a Chrome trace with latency percentiles to FILE on exit"
+    )
+    cmd.add_argument(
+        "--log-level",
+        type=str,
+        default="info",
+        choices=["debug", "info", "warning", "error", "off"],
+        help="minimum level of messages written to the log files"
+    )
     cmd.add_argument(
         "--theme",
         type=str,
@@ -0,0 +1,4 @@
+from pathlib import Path
+
+
+DATA_DIR: Path = Path.home() / ".local/share" / "image_sorter"
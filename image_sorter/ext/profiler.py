@@ -0,0 +1,163 @@
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+
+class Histogram:
+    """Latency distribution in logarithmic buckets, 8 per power of two (about 9% resolution)"""
+
+    BUCKETS_PER_OCTAVE = 8
+
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.count: int = 0
+        self.total_ns: int = 0
+        self.max_ns: int = 0
+
+    def add(self, duration_ns: int) -> None:
+        bucket: int = int(math.log2(duration_ns) * self.BUCKETS_PER_OCTAVE) if duration_ns > 1 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+
+    def percentile(self, p: float) -> float:
+        """Returns the duration in nanoseconds `p` percent of the samples stayed below"""
+        if not self.count:
+            return 0.0
+        rank: float = self.count * p / 100
+        seen: int = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(2 ** ((bucket + 0.5) / self.BUCKETS_PER_OCTAVE), self.max_ns)
+        return float(self.max_ns)
+
+    def summary(self) -> dict[str, float]:
+        """Returns the count and the mean, p50, p95, p99 and max in milliseconds"""
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ns / self.count / 1e6 if self.count else 0.0,
+            "p50_ms": self.percentile(50) / 1e6,
+            "p95_ms": self.percentile(95) / 1e6,
+            "p99_ms": self.percentile(99) / 1e6,
+            "max_ms": self.max_ns / 1e6,
+        }
+
+
+class Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> "Span":
+        self.profiler.depth += 1
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        end: int = time.perf_counter_ns()
+        self.profiler.depth -= 1
+        self.profiler.record(self.name, self.start, end, nested=self.profiler.depth > 0)
+
+
+NO_SPAN = contextlib.nullcontext()
+
+
+class Profiler:
+    """Times named spans of the UI thread and aggregates them into histograms
+
+    While disabled `span` returns a shared no-op context manager, so the
+    instrumented code only pays for one attribute lookup and call. Spans
+    are meant for the UI thread, where they nest. Spans between two
+    `end_frame` calls form a frame, the breakdown of the last finished frame
+    is what the overlay shows. With a `trace_file` the most recent
+    `max_events` spans are also kept and written as a Chrome trace
+    (chrome://tracing, Perfetto) when the profiler is closed.
+    """
+
+    def __init__(self, trace_file: str | None = None, enabled: bool = False, max_events: int = 200_000):
+        self.trace_file: Path | None = Path(trace_file).expanduser() if trace_file else None
+        self.enabled: bool = enabled or self.trace_file is not None
+        self.histograms: dict[str, Histogram] = {}
+        self.events: deque[tuple[str, int, int, int]] = deque(maxlen=max_events)
+        self.frame: dict[str, int] = {}  # nanoseconds per span name of the running frame
+        self.frame_ns: int = 0  # time of the outermost spans, nested spans are part of them
+        self.last_frame: dict[str, int] = {}
+        self.last_frame_ns: int = 0
+        self.frames: int = 0
+        self.depth: int = 0
+        self.origin_ns: int = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        return Span(self, name) if self.enabled else NO_SPAN
+
+    def record(self, name: str, start_ns: int, end_ns: int, nested: bool = False) -> None:
+        duration: int = end_ns - start_ns
+        with self._lock:
+            if not nested:
+                self.frame_ns += duration
+            histogram: Histogram | None = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(duration)
+            self.frame[name] = self.frame.get(name, 0) + duration
+            if self.trace_file is not None:
+                self.events.append((name, start_ns, duration, threading.get_ident()))
+
+    def end_frame(self) -> None:
+        """Closes the running frame, frames without any span are skipped"""
+        if not self.frame:
+            return
+        with self._lock:
+            self.last_frame, self.frame = self.frame, {}
+            self.last_frame_ns, self.frame_ns = self.frame_ns, 0
+            self.frames += 1
+
+    def breakdown(self, limit: int = 3) -> str:
+        """Formats the slowest spans of the last frame, e.g. `frame 12.3ms: draw 8.1 preview 4.0`"""
+        if not self.last_frame:
+            return "profiling: no frame yet"
+        slowest: list[tuple[str, int]] = sorted(self.last_frame.items(), key=lambda item: -item[1])[:limit]
+        parts: str = " ".join(f"{name} {ns / 1e6:.1f}" for name, ns in slowest)
+        return f"frame {self.last_frame_ns / 1e6:.1f}ms: {parts}"
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def trace(self) -> dict:
+        """Returns the kept spans in the Chrome trace event format, timestamps in microseconds"""
+        pid: int = os.getpid()
+        with self._lock:
+            events: list[dict] = [
+                {
+                    "name": name,
+                    "cat": name.split(".", 1)[0],
+                    "ph": "X",
+                    "ts": (start - self.origin_ns) / 1000,
+                    "dur": duration / 1000,
+                    "pid": pid,
+                    "tid": tid,
+                }
+                for name, start, duration, tid in self.events
+            ]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "histograms": self.summary()}
+
+    def close(self) -> str | None:
+        """Writes the trace file, returns why it could not be written"""
+        if self.trace_file is None:
+            return None
+        try:
+            self.trace_file.write_text(json.dumps(self.trace()))
+        except OSError as e:
+            return f"Could not write the profile to {self.trace_file}: {e}"
+        return None
@@ -0,0 +1,74 @@
+import json
+from pathlib import Path
+from typing import NamedTuple
+
+from image_sorter.ext.metadata import Metadata
+from image_sorter.ext.ordering import FileFilter
+
+
+class Rule(NamedTuple):
+    """Files passing all conditions go to the target directory"""
+
+    conditions: list[FileFilter]
+    target: str
+
+    @property
+    def needs_metadata(self) -> bool:
+        return any(condition.needs_metadata for condition in self.conditions)
+
+    def matches(self, file_name: str, metadata: Metadata | None) -> bool:
+        return all(condition.matches(file_name, metadata) for condition in self.conditions)
+
+
+def load_rules(rules_file: str, output_dirs: list[str] | None = None) -> list[Rule]:
+    """Reads the rules of a JSON file, the first matching rule of a file wins
+
+        {"rules": [
+            {"match": ["ext == png"], "target": 1},
+            {"match": ["camera ~ *Pixel*", "date >= 2024-01-01"], "target": "/photos/phone"}
+        ]}
+
+    Conditions use the --filter syntax, a numeric target refers to --output-dirs.
+    """
+    try:
+        with open(rules_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f'cannot read rules file "{rules_file}": {e}') from None
+
+    entries = data.get("rules") if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f'rules file "{rules_file}" must contain a non-empty list of rules')
+
+    rules: list[Rule] = []
+    for number, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict) or "target" not in entry:
+            raise ValueError(f'rule {number} must be an object with a "target"')
+
+        expressions = entry.get("match", [])
+        if isinstance(expressions, str):
+            expressions = [expressions]
+        try:
+            conditions: list[FileFilter] = [FileFilter(expression) for expression in expressions]
+        except ValueError as e:
+            raise ValueError(f"rule {number}: {e}") from None
+
+        rules.append(Rule(conditions, resolve_target(entry["target"], output_dirs or [], number)))
+    return rules
+
+
+def resolve_target(target: int | str, output_dirs: list[str], number: int) -> str:
+    if isinstance(target, int) and not isinstance(target, bool):
+        if not 1 <= target <= len(output_dirs):
+            raise ValueError(f"rule {number}: target {target} does not match an output directory")
+        return output_dirs[target - 1]
+    if isinstance(target, str) and target:
+        return str(Path(target).expanduser())
+    raise ValueError(f"rule {number}: target must be an output directory number or a path")
+
+
+def match_rules(rules: list[Rule], file_path: Path, metadata: Metadata | None) -> Rule | None:
+    for rule in rules:
+        if rule.matches(file_path.name, metadata):
+            return rule
+    return None
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from image_sorter.ext.images import Thumbnail, encode_png, read_png_size
+from image_sorter.ext.paths import DATA_DIR
+
+
+THUMBNAILS_DIR: Path = DATA_DIR / "thumbnails"
+
+
+def store_key(file_path: Path, box: tuple[int, int], mirror: str = "none") -> str | None:
+    """Identifies a thumbnail on disk by inode, modification time, size and target box"""
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return None
+
+    identity: str = f"{stat.st_dev}:{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}:{box[0]}x{box[1]}:{mirror}"
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+class ThumbnailStore:
+    """Persistent thumbnail cache shared across sessions
+
+    Thumbnails are PNG files named after their key. Reading a thumbnail
+    touches its modification time, which is used for LRU eviction once the
+    store grows over `max_bytes`.
+    """
+
+    def __init__(self, directory: Path = THUMBNAILS_DIR, max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._size: int | None = None
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.png"
+
+    def get(self, key: str) -> Thumbnail | None:
+        path: Path = self.path(key)
+        try:
+            data: bytes = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+
+        size: tuple[int, int] | None = read_png_size(path)
+        if size is None:
+            return None
+        return data, size[0], size[1]
+
+    def put(self, key: str, thumbnail: Thumbnail) -> None:
+        path: Path = self.path(key)
+        try:
+            replaced: int = path.stat().st_size
+        except OSError:
+            replaced = 0
+        written: int = write_atomic(path, thumbnail[0])
+        with self._lock:
+            if self._size is not None:
+                self._size += written - replaced
+        self.enforce_limit()
+
+    def size(self) -> int:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(f.stat().st_size for f in self.entries())
+            return self._size
+
+    def entries(self) -> list[Path]:
+        if not self.directory.exists():
+            return []
+        return [f for f in self.directory.glob("*/*.png") if f.is_file()]
+
+    def enforce_limit(self) -> None:
+        """Removes the least recently used thumbnails until the store fits its limit"""
+        if self.size() <= self.max_bytes:
+            return
+
+        with self._lock:
+            entries: list[tuple[float, int, Path]] = []
+            for f in self.entries():
+                try:
+                    stat = f.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, f))
+            entries.sort()
+
+            self._size = sum(size for _, size, _ in entries)
+            target: int = int(self.max_bytes * 0.9)  # leave room to avoid evicting on every write
+            for _, size, f in entries:
+                if self._size <= target:
+                    break
+                try:
+                    f.unlink()
+                except OSError:
+                    continue
+                self._size -= size
+
+
+def write_atomic(path: Path, data: bytes) -> int:
+    """Writes data into a temporary file next to the target and renames it into place"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return len(data)
+
+
+def generate_thumbnail(
+    directory: Path,
+    file_path: Path,
+    box: tuple[int, int],
+    mirror: str = "none",
+) -> int:
+    """Writes the thumbnail of a file into the store unless it exists, returns the bytes written"""
+    key: str | None = store_key(file_path, box, mirror)
+    if key is None:
+        return 0
+
+    store = ThumbnailStore(directory)
+    if store.path(key).exists():
+        return 0
+
+    thumbnail: Thumbnail | None = encode_png(file_path, mirror, box)
+    if thumbnail is None:
+        return 0
+    return write_atomic(store.path(key), thumbnail[0])
+
+
+def warm_cache(
+    store: ThumbnailStore,
+    paths: list[Path],
+    box: tuple[int, int],
+    mirror: str = "none",
+    workers: int | None = None,
+) -> tuple[int, int]:
+    """Generates missing thumbnails in parallel processes, returns (generated, total)"""
+    generated: int = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(generate_thumbnail, store.directory, file_path, box, mirror)
+            for file_path in paths
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                generated += future.result() > 0
+            except Exception:
+                pass
+            print(f"\rWarming thumbnail cache: {done}/{len(paths)}", end="", flush=True)
+
+    if paths:
+        print()
+    store.enforce_limit()
+    return generated, len(paths)
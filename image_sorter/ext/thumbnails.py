@@ -0,0 +1,170 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from image_sorter.ext.images import Thumbnail, encode_png, pillow_available
+from image_sorter.ext.thumbnail_store import ThumbnailStore, store_key
+
+
+def thumbnail_key(file_path: Path, box: tuple[int, int], mirror: str = "none") -> tuple | None:
+    """Identifies a thumbnail by path, modification time, size and target box"""
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return None
+    return (file_path, stat.st_mtime_ns, stat.st_size, box, mirror)
+
+
+class ThumbnailCache:
+    """Byte-bounded LRU cache of decoded and downscaled images"""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict[tuple, Thumbnail] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: tuple) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: tuple) -> Thumbnail | None:
+        with self._lock:
+            thumbnail: Thumbnail | None = self._entries.get(key)
+            if thumbnail is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return thumbnail
+
+    def put(self, key: tuple, thumbnail: Thumbnail) -> None:
+        if len(thumbnail[0]) > self.max_bytes:
+            return
+
+        with self._lock:
+            old: Thumbnail | None = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+
+            self._entries[key] = thumbnail
+            self.size += len(thumbnail[0])
+
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted[0])
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self.size,
+            }
+
+
+class Prefetcher:
+    """Decodes the files around the cursor on a worker pool ahead of time
+
+    Decoded images are also read from and written to the optional on-disk
+    store, so each original is only decoded once across sessions.
+    """
+
+    def __init__(
+        self,
+        cache: ThumbnailCache,
+        radius: int = 4,
+        workers: int = 4,
+        store: ThumbnailStore | None = None,
+        on_done: Callable[[Path], None] | None = None,
+    ):
+        self.cache = cache
+        self.store = store
+        self.on_done = on_done  # called from the worker when a file was decoded
+        self.radius = radius
+        self.enabled: bool = pillow_available() and radius > 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image_sorter-prefetch")
+        self._pending: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, paths: list[Path], box: tuple[int, int], mirror: str = "none") -> None:
+        """Schedules decoding of the given files, queued work for other files is dropped"""
+        if not self.enabled:
+            return
+
+        wanted: dict[tuple, Path] = {}
+        for file_path in paths:
+            key: tuple | None = thumbnail_key(file_path, box, mirror)
+            if key is not None:
+                wanted[key] = file_path
+
+        with self._lock:
+            for key, future in list(self._pending.items()):
+                if key not in wanted and future.cancel():
+                    del self._pending[key]
+
+            for key, file_path in wanted.items():
+                if key in self._pending or key in self.cache:
+                    continue
+                self._pending[key] = self._pool.submit(self.decode, key)
+
+    def load(self, file_path: Path, box: tuple[int, int], mirror: str = "none") -> Thumbnail | None:
+        """Returns the thumbnail of a file, waiting for or doing the decode if needed"""
+        key: tuple | None = thumbnail_key(file_path, box, mirror)
+        if key is None:
+            return None
+
+        thumbnail: Thumbnail | None = self.cache.get(key)
+        if thumbnail is not None:
+            return thumbnail
+
+        with self._lock:
+            future: Future | None = self._pending.get(key)
+            if future is not None and future.cancel():
+                del self._pending[key]
+                future = None
+
+        if future is not None:
+            return future.result()  # already being decoded by a worker
+        return self.decode(key)
+
+    def decode(self, key: tuple) -> Thumbnail | None:
+        file_path, _, _, box, mirror = key
+        try:
+            stored_key: str | None = None
+            if self.store is not None:
+                stored_key = store_key(file_path, box, mirror)
+                thumbnail: Thumbnail | None = self.store.get(stored_key) if stored_key else None
+                if thumbnail is not None:
+                    self.cache.put(key, thumbnail)
+                    self.notify(file_path)
+                    return thumbnail
+
+            thumbnail = encode_png(file_path, mirror, box)
+            if thumbnail is not None:
+                self.cache.put(key, thumbnail)
+                if stored_key is not None:
+                    self.store.put(stored_key, thumbnail)
+                self.notify(file_path)
+            return thumbnail
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def ready(self, file_path: Path, box: tuple[int, int], mirror: str = "none") -> bool:
+        """Returns True if the thumbnail can be loaded without decoding"""
+        key: tuple | None = thumbnail_key(file_path, box, mirror)
+        return key is not None and key in self.cache
+
+    def notify(self, file_path: Path) -> None:
+        if self.on_done is not None:
+            self.on_done(file_path)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
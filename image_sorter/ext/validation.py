@@ -1,4 +1,11 @@
-from image_sorter.ext.loggers import Logger
+import re
+from pathlib import Path
+
+from image_sorter.ext.duplicates import DUPLICATE_METHODS, duplicates_available
+from image_sorter.ext.loggers import LEVELS, Logger, read_keys
+from image_sorter.ext.ordering import FileFilter, parse_date, parse_sort
+from image_sorter.ext.rules import load_rules
+from image_sorter.ext.watcher import inotify_available
 
 
 def validate_args(args):
@@ -7,18 +14,70 @@ def validate_args(args):
     if args.help or args.version:
         return
 
-    if not args.input_dir:
+    if not args.input_dir and args.history is None:
         message: str = '"input_dir" is required'
-    elif not args.output_dirs:
+    elif not args.output_dirs and args.history is None:
         message: str = '"output_dirs" is required'
     elif not isinstance(args.copy_mode, bool):
         message: str = '"copy_mode" must be a boolean'
+    elif not isinstance(args.link, bool):
+        message: str = '"link" must be a boolean'
     elif not isinstance(args.safe_delete, bool):
         message: str = '"safe_delete" must be a boolean'
     elif not isinstance(args.tree, bool):
         message: str = '"tree" must be a boolean'
+    elif not isinstance(args.depth, int) or args.depth < 0:
+        message: str = '"depth" must be a non-negative integer'
+    elif not isinstance(args.scan_workers, int) or args.scan_workers < 1:
+        message: str = '"scan_workers" must be a positive integer'
+    elif args.sort is not None and args.find_duplicates is not None:
+        message: str = '"sort" cannot be combined with "find_duplicates", duplicates are listed by group'
+    elif sort_and_filter_error(args) is not None:
+        message: str = sort_and_filter_error(args)
+    elif not isinstance(args.watch, bool):
+        message: str = '"watch" must be a boolean'
+    elif args.watch and not inotify_available():
+        message: str = '"watch" requires inotify support (Linux only)'
     elif not isinstance(args.auto_rename, int):
         message: str = '"auto_rename" must be an integer or None'
+    elif not isinstance(args.prefetch, int) or args.prefetch < 0:
+        message: str = '"prefetch" must be a non-negative integer'
+    elif args.grid is not None and not re.fullmatch(r"([1-9]|10)x([1-9]|10)", args.grid):
+        message: str = '"grid" must be COLSxROWS with 1 to 10 columns and rows, e.g. 4x3'
+    elif not isinstance(args.cache_size, int) or args.cache_size < 0:
+        message: str = '"cache_size" must be a non-negative integer'
+    elif not isinstance(args.thumbnail_cache_size, int) or args.thumbnail_cache_size < 0:
+        message: str = '"thumbnail_cache_size" must be a non-negative integer'
+    elif not isinstance(args.warm_cache, bool):
+        message: str = '"warm_cache" must be a boolean'
+    elif args.find_duplicates is not None and args.find_duplicates not in DUPLICATE_METHODS:
+        message: str = f'"find_duplicates" must be one of {", ".join(DUPLICATE_METHODS)}'
+    elif args.find_duplicates is not None and not duplicates_available(args.find_duplicates):
+        message: str = f'"find_duplicates {args.find_duplicates}" requires Pillow and NumPy'
+    elif not isinstance(args.duplicates_in_output, bool):
+        message: str = '"duplicates_in_output" must be a boolean'
+    elif args.on_duplicate not in ("copy", "skip", "link"):
+        message: str = '"on_duplicate" must be one of copy, skip, link'
+    elif not isinstance(args.duplicate_distance, int) or not 0 <= args.duplicate_distance <= 64:
+        message: str = '"duplicate_distance" must be an integer between 0 and 64'
+    elif args.batch is not None and args.find_duplicates is not None:
+        message: str = '"batch" cannot be combined with "find_duplicates"'
+    elif args.dry_run and args.batch is None:
+        message: str = '"dry_run" requires "batch"'
+    elif not isinstance(args.batch_workers, int) or args.batch_workers < 1:
+        message: str = '"batch_workers" must be a positive integer'
+    elif batch_rules_error(args) is not None:
+        message: str = batch_rules_error(args)
+    elif not isinstance(args.catalog, bool):
+        message: str = '"catalog" must be a boolean'
+    elif history_error(args) is not None:
+        message: str = history_error(args)
+    elif replay_error(args) is not None:
+        message: str = replay_error(args)
+    elif args.profile is not None and not Path(args.profile).expanduser().parent.is_dir():
+        message: str = f'"profile" directory {Path(args.profile).expanduser().parent} does not exist'
+    elif args.log_level not in LEVELS:
+        message: str = f'"log_level" must be one of {", ".join(LEVELS)}'
     elif not isinstance(args.theme, str):
         message: str = '"theme" must be a string'
     else:
@@ -28,6 +87,55 @@ def validate_args(args):
     raise ValidationError(message)
 
 
+def sort_and_filter_error(args) -> str | None:
+    """Returns the parse error of the --sort or --filter expressions, if any"""
+    try:
+        if args.sort is not None:
+            parse_sort(args.sort)
+        for expression in args.filter or []:
+            FileFilter(expression)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def batch_rules_error(args) -> str | None:
+    """Returns why the --batch rules file cannot be used, if it cannot"""
+    if args.batch is None:
+        return None
+    try:
+        load_rules(args.batch, args.output_dirs)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def history_error(args) -> str | None:
+    """Returns why the --history target or --history-since date is invalid, if it is"""
+    if args.history_since is not None:
+        try:
+            parse_date(args.history_since)
+        except ValueError as e:
+            return str(e)
+    if args.history is not None and args.history.isdigit():
+        if not 1 <= int(args.history) <= len(args.output_dirs or []):
+            return f'"history" target {args.history} does not match an output directory'
+    return None
+
+
+def replay_error(args) -> str | None:
+    """Returns why the --replay key file cannot be replayed, if it cannot"""
+    if args.replay is None:
+        return None
+    if args.batch is not None:
+        return '"replay" cannot be combined with "batch"'
+    try:
+        read_keys(args.replay)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
 class ValidationError(ValueError):
     def __init__(self, message):
         self.message = message
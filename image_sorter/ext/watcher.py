@@ -0,0 +1,173 @@
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from image_sorter.ext.get_files import scan_directory
+
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def load_libc() -> ctypes.CDLL | None:
+    """Loads libc with the inotify functions or returns None on unsupported platforms"""
+    if not sys.platform.startswith("linux"):
+        return None
+
+    libc_name: str | None = ctypes.util.find_library("c")
+    try:
+        libc = ctypes.CDLL(libc_name or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def inotify_available() -> bool:
+    return load_libc() is not None
+
+
+class DirectoryWatcher(threading.Thread):
+    """Background thread turning inotify events into file list deltas
+
+    Events are put on `events` as `(kind, path)` tuples, where kind is one of
+    "created", "deleted", "created_dir", "deleted_dir" and "rescan". A
+    "rescan" of the root means the kernel queue overflowed and events were
+    lost, the whole tree has to be read again. Subdirectories are watched up
+    to `depth` levels below the root. `notify` is called from the
+    watcher thread after new events were queued.
+    """
+
+    def __init__(
+        self,
+        directory_path: str,
+        depth: int = 0,
+        notify: Callable[[], None] | None = None,
+    ):
+        super().__init__(name="image_sorter-watcher", daemon=True)
+        self.root = Path(directory_path)
+        self.depth = depth
+        self.notify = notify
+        self.events: queue.Queue[tuple[str, Path]] = queue.Queue()
+
+        self._libc = load_libc()
+        if self._libc is None:
+            raise OSError("inotify is not available on this platform")
+
+        self._fd: int = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._stop_read, self._stop_write = os.pipe()
+        self._watches: dict[int, tuple[Path, int]] = {}  # watch descriptor -> (directory, depth)
+
+        self.add_watch(self.root, 0)
+
+    def add_watch(self, directory: Path, depth: int) -> None:
+        """Watches a directory and its subdirectories down to the maximum depth"""
+        wd: int = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'Watching directory "{directory}" failed')
+        self._watches[wd] = (directory, depth)
+
+        if depth < self.depth:
+            _, subdirs = scan_directory(directory, set())
+            for subdir in subdirs:
+                self.add_watch(subdir, depth + 1)
+
+    def remove_watch(self, directory: Path) -> None:
+        """Stops watching a directory and everything below it"""
+        for wd, (watched, _) in list(self._watches.items()):
+            if watched == directory or directory in watched.parents:
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._watches[wd]
+
+    def stop(self) -> None:
+        os.write(self._stop_write, b"\0")
+
+    def run(self) -> None:
+        try:
+            while True:
+                readable, _, _ = select.select([self._fd, self._stop_read], [], [])
+                if self._stop_read in readable:
+                    break
+
+                try:
+                    buffer: bytes = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                self.parse_events(buffer)
+                if self.notify is not None and not self.events.empty():
+                    self.notify()
+        finally:
+            os.close(self._fd)
+            os.close(self._stop_read)
+            os.close(self._stop_write)
+
+    def parse_events(self, buffer: bytes) -> None:
+        offset: int = 0
+        while offset < len(buffer):
+            wd, mask, _cookie, name_len = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name: str = os.fsdecode(buffer[offset:offset + name_len].rstrip(b"\0"))
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                self.handle_overflow()
+                continue
+
+            watch: tuple[Path, int] | None = self._watches.get(wd)
+            if watch is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_IGNORED):
+                if mask & IN_IGNORED:
+                    del self._watches[wd]
+                continue
+
+            directory, depth = watch
+            self.handle_event(mask, directory / name, depth)
+
+    def handle_overflow(self) -> None:
+        """Watches the directories created while events were lost and asks for a rescan"""
+        try:
+            self.add_watch(self.root, 0)  # watching a directory again keeps its watch descriptor
+        except OSError:
+            pass
+        self.events.put(("rescan", self.root))
+
+    def handle_event(self, mask: int, path: Path, depth: int) -> None:
+        if mask & IN_ISDIR:
+            if depth >= self.depth:
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self.add_watch(path, depth + 1)
+                except OSError:
+                    return
+                self.events.put(("created_dir", path))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.remove_watch(path)
+                self.events.put(("deleted_dir", path))
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self.events.put(("created", path))
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self.events.put(("deleted", path))
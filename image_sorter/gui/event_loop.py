@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import os
+import selectors
+import signal
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+
+class Timer:
+    """Handle of a callback scheduled with `EventLoop.call_later`"""
+
+    def __init__(self, when: float, callback: Callable[[], None]):
+        self.when = when
+        self.callback = callback
+        self.cancelled: bool = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class EventLoop:
+    """Single-threaded loop multiplexing file descriptors, timers and wakeups
+
+    Background threads never touch the UI directly, they hand callbacks to
+    `call_soon_threadsafe`, which wakes the loop through a self-pipe.
+    Signals are handed over with `add_signal_handler`.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.running: bool = False
+        self._timers: list[tuple[float, int, Timer]] = []
+        self._sequence = itertools.count()
+        self._callbacks: deque[Callable[[], None]] = deque()
+        self._lock = threading.Lock()
+        self.on_iteration: Callable[[], None] | None = None  # runs after the callbacks of every wakeup
+        self._signal_handlers: dict[int, Callable[[], None]] = {}
+        self._signals_pending: dict[int, bool] = {}  # set by the signal handler, which must not take `_lock`
+        self._previous_handlers: dict[int, object] = {}
+
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+        self.selector.register(self._wake_read, selectors.EVENT_READ, self._drain_wakeups)
+
+    def add_reader(self, fd: int, callback: Callable[[], None]) -> None:
+        self.selector.register(fd, selectors.EVENT_READ, callback)
+
+    def remove_reader(self, fd: int) -> None:
+        self.selector.unregister(fd)
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> Timer:
+        timer = Timer(time.monotonic() + delay, callback)
+        heapq.heappush(self._timers, (timer.when, next(self._sequence), timer))
+        return timer
+
+    def call_soon_threadsafe(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            self._callbacks.append(callback)
+        try:
+            os.write(self._wake_write, b"\0")
+        except BlockingIOError:
+            pass  # the pipe is full, the loop is going to wake up anyway
+
+    def add_signal_handler(self, signum: int, callback: Callable[[], None]) -> None:
+        """Runs `callback` on the loop after the signal arrived, repeated signals are coalesced"""
+        self._signal_handlers[signum] = callback
+        self._signals_pending[signum] = False
+        self._previous_handlers.setdefault(signum, signal.getsignal(signum))
+        signal.signal(signum, self._on_signal)
+
+    def _on_signal(self, signum: int, _frame) -> None:
+        # runs between two bytecodes of the main thread, possibly inside
+        # call_soon_threadsafe, so it only sets a flag and wakes the loop
+        self._signals_pending[signum] = True
+        try:
+            os.write(self._wake_write, b"\0")
+        except BlockingIOError:
+            pass
+
+    def run(self) -> None:
+        self.running = True
+        while self.running:
+            self.run_once()
+
+    def stop(self) -> None:
+        self.running = False
+
+    def run_once(self, block: bool = True) -> None:
+        """Waits for the next event and runs every callback that became ready
+
+        Without `block` only what is ready right now runs.
+        """
+        timeout: float | None = None if block else 0.0
+        if self._timers and block:
+            timeout = max(0.0, self._timers[0][0] - time.monotonic())
+
+        for key, _ in self.selector.select(timeout):
+            key.data()
+
+        now: float = time.monotonic()
+        while self._timers and self._timers[0][0] <= now:
+            _, _, timer = heapq.heappop(self._timers)
+            if not timer.cancelled:
+                timer.callback()
+
+        for signum, handler in self._signal_handlers.items():
+            if self._signals_pending[signum]:
+                self._signals_pending[signum] = False
+                handler()
+
+        while True:
+            with self._lock:
+                if not self._callbacks:
+                    break
+                callback = self._callbacks.popleft()
+            callback()
+
+        if self.on_iteration is not None:
+            self.on_iteration()
+
+    def _drain_wakeups(self) -> None:
+        try:
+            while os.read(self._wake_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        for signum, previous in self._previous_handlers.items():
+            signal.signal(signum, previous)  # the wake pipe is closed below
+        self.selector.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
@@ -0,0 +1,43 @@
+from collections import deque
+from collections.abc import Callable, Iterable
+
+
+class TerminalInput:
+    """Reads keys from the terminal through a curses window
+
+    Every key is passed to `on_key`, which writes `keys.log`, so a session
+    can be replayed with `--replay` later.
+    """
+
+    def __init__(self, window, on_key: Callable[[int], None] | None = None):
+        self.window = window
+        self.on_key = on_key
+
+    def get_key(self, wait: bool = False) -> int:
+        """Returns the next key, -1 if none is queued and `wait` is not set"""
+        if wait:
+            self.window.nodelay(False)
+            try:
+                key: int = self.window.getch()
+            finally:
+                self.window.nodelay(True)
+        else:
+            key = self.window.getch()
+
+        if key != -1 and self.on_key is not None:
+            self.on_key(key)
+        return key
+
+
+class ReplayInput:
+    """Feeds a recorded key stream, -1 marks its end even when waiting for a key"""
+
+    def __init__(self, keys: Iterable[int]):
+        self.keys: deque[int] = deque(keys)
+
+    def get_key(self, wait: bool = False) -> int:
+        return self.keys.popleft() if self.keys else -1
+
+    @property
+    def pending(self) -> int:
+        return len(self.keys)
@@ -0,0 +1,229 @@
+import base64
+import fcntl
+import math
+import struct
+import sys
+import termios
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+
+from image_sorter.ext.images import encode_png, read_png_size
+
+
+class KittyRenderer:
+    """Displays images in-process through the kitty graphics protocol
+
+    Every image is transmitted once under its own id and then only placed or
+    removed by id. Nothing is written when the selection and the geometry did
+    not change since the last frame.
+    """
+
+    CHUNK_SIZE = 4096
+    MAX_IMAGES = 64  # images kept in the terminal memory
+    TILE_PLACEMENT = 2  # placement id of the first grid tile, the single image uses 1
+
+    def __init__(self, out=None, loader: Callable | None = None, tile_loader: Callable | None = None):
+        self.out = out or sys.stdout.buffer
+        self.loader = loader or encode_png  # (file path, mirror) -> (PNG data, width, height)
+        self.tile_loader = tile_loader  # same for the downscaled images of the grid
+        self.max_images: int = self.MAX_IMAGES
+        self._images: OrderedDict[tuple, tuple[int, int, int]] = OrderedDict()
+        self._next_id: int = 1
+        self._placed: tuple | None = None  # (image id, geometry) of the visible image
+        self._tiles: dict[int, tuple[int, tuple]] = {}  # placement id -> (image id, geometry) of the grid
+
+    def show(
+        self,
+        file_path: Path,
+        left: int,
+        top: int,
+        cols: int,
+        rows: int,
+        mirror: str = "none",
+    ) -> bool:
+        """Places an image into the cell box, returns False if it cannot be transmitted"""
+        image: tuple[int, int, int] | None = self.image(file_path, mirror)
+        if image is None:
+            return False
+
+        image_id, width, height = image
+        geometry: tuple[int, int, int, int] = (left, top, cols, rows)
+        if self._placed == (image_id, geometry):
+            return True
+
+        self.clear()
+        place_cols, place_rows = self.fit(width, height, cols, rows)
+        self.write(
+            f"\x1b7\x1b[{top + 1};{left + 1}H".encode()
+            + self.command(a="p", i=image_id, p=1, c=place_cols, r=place_rows, C=1)
+            + b"\x1b8"
+        )
+        self._placed = (image_id, geometry)
+        return True
+
+    def show_tiles(self, tiles: list[tuple[Path, int, int, int, int] | None], mirror: str = "none") -> list[bool]:
+        """Places downscaled images into several cell boxes, e.g. the tiles of the grid view
+
+        A tile keeps its placement while its image and box stay the same, so
+        scrolling the grid only moves the images that changed tiles, and
+        images already in the terminal are not sent again. None leaves a
+        tile empty. Returns for every tile whether its image is shown.
+        """
+        if self._placed is not None:
+            self.write(self.command(a="d", d="i", i=self._placed[0], p=1), flush=False)
+            self._placed = None
+
+        shown: list[bool] = []
+        wanted: dict[int, tuple[int, tuple, int, int]] = {}
+        for n, tile in enumerate(tiles):
+            image: tuple[int, int, int] | None = None
+            if tile is not None:
+                image = self.image(tile[0], mirror, tile=True)
+            if image is not None:
+                image_id, width, height = image
+                wanted[self.TILE_PLACEMENT + n] = (image_id, tuple(tile[1:]), width, height)
+            shown.append(image is not None)
+
+        commands = bytearray()
+        for placement, (image_id, geometry) in list(self._tiles.items()):
+            if wanted.get(placement, (None, None))[:2] != (image_id, geometry):
+                commands += self.command(a="d", d="i", i=image_id, p=placement)
+                del self._tiles[placement]
+        for placement, (image_id, geometry, width, height) in wanted.items():
+            if placement in self._tiles:
+                continue
+            left, top, cols, rows = geometry
+            place_cols, place_rows = self.fit(width, height, cols, rows)
+            commands += (
+                f"\x1b7\x1b[{top + 1};{left + 1}H".encode()
+                + self.command(a="p", i=image_id, p=placement, c=place_cols, r=place_rows, C=1)
+                + b"\x1b8"
+            )
+            self._tiles[placement] = (image_id, geometry)
+        self.write(bytes(commands))
+        return shown
+
+    def image(self, file_path: Path, mirror: str, tile: bool = False) -> tuple[int, int, int] | None:
+        """Returns (image id, width, height) of a file, transmitting it on first use"""
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return None
+
+        key: tuple = (file_path, stat.st_mtime_ns, stat.st_size, mirror, tile)
+        image: tuple[int, int, int] | None = self._images.get(key)
+        if image is None:
+            image = self.transmit(file_path, mirror, tile)
+            if image is None:
+                return None
+            self._images[key] = image
+            self.evict()
+        self._images.move_to_end(key)
+        return image
+
+    def transmitted(self, file_path: Path, mirror: str, tile: bool = False) -> bool:
+        """Returns True if the current version of a file is already in the terminal"""
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return False
+        return (file_path, stat.st_mtime_ns, stat.st_size, mirror, tile) in self._images
+
+    def transmit(self, file_path: Path, mirror: str, tile: bool = False) -> tuple[int, int, int] | None:
+        """Sends the image data to the terminal and returns (image id, width, height)"""
+        image_id: int = self._next_id
+        encoded = self.tile_loader(file_path, mirror) if tile and self.tile_loader is not None else None
+        size: tuple[int, int] | None = None if mirror != "none" or encoded is not None else read_png_size(file_path)
+
+        if size is not None:
+            # PNG files are read by the terminal itself, only the path is sent
+            payload: bytes = base64.standard_b64encode(str(file_path.resolve()).encode())
+            self.write(self.command(payload, a="t", f=100, t="f", i=image_id))
+        else:
+            encoded = encoded or self.loader(file_path, mirror)
+            if encoded is None:
+                return None
+            data, *size = encoded
+            self.transmit_data(image_id, data)
+
+        self._next_id += 1
+        return image_id, size[0], size[1]
+
+    def transmit_data(self, image_id: int, data: bytes) -> None:
+        """Sends PNG bytes directly in base64 chunks"""
+        payload: bytes = base64.standard_b64encode(data)
+        chunks: list[bytes] = [
+            payload[i:i + self.CHUNK_SIZE] for i in range(0, len(payload), self.CHUNK_SIZE)
+        ] or [b""]
+
+        for n, chunk in enumerate(chunks):
+            more: int = int(n < len(chunks) - 1)
+            if n == 0:
+                self.write(self.command(chunk, a="t", f=100, t="d", i=image_id, m=more), flush=False)
+            else:
+                self.write(self.command(chunk, m=more), flush=False)
+        self.out.flush()
+
+    def fit(self, width: int, height: int, cols: int, rows: int) -> tuple[int, int]:
+        """Scales the image into the cell box keeping its aspect ratio, never scaling up"""
+        cell_width, cell_height = self.cell_size()
+        if not cell_width or not cell_height or not width or not height:
+            return cols, rows
+
+        scale: float = min(1.0, cols * cell_width / width, rows * cell_height / height)
+        return (
+            max(1, min(cols, math.ceil(width * scale / cell_width))),
+            max(1, min(rows, math.ceil(height * scale / cell_height))),
+        )
+
+    def cell_size(self) -> tuple[int, int]:
+        """Returns the size of a terminal cell in pixels or zeros if it is unknown"""
+        try:
+            packed: bytes = fcntl.ioctl(self.out.fileno(), termios.TIOCGWINSZ, b"\0" * 8)
+        except (OSError, ValueError, AttributeError):
+            return 0, 0
+
+        rows, cols, x_pixels, y_pixels = struct.unpack("HHHH", packed)
+        if not rows or not cols:
+            return 0, 0
+        return x_pixels // cols, y_pixels // rows
+
+    def clear(self) -> None:
+        """Removes the visible placements, the image data stays in the terminal"""
+        if self._placed is None and not self._tiles:
+            return
+        commands = bytearray()
+        if self._placed is not None:
+            commands += self.command(a="d", d="i", i=self._placed[0], p=1)
+        for placement, (image_id, _) in self._tiles.items():
+            commands += self.command(a="d", d="i", i=image_id, p=placement)
+        self.write(bytes(commands))
+        self._placed = None
+        self._tiles.clear()
+
+    def evict(self) -> None:
+        while len(self._images) > self.max_images:
+            _, (image_id, _, _) = self._images.popitem(last=False)
+            if self._placed is not None and self._placed[0] == image_id:
+                self._placed = None
+            self._tiles = {k: v for k, v in self._tiles.items() if v[0] != image_id}
+            self.write(self.command(a="d", d="I", i=image_id))
+
+    def close(self) -> None:
+        """Deletes every image transmitted during the session"""
+        for image_id, _, _ in self._images.values():
+            self.write(self.command(a="d", d="I", i=image_id), flush=False)
+        self.out.flush()
+        self._images.clear()
+        self._placed = None
+        self._tiles.clear()
+
+    def command(self, payload: bytes = b"", **keys) -> bytes:
+        control: str = ",".join(f"{k}={v}" for k, v in keys.items())
+        return b"\x1b_G" + f"{control},q=2".encode() + b";" + payload + b"\x1b\\"
+
+    def write(self, data: bytes, flush: bool = True) -> None:
+        self.out.write(data)
+        if flush:
+            self.out.flush()
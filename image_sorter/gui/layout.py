@@ -0,0 +1,95 @@
+from collections.abc import Callable
+
+from image_sorter.ext.file_index import FileIndex
+
+
+class FileListLayout:
+    """Cached row layout of the file list column
+
+    Column widths only depend on the number of files and the longest label,
+    so they are recomputed when the index version changes. Formatted rows are
+    cached per position, which keeps the cost of a frame proportional to the
+    number of visible rows.
+    """
+
+    MAX_CACHED_ROWS = 4096
+
+    def __init__(self, index: FileIndex, marker: Callable[[int], str] | None = None):
+        self.index = index
+        self.marker = marker  # optional one character column, e.g. duplicate groups
+        self.version: int = -1
+        self.index_width: int = 0
+        self.label_width: int = 0
+        self.line_width: int = 0
+        self._rows: dict[int, str] = {}
+
+    def update(self) -> None:
+        if self.version == self.index.version:
+            return
+
+        self.version = self.index.version
+        self.index_width = len(str(len(self.index)))
+        self.label_width = self.index.max_label_length() + (2 if self.marker is not None else 0)
+        self._rows.clear()
+
+    def row(self, pos: int, line_width: int = 0) -> str:
+        """Returns the formatted line for the file at the given position"""
+        self.update()
+        if line_width != self.line_width:
+            self.line_width = line_width
+            self._rows.clear()
+
+        line: str | None = self._rows.get(pos)
+        if line is None:
+            if len(self._rows) >= self.MAX_CACHED_ROWS:
+                self._rows.clear()
+
+            label: str = self.index.label(pos)
+            if self.marker is not None:
+                label = f"{self.marker(pos)} {label}"
+            line = f"{pos:>{self.index_width}}  {label:<{self.label_width}}"
+            line = line.ljust(line_width)
+            self._rows[pos] = line
+        return line
+
+    def rows(self, start: int, count: int, line_width: int = 0) -> list[str]:
+        """Returns the formatted lines of the visible window starting at `start`"""
+        stop: int = min(start + count, len(self.index))
+        return [self.row(pos, line_width) for pos in range(start, stop)]
+
+
+class GridLayout:
+    """Pages of the thumbnail grid around the cursor
+
+    The page scrolls by whole rows, so after a scroll most files stay on
+    screen and only change their tile.
+    """
+
+    def __init__(self, columns: int, rows: int):
+        self.columns = columns
+        self.rows = rows
+        self.start: int = 0  # position of the file in the top-left tile
+
+    @property
+    def size(self) -> int:
+        return self.columns * self.rows
+
+    def page(self, pos: int, count: int) -> range:
+        """Scrolls the page until `pos` is on it and returns the positions of its tiles"""
+        if pos < self.start:
+            self.start = pos // self.columns * self.columns
+        elif pos >= self.start + self.size:
+            self.start = (pos // self.columns - self.rows + 1) * self.columns
+        last_row: int = max(0, (count - 1) // self.columns - self.rows + 1) * self.columns
+        self.start = max(0, min(self.start, last_row))
+        return range(self.start, min(self.start + self.size, count))
+
+    def tiles(self, left: int, top: int, width: int, height: int) -> list[tuple[int, int, int, int]]:
+        """Splits a cell box into the tiles of the page, as left, top, width and height"""
+        tile_width: int = max(2, width // self.columns)
+        tile_height: int = max(2, height // self.rows)
+        return [
+            (left + column * tile_width, top + row * tile_height, tile_width, tile_height)
+            for row in range(self.rows)
+            for column in range(self.columns)
+        ]
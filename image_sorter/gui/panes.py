@@ -0,0 +1,41 @@
+import curses
+
+
+class Pane:
+    """Curses window of a single screen region
+
+    Panes are drawn with `noutrefresh` and flushed together by a single
+    `curses.doupdate`, so only the regions that were touched are sent to the
+    terminal.
+    """
+
+    def __init__(self, y: int, x: int, height: int, width: int, border: bool = True):
+        self.y, self.x = y, x
+        self.height, self.width = height, width
+        self.border = border
+        self.window = curses.newwin(height, width, y, x)
+
+    def clear(self) -> None:
+        """Erases the whole pane and redraws its border"""
+        self.window.erase()
+        if self.border:
+            # TODO: apply colors to borders from the color scheme
+            self.window.box()
+
+    def clear_row(self, y: int) -> None:
+        """Erases a single row inside the border"""
+        inner: int = 1 if self.border else 0
+        if inner <= y < self.height - inner:
+            self.window.addstr(y, inner, " " * (self.width - 2 * inner))
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        """Writes text clipped to the pane so it never overflows into the neighbours"""
+        limit: int = self.width - x - (1 if self.border else 0)
+        if 0 <= y < self.height and limit > 0:
+            try:
+                self.window.addnstr(y, x, text, limit, attr)
+            except curses.error:
+                pass  # writing the bottom-right cell of a window moves the cursor out of it
+
+    def refresh(self) -> None:
+        self.window.noutrefresh()
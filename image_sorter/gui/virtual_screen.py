@@ -0,0 +1,170 @@
+import contextlib
+import curses
+from collections.abc import Iterator
+
+
+class VirtualWindow:
+    """In-memory stand-in for a curses window
+
+    Implements the window methods the sorter and `curses.textpad.Textbox`
+    use. Text is kept without attributes, so tests and replays can inspect
+    what would be on the screen; writing past the bottom-right cell raises
+    `curses.error` like curses does.
+    """
+
+    def __init__(self, height: int, width: int, y: int = 0, x: int = 0):
+        self.height, self.width = max(1, height), max(1, width)
+        self.begin_y, self.begin_x = y, x
+        self.rows: list[list[str]] = [[" "] * self.width for _ in range(self.height)]
+        self.cursor_y: int = 0
+        self.cursor_x: int = 0
+        self.written: int = 0  # characters written, a proxy for the drawing work
+
+    def getmaxyx(self) -> tuple[int, int]:
+        return self.height, self.width
+
+    def getbegyx(self) -> tuple[int, int]:
+        return self.begin_y, self.begin_x
+
+    def getyx(self) -> tuple[int, int]:
+        return self.cursor_y, self.cursor_x
+
+    def move(self, y: int, x: int) -> None:
+        if not (0 <= y < self.height and 0 <= x < self.width):
+            raise curses.error("move() returned ERR")
+        self.cursor_y, self.cursor_x = y, x
+
+    def put(self, text: str) -> None:
+        """Writes at the cursor and wraps like curses"""
+        while text:
+            chunk: str = text[:self.width - self.cursor_x]
+            text = text[len(chunk):]
+            self.rows[self.cursor_y][self.cursor_x:self.cursor_x + len(chunk)] = chunk
+            self.written += len(chunk)
+            self.cursor_x += len(chunk)
+            if self.cursor_x == self.width:
+                if self.cursor_y == self.height - 1:
+                    self.cursor_x = self.width - 1
+                    raise curses.error("addstr() returned ERR")
+                self.cursor_x = 0
+                self.cursor_y += 1
+
+    def addstr(self, *args) -> None:
+        """addstr([y, x,] text[, attr])"""
+        if len(args) >= 3:
+            self.move(args[0], args[1])
+            args = args[2:]
+        self.put(args[0])
+
+    def addnstr(self, *args) -> None:
+        """addnstr([y, x,] text, n[, attr])"""
+        if len(args) >= 4:
+            self.move(args[0], args[1])
+            args = args[2:]
+        self.put(args[0][:args[1]])
+
+    def addch(self, *args) -> None:
+        """addch([y, x,] ch[, attr])"""
+        if len(args) >= 3:
+            self.move(args[0], args[1])
+            args = args[2:]
+        char = args[0]
+        self.put(chr(char & 0xFF) if isinstance(char, int) else char)
+
+    def inch(self, *args) -> int:
+        y, x = args if args else (self.cursor_y, self.cursor_x)
+        return ord(self.rows[y][x])
+
+    def insch(self, *args) -> None:
+        if len(args) >= 3:
+            self.move(args[0], args[1])
+            args = args[2:]
+        char = args[0]
+        row: list[str] = self.rows[self.cursor_y]
+        row.insert(self.cursor_x, chr(char & 0xFF) if isinstance(char, int) else char)
+        row.pop()
+
+    def delch(self, *args) -> None:
+        if args:
+            self.move(*args)
+        row: list[str] = self.rows[self.cursor_y]
+        del row[self.cursor_x]
+        row.append(" ")
+
+    def clrtoeol(self) -> None:
+        row: list[str] = self.rows[self.cursor_y]
+        row[self.cursor_x:] = [" "] * (self.width - self.cursor_x)
+
+    def deleteln(self) -> None:
+        del self.rows[self.cursor_y]
+        self.rows.append([" "] * self.width)
+
+    def insertln(self) -> None:
+        self.rows.insert(self.cursor_y, [" "] * self.width)
+        self.rows.pop()
+
+    def erase(self) -> None:
+        for row in self.rows:
+            row[:] = [" "] * self.width
+        self.cursor_y = self.cursor_x = 0
+
+    clear = erase
+
+    def box(self, *args) -> None:
+        for row in (self.rows[0], self.rows[-1]):
+            row[:] = ["─"] * self.width
+        for row in self.rows:
+            row[0] = row[-1] = "│"
+
+    def hline(self, *args) -> None:
+        pass
+
+    vline = hline
+
+    def getch(self) -> int:
+        return -1  # keys come from the input of the sorter, see `image_sorter.gui.input`
+
+    def keypad(self, flag: bool) -> None:
+        pass
+
+    nodelay = keypad
+
+    def refresh(self) -> None:
+        pass
+
+    noutrefresh = refresh
+
+    def text(self) -> str:
+        return "\n".join("".join(row).rstrip() for row in self.rows)
+
+
+@contextlib.contextmanager
+def virtual_curses(height: int = 40, width: int = 160) -> Iterator[VirtualWindow]:
+    """Replaces the curses functions that need a terminal and yields the standard screen"""
+    def ignore(*args) -> None:
+        pass
+
+    replacements: dict = {
+        "curs_set": ignore,
+        "raw": ignore,
+        "doupdate": ignore,
+        "start_color": ignore,
+        "use_default_colors": ignore,
+        "init_pair": ignore,
+        "resizeterm": ignore,
+        "color_pair": lambda n: n << 8,
+        "COLORS": 256,
+        "newwin": lambda height, width, y=0, x=0: VirtualWindow(height, width, y, x),
+    }
+    missing = object()
+    originals: dict = {name: getattr(curses, name, missing) for name in replacements}
+    for name, value in replacements.items():
+        setattr(curses, name, value)
+    try:
+        yield VirtualWindow(height, width)
+    finally:
+        for name, value in originals.items():
+            if value is missing:
+                delattr(curses, name)
+            else:
+                setattr(curses, name, value)
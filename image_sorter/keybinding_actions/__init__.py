@@ -1,12 +1,21 @@
 from .move import move_file
+from .bulk import move_files, delete_files
 from .delete import delete_file
 from .rename import rename_file
 from .open import open_with_system_app
+from .operations import Operation, OperationQueue
+from .journal import Journal, JournalEntry
 
 
 __all__ = [
     "move_file",
+    "move_files",
+    "delete_files",
     "delete_file",
     "rename_file",
     "open_with_system_app",
+    "Operation",
+    "OperationQueue",
+    "Journal",
+    "JournalEntry",
 ]
@@ -0,0 +1,92 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from image_sorter.ext.identical import find_identical
+from image_sorter.keybinding_actions.delete import delete_file
+from image_sorter.keybinding_actions.move import NumberAllocator, create_target_dir, get_allocator, transfer_file
+from image_sorter.keybinding_actions.operations import JournalHook
+
+
+def move_files(
+    file_paths: list[Path],
+    target_dir: str,
+    auto_rename: int,
+    copy_mode: bool,
+    on_duplicate: str = "copy",
+    link: bool = False,
+    journal: JournalHook | None = None,
+    workers: int = 4,
+    failed: list[Path] | None = None,
+) -> tuple[str, str]:
+    """Moves or copies several files to one target directory as a single operation
+
+    The target directory is created once, the numbered names of all files
+    are claimed in one pass and the transfers run on `workers` threads.
+    Otherwise every file is handled like by `move_file`, the ones that
+    fail are added to `failed`.
+    """
+    target_dir_path: Path | tuple[str, str] = create_target_dir(target_dir)
+    if isinstance(target_dir_path, tuple):
+        if failed is not None:
+            failed.extend(file_paths)
+        return target_dir_path
+
+    results: list[tuple[str, str] | None] = [None] * len(file_paths)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image_sorter-bulk") as pool:
+        existing: list[Path | None] = [None] * len(file_paths)
+        if on_duplicate != "copy":
+            existing = list(pool.map(lambda p: find_identical(p, target_dir_path), file_paths))
+
+        todo: list[int] = []
+        names: set[str] = set()  # without auto_rename, files of different directories may share a name
+        for i, file_path in enumerate(file_paths):
+            if existing[i] is not None and on_duplicate == "skip":
+                results[i] = (f'File "{file_path.name}" already exists in {target_dir} as "{existing[i].name}"', "error")
+            elif not auto_rename and file_path.name in names:
+                results[i] = (f'File "{file_path.name}" is moved to {target_dir} twice, not overwritten', "error")
+            else:
+                names.add(file_path.name)
+                todo.append(i)
+
+        allocator: NumberAllocator | None = None
+        if auto_rename:
+            allocator = get_allocator(target_dir_path)
+            new_names: list[Path] = allocator.allocate_many(len(todo))
+        else:
+            new_names = [target_dir_path / file_paths[i].name for i in todo]
+
+        futures: list[Future] = [
+            pool.submit(transfer_file, file_paths[i], target_dir, new_name, existing[i], allocator, copy_mode, link, journal)
+            for i, new_name in zip(todo, new_names)
+        ]
+        for i, future in zip(todo, futures):
+            results[i] = future.result()
+
+    done: str = "linked" if link else "copied" if copy_mode else "moved"
+    record_failures(file_paths, results, failed)
+    return summarize(results, f"{done} to {target_dir}")
+
+
+def delete_files(
+    file_paths: list[Path],
+    safe: bool = True,
+    journal: JournalHook | None = None,
+    failed: list[Path] | None = None,
+) -> tuple[str, str]:
+    """Deletes several files as a single operation, see `delete_file`, the ones that fail are added to `failed`"""
+    results: list[tuple[str, str]] = [delete_file(file_path, safe, journal) for file_path in file_paths]
+    record_failures(file_paths, results, failed)
+    return summarize(results, "moved to the trash" if safe else "permanently deleted")
+
+
+def record_failures(file_paths: list[Path], results: list[tuple[str, str]], failed: list[Path] | None) -> None:
+    if failed is not None:
+        failed.extend(file_path for file_path, (_, level) in zip(file_paths, results) if level == "error")
+
+
+def summarize(results: list[tuple[str, str]], done: str) -> tuple[str, str]:
+    """Folds the messages of the files of a bulk operation into one, e.g. `12 files moved to ...`"""
+    errors: list[str] = [message for message, level in results if level == "error"]
+    if not errors:
+        return (f"{len(results)} files {done}", "success")
+    return (f"{len(results) - len(errors)} of {len(results)} files {done}, {len(errors)} failed: {'; '.join(errors)}", "error")
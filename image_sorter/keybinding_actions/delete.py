@@ -1,10 +1,15 @@
+from itertools import count
 from pathlib import Path
+import os
 import shutil
 
+from image_sorter.keybinding_actions.operations import JournalHook
+
 
 def delete_file(
     file_path: Path,
-    safe: bool = True
+    safe: bool = True,
+    journal: JournalHook | None = None,
 ) -> tuple[str, str]:
     file_name: str = file_path.name
 
@@ -15,15 +20,35 @@ def delete_file(
         except Exception as e:
             return (f'Creating trash directory "{trash_dir}": {e}', "error")
 
+        new_file_path: Path | None = None
         try:
-            new_file_path: Path = Path(trash_dir) / file_name
+            new_file_path = claim_trash_name(trash_dir, file_name)
+            if journal is not None:
+                journal("relocate", file_path, new_file_path, placeholder=True)
             shutil.move(str(file_path), str(new_file_path))
-            return (f'File "{file_name}" successfully moved to "{trash_dir}"', "success")
+            return (f'File "{file_name}" successfully moved to "{new_file_path}"', "success")
         except Exception as e:
+            if new_file_path is not None:
+                new_file_path.unlink(missing_ok=True)  # the move did not finish, the name holds at most a partial copy
             return (f'Moving file "{file_name}" to trash: {e}', "error")
     else:
         try:
+            if journal is not None:
+                journal("unlink", file_path, None)
             file_path.unlink()
             return (f'File "{file_name}" permanently deleted from {file_path}', "success")
         except Exception as e:
             return (f'Permanently deleting file "{file_name}": {e}', "error")
+
+
+def claim_trash_name(trash_dir: Path, file_name: str) -> Path:
+    """Claims a free name in the trash with an empty placeholder, `a.jpg` becomes `a.1.jpg`, `a.2.jpg`, ... once taken"""
+    stem, suffix = os.path.splitext(file_name)
+    for n in count():
+        path: Path = trash_dir / (file_name if n == 0 else f"{stem}.{n}{suffix}")
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            continue
+        return path
+
@@ -0,0 +1,475 @@
+import fcntl
+import filecmp
+import json
+import os
+import shutil
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from image_sorter.ext.paths import DATA_DIR
+from image_sorter.keybinding_actions.bulk import summarize
+
+
+JOURNAL_FILE: Path = DATA_DIR / "journal.jsonl"
+
+
+@dataclass
+class JournalEntry:
+    """A single file change, `kind` decides how it is repaired and reversed
+
+    "relocate" moves `source` to `destination` (moves, renames, safe deletes),
+    "copy" copies it and "unlink" removes `source` for good.
+    """
+
+    id: int
+    kind: str
+    action: str
+    source: Path
+    destination: Path | None
+    of: int | None = None  # entry reversed or reapplied by an undo or redo
+    state: str = "begin"  # "begin", "done" or "failed"
+    group: int | None = None  # entries of one operation, e.g. a bulk move, are undone together
+    source_id: list[int] | None = None  # `file_identity` of both paths when the change began
+    destination_id: list[int] | None = None
+    placeholder: bool = False  # the destination was claimed by the operation, e.g. by the NumberAllocator
+
+    @property
+    def undoable(self) -> bool:
+        return self.kind in ("relocate", "copy") and self.action not in ("undo", "redo")
+
+
+def apply_change(kind: str, source: Path, destination: Path | None) -> None:
+    """Applies a change without overwriting anything, used to undo and redo entries"""
+    if kind == "unlink":
+        source.unlink()
+        return
+
+    if destination.exists():
+        raise FileExistsError(f'"{destination}" already exists')
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    if kind == "relocate":
+        shutil.move(str(source), str(destination))
+    else:
+        shutil.copy2(source, destination)
+
+
+def file_identity(file_path: Path | None) -> list[int] | None:
+    """Device, inode, size and mtime of a file, or None if it does not exist"""
+    if file_path is None:
+        return None
+    try:
+        st: os.stat_result = os.lstat(file_path)
+    except OSError:
+        return None
+    return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def same_file(a: list[int] | None, b: list[int] | None) -> bool:
+    return a is not None and b is not None and a[:2] == b[:2]
+
+
+class Journal:
+    """Append-only write-ahead log of the file operations, behind undo and redo
+
+    Every action reports its change through `record` before touching the
+    file, and the record is on disk before the action continues. Records
+    of concurrent operations share one fsync (group commit), completion
+    records are synced with the next batch. Entries left unfinished by a
+    crash are completed or rolled back by `repair` on the next start.
+    """
+
+    MAX_ENTRIES = 1000  # undoable entries kept when the journal is compacted
+
+    def __init__(self, path: Path = JOURNAL_FILE):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd: int = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)  # a single session owns the journal
+        except OSError:
+            os.close(self._fd)
+            raise
+
+        self.entries: dict[int, JournalEntry] = {}
+        self.history: list[int] = []  # undoable entries, most recent last
+        self.redo_stack: list[int] = []
+        self.next_id: int = 1
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._written: int = 0  # records written so far
+        self._synced_count: int = 0  # records known to be on disk
+        self._syncing: bool = False
+        self.load()
+
+    @classmethod
+    def open(cls, *args):
+        """Returns the journal or None if it cannot be opened, e.g. another session holds it"""
+        try:
+            return cls(*args)
+        except OSError:
+            return None
+
+    def load(self) -> None:
+        with open(self._fd, "r", encoding="utf-8", closefd=False) as f:
+            f.seek(0)
+            for line in f:
+                try:
+                    record: dict = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write of the last record before a crash
+                self.replay(record)
+
+    def replay(self, record: dict) -> None:
+        entry_id: int = record.get("id", 0)
+        self.next_id = max(self.next_id, entry_id + 1)
+        op: str = record.get("op", "")
+
+        if op == "begin":
+            self.entries[entry_id] = JournalEntry(
+                entry_id,
+                record["kind"],
+                record["action"],
+                Path(record["source"]),
+                Path(record["destination"]) if record.get("destination") else None,
+                record.get("of"),
+                group=record.get("group"),
+                source_id=record.get("source_id"),
+                destination_id=record.get("destination_id"),
+                placeholder=record.get("placeholder", False),
+            )
+            return
+
+        entry: JournalEntry | None = self.entries.get(entry_id)
+        if entry is None:
+            return
+        if op in ("done", "failed"):
+            entry.state = op
+            if op == "done" and entry.undoable:
+                self.history.append(entry_id)
+                self.redo_stack.clear()
+        elif op == "undone" and entry_id in self.history:
+            self.history.remove(entry_id)
+            self.redo_stack.append(entry_id)
+        elif op == "redone" and entry_id in self.redo_stack:
+            self.redo_stack.remove(entry_id)
+            self.history.append(entry_id)
+
+    def write(self, record: dict, sync: bool) -> None:
+        """Appends a record, with `sync` waits until it is durable"""
+        line: bytes = (json.dumps(record, ensure_ascii=True) + "\n").encode()
+        with self._lock:
+            os.write(self._fd, line)
+            self._written += 1
+            self.replay(record)
+            if not sync:
+                return
+
+            target: int = self._written
+            while self._synced_count < target:
+                if self._syncing:
+                    self._synced.wait()
+                    continue
+                # the first waiter syncs everything written so far for all others
+                self._syncing = True
+                batch: int = self._written
+                self._lock.release()
+                try:
+                    os.fsync(self._fd)
+                finally:
+                    self._lock.acquire()
+                    self._syncing = False
+                    self._synced_count = max(self._synced_count, batch)
+                    self._synced.notify_all()
+
+    def begin(
+        self,
+        kind: str,
+        action: str,
+        source: Path,
+        destination: Path | None,
+        of: int | None = None,
+        group: int | None = None,
+        placeholder: bool = False,
+    ) -> int:
+        """Writes the record of a change before it is applied, with the files it finds in place
+
+        `placeholder` tells that the operation created the destination
+        itself, an empty file a repair may remove again.
+        """
+        with self._lock:
+            entry_id: int = self.next_id
+            self.next_id += 1
+
+        record: dict = {
+            "id": entry_id,
+            "op": "begin",
+            "time": time.time(),
+            "kind": kind,
+            "action": action,
+            "source": os.path.abspath(source),
+            "destination": os.path.abspath(destination) if destination is not None else None,
+            "source_id": file_identity(source),
+            "destination_id": file_identity(destination),
+        }
+        if placeholder:
+            record["placeholder"] = True
+        if of is not None:
+            record["of"] = of
+        if group is not None:
+            record["group"] = group
+        self.write(record, sync=True)
+        return entry_id
+
+    def finish(self, entry_id: int, succeeded: bool) -> None:
+        self.write({"id": entry_id, "op": "done" if succeeded else "failed"}, sync=False)
+
+    def new_group(self) -> int:
+        """Reserves the id of an operation, taken when it is submitted so undo follows the key presses"""
+        with self._lock:
+            group: int = self.next_id
+            self.next_id += 1
+            return group
+
+    def run(
+        self,
+        action: str,
+        func: Callable[..., tuple[str, str]],
+        *args,
+        group: int | None = None,
+    ) -> tuple[str, str]:
+        """Runs a keybinding action, journaling the changes it reports before applying them
+
+        All changes of one action form a group that is undone as a unit,
+        bulk actions may report them from several threads.
+        """
+        started: list[int] = []
+        if group is None:
+            group = self.new_group()
+
+        def record(kind: str, source: Path, destination: Path | None, placeholder: bool = False) -> None:
+            started.append(self.begin(kind, action, source, destination, group=group, placeholder=placeholder))
+
+        try:
+            message, level = func(*args, journal=record)
+        except BaseException:
+            for entry_id in started:
+                self.finish(entry_id, False)
+            raise
+        for entry_id in started:
+            # a bulk action fails as a whole, the files it did change can still be undone
+            self.finish(entry_id, level != "error" or self.applied(self.entries[entry_id]))
+        return message, level
+
+    @staticmethod
+    def applied(entry: JournalEntry) -> bool:
+        """Tells from the files whether the change of an entry went through"""
+        destination_now: list[int] | None = file_identity(entry.destination)
+        if destination_now is None or destination_now == entry.destination_id:
+            return False
+        return entry.kind == "copy" or not os.path.lexists(entry.source)
+
+    def groups(self, redo: bool = False) -> list[int]:
+        """Operations that can be undone, oldest first, or the undone ones that can be redone, last undone last"""
+        with self._lock:
+            if redo:
+                return list(dict.fromkeys(map(self.group_of, self.redo_stack)))
+            return sorted(set(map(self.group_of, self.history)))
+
+    def entries_of(self, group: int) -> list[JournalEntry]:
+        """The completed undoable entries of an operation, in the order they were recorded"""
+        with self._lock:
+            return [
+                entry for entry in self.entries.values()
+                if entry.undoable and entry.state == "done" and self.group_of(entry.id) == group
+            ]
+
+    def undo_group(self, group: int) -> tuple[str, str]:
+        """Reverses an operation, its entries whose undo fails stay in the history
+
+        The operation is named by its group id, so an undo can be queued
+        before the operation itself has finished.
+        """
+        return self.reverse_group(group, self.history, self.undo, "undone")
+
+    def redo_group(self, group: int) -> tuple[str, str]:
+        return self.reverse_group(group, self.redo_stack, self.redo, "redone")
+
+    def reverse_group(
+        self,
+        group: int,
+        stack: list[int],
+        reverse: Callable[[JournalEntry], tuple[str, str]],
+        done: str,
+    ) -> tuple[str, str]:
+        with self._lock:
+            latest: int | None = next((entry_id for entry_id in reversed(stack) if self.group_of(entry_id) == group), None)
+            entries: list[JournalEntry] = self.pop_group(stack, latest) if latest is not None else []
+        if not entries:
+            return (f"Nothing to be {done}, the operation changed no file", "info")
+
+        results: list[tuple[str, str]] = [reverse(entry) for entry in entries]
+        return results[0] if len(results) == 1 else summarize(results, done)
+
+    def group_of(self, entry_id: int) -> int:
+        """Group id of an entry, entries written before grouping form a group of their own"""
+        group: int | None = self.entries[entry_id].group
+        return group if group is not None else entry_id
+
+    def pop_group(self, stack: list[int], latest: int) -> list[JournalEntry]:
+        """Removes an entry of a stack together with the rest of its group, most recent first"""
+        group: int = self.group_of(latest)
+        members: list[int] = [entry_id for entry_id in stack if self.group_of(entry_id) == group]
+        stack[:] = [entry_id for entry_id in stack if self.group_of(entry_id) != group]
+        return [self.entries[entry_id] for entry_id in reversed(members)]
+
+    def undo(self, entry: JournalEntry) -> tuple[str, str]:
+        if entry.kind == "relocate":
+            change: tuple[str, Path, Path | None] = ("relocate", entry.destination, entry.source)
+        else:
+            change = ("unlink", entry.destination, None)
+        return self.reapply(entry, "undo", change, self.history, "undone")
+
+    def redo(self, entry: JournalEntry) -> tuple[str, str]:
+        return self.reapply(entry, "redo", (entry.kind, entry.source, entry.destination), self.redo_stack, "redone")
+
+    def reapply(
+        self,
+        entry: JournalEntry,
+        action: str,
+        change: tuple[str, Path, Path | None],
+        stack: list[int],
+        marker: str,
+    ) -> tuple[str, str]:
+        kind, source, destination = change
+        try:
+            entry_id: int = self.begin(kind, action, source, destination, of=entry.id)
+        except OSError as e:
+            with self._lock:
+                stack.append(entry.id)
+            return (f'{action.capitalize()} {entry.action} "{entry.source.name}": {e}', "error")
+
+        try:
+            apply_change(kind, source, destination)
+        except OSError as e:
+            self.finish(entry_id, False)
+            with self._lock:
+                stack.append(entry.id)
+            return (f'{action.capitalize()} {entry.action} "{entry.source.name}": {e}', "error")
+
+        self.finish(entry_id, True)
+        # the marker moves the entry to the other stack, as it will on the next replay
+        with self._lock:
+            stack.append(entry.id)
+        self.write({"id": entry.id, "op": marker}, sync=False)
+        return (f'{action.capitalize()} {entry.action} of "{entry.source.name}"', "success")
+
+    def repair(self) -> list[str]:
+        """Completes or rolls back the entries a crash left unfinished, returns what was done"""
+        messages: list[str] = []
+        for entry in list(self.entries.values()):
+            if entry.state != "begin":
+                continue
+            try:
+                succeeded, message = self.repair_entry(entry)
+            except OSError as e:
+                succeeded, message = False, f'Repairing interrupted {entry.action} of "{entry.source}": {e}'
+            messages.append(message)
+            self.write({"id": entry.id, "op": "done" if succeeded else "failed"}, sync=False)
+        return messages
+
+    def repair_entry(self, entry: JournalEntry) -> tuple[bool, str]:
+        """Decides from the files on disk how far a change got, returns if it counts as done
+
+        Only a destination the change created itself is removed, and a
+        source only once the destination holds the same content. Anything
+        else is left alone and reported as unresolved.
+        """
+        source, destination = entry.source, entry.destination
+        if entry.kind == "unlink":
+            return (not source.exists(), f'Interrupted {entry.action} of "{source}" checked')
+
+        unresolved: tuple[bool, str] = (
+            False, f'Interrupted {entry.action} of "{source}" is unresolved, check "{source}" and "{destination}"'
+        )
+        source_now: list[int] | None = file_identity(source)
+        destination_now: list[int] | None = file_identity(destination)
+        if destination_now is None:
+            if source_now is None:
+                return unresolved
+            return (False, f'Interrupted {entry.action} of "{source}" was not applied')
+
+        if same_file(destination_now, entry.source_id):  # renamed or linked
+            if entry.kind == "relocate" and same_file(source_now, entry.source_id):
+                source.unlink()  # the destination holds the same inode
+            return (True, f'Interrupted {entry.action} of "{source}" had completed')
+
+        if entry.source_id is None:  # written before files were identified, nothing can be told apart
+            if source_now is None:
+                return (True, f'Interrupted {entry.action} of "{source}" had completed')
+            return unresolved
+
+        created: bool = entry.destination_id is None or entry.placeholder
+        if not created:
+            if destination_now == entry.destination_id:  # an inode number alone may have been reused
+                return (False, f'Interrupted {entry.action} of "{source}" was not applied')
+            return unresolved
+
+        if same_file(destination_now, entry.destination_id) and destination_now[2] == 0:
+            destination.unlink()  # the untouched placeholder
+            return (False, f'Interrupted {entry.action} of "{source}" rolled back')
+
+        if source_now is None:  # a relocation is complete, a copy cannot be checked and is kept
+            return (True, f'Interrupted {entry.action} of "{source}" had completed')
+        if not same_file(source_now, entry.source_id):
+            return unresolved
+
+        if filecmp.cmp(source, destination, shallow=False):
+            if entry.kind == "relocate":
+                source.unlink()  # the copy across devices finished, only the source was left
+            return (True, f'Interrupted {entry.action} of "{source}" completed')
+
+        destination.unlink()  # a partial copy
+        return (False, f'Interrupted {entry.action} of "{source}" rolled back')
+
+    def compact(self) -> None:
+        """Rewrites the journal without entries older than the last MAX_ENTRIES undoable ones"""
+        with self._lock:
+            if len(self.history) <= self.MAX_ENTRIES:
+                return
+            cutoff: int = min(self.history[-self.MAX_ENTRIES:])
+            os.fsync(self._fd)
+            with open(self._fd, "r", encoding="utf-8", closefd=False) as f:
+                f.seek(0)
+                kept: list[str] = [line for line in f if self.record_id(line) >= cutoff]
+
+            tmp_path: Path = self.path.with_name(f".{self.path.name}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(kept)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # the lock is taken on the new file before it replaces the old one
+            fd: int = os.open(tmp_path, os.O_RDWR | os.O_APPEND)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.replace(tmp_path, self.path)
+            os.close(self._fd)
+            self._fd = fd
+
+            self.entries = {k: v for k, v in self.entries.items() if k >= cutoff}
+            self.history = [k for k in self.history if k >= cutoff]
+            self.redo_stack = [k for k in self.redo_stack if k >= cutoff]
+
+    @staticmethod
+    def record_id(line: str) -> int:
+        try:
+            return json.loads(line).get("id", 0)
+        except json.JSONDecodeError:
+            return 0
+
+    def close(self) -> None:
+        with self._lock:
+            os.fsync(self._fd)
+            os.close(self._fd)
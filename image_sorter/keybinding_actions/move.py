@@ -1,34 +1,115 @@
-import shutil
+import os
+import threading
 from pathlib import Path
 
+from image_sorter.ext.identical import find_identical
+from image_sorter.keybinding_actions.operations import JournalHook
+from image_sorter.keybinding_actions.transfer import TransferStrategy, get_strategy
+
 
 def move_file(
     file_path: Path,
     target_dir: str,
     auto_rename: int,
-    copy_mode: bool
+    copy_mode: bool,
+    on_duplicate: str = "copy",
+    link: bool = False,
+    journal: JournalHook | None = None,
 ) -> tuple[str, str]:
-    """Moves or copies a file to the target directory and returns a log message and its level"""
-    file_name: str = file_path.name
-    target_dir_path: Path = create_target_dir(target_dir)
+    """Moves or copies a file to the target directory and returns a log message and its level
+
+    `on_duplicate` decides what happens when the target directory already holds
+    a file with the same content: "copy" ignores it, "skip" refuses the
+    operation and "link" hard links the new name to the existing file.
+    With `link` the file is hard linked instead of copied where possible.
+    `journal` is told about the change before it is applied.
+    """
+    target_dir_path: Path | tuple[str, str] = create_target_dir(target_dir)
+    if isinstance(target_dir_path, tuple):
+        return target_dir_path
 
+    existing: Path | None = None
+    if on_duplicate != "copy":
+        existing = find_identical(file_path, target_dir_path)
+        if existing is not None and on_duplicate == "skip":
+            return (f'File "{file_path.name}" already exists in {target_dir} as "{existing.name}"', "error")
+
+    allocator: NumberAllocator | None = None
     if auto_rename:
-        max_file_name: str = get_next_available_filename(target_dir_path)
-        new_name: Path = target_dir_path / max_file_name
+        allocator = get_allocator(target_dir_path)
+        new_name: Path = allocator.allocate()
     else:
-        new_name: Path = target_dir_path / file_name
+        new_name: Path = target_dir_path / file_path.name
+    return transfer_file(file_path, target_dir, new_name, existing, allocator, copy_mode, link, journal)
+
 
+def transfer_file(
+    file_path: Path,
+    target_dir: str,
+    new_name: Path,
+    existing: Path | None,
+    allocator: "NumberAllocator | None",
+    copy_mode: bool,
+    link: bool,
+    journal: JournalHook | None,
+) -> tuple[str, str]:
+    """Moves, copies or links a file to `new_name`, or to the identical file `existing`
+
+    A name claimed from `allocator` is given back if the transfer fails.
+    """
+    file_name: str = file_path.name
+    copy_mode = copy_mode or link
+    if allocator is None and existing is None and taken(file_path, new_name):
+        return (f'File "{file_name}" already exists in {target_dir}, not overwritten', "error")
     try:
-        if copy_mode:
-            shutil.copy2(file_path, new_name)
-            return (f'File "{file_name}" successfully copied to {new_name}', "success")
+        strategy: TransferStrategy = get_strategy(file_path, Path(os.path.abspath(new_name.parent)))
+        if journal is not None:
+            journal("copy" if copy_mode else "relocate", file_path, new_name, placeholder=allocator is not None)
+        if existing is not None:
+            if existing != new_name:
+                link_atomic(existing, new_name)
+            if not copy_mode and file_path.resolve() != new_name.resolve():
+                file_path.unlink()
+            message: tuple[str, str] = (f'File "{file_name}" already exists in {target_dir}, linked {new_name} to "{existing.name}"', "success")
+        elif link:
+            method: str = strategy.link(file_path, new_name)
+            message = (f'File "{file_name}" successfully linked to {new_name} ({method})', "success")
+        elif copy_mode:
+            method = strategy.copy(file_path, new_name)
+            message = (f'File "{file_name}" successfully copied to {new_name} ({method})', "success")
         else:
-            shutil.move(str(file_path), str(new_name))
-            return (f'File "{file_name}" successfully moved to {new_name}', "success")
+            method = strategy.move(file_path, new_name)
+            message = (f'File "{file_name}" successfully moved to {new_name} ({method})', "success")
     except Exception as e:
+        if allocator is not None:
+            allocator.release(new_name)
         action: str = "Copying" if copy_mode else "Moving"
         return (f'{action} file "{file_name}" to {target_dir}: {e}', "error")
 
+    if allocator is not None:
+        allocator.commit()
+    return message
+
+
+def taken(file_path: Path, new_name: Path) -> bool:
+    """Returns True if `new_name` is held by another file, moving onto it would overwrite that file"""
+    if not os.path.lexists(new_name):
+        return False
+    try:
+        return not os.path.samefile(file_path, new_name)
+    except OSError:
+        return True
+
+
+def link_atomic(existing: Path, new_name: Path) -> None:
+    """Hard links `new_name` to an existing file, replacing a placeholder left by the allocator"""
+    tmp_name: Path = new_name.with_name(f".tmp-{os.getpid()}-{threading.get_ident()}-{new_name.name}")
+    os.link(existing, tmp_name)
+    try:
+        os.replace(tmp_name, new_name)
+    finally:
+        tmp_name.unlink(missing_ok=True)  # rename() keeps both names if they are already the same file
+
 
 def create_target_dir(target_dir: str) -> Path:
     """Creates a target directory if it does not exist"""
@@ -42,23 +123,115 @@ def create_target_dir(target_dir: str) -> Path:
     return target_dir_path
 
 
-def get_next_available_filename(target_dir: Path) -> str:
-    """Finds the next avaliable numbered filename in the target directory"""
-    existing_numbers: list[int] = []
-    file_suffix: str = ".jpg"
+class NumberAllocator:
+    """Hands out the lowest free numbered file name of a target directory
 
-    for file in target_dir.iterdir():
-        if file.is_file() and file.stem.isdigit():
-            existing_numbers.append(int(file.stem))
-            file_suffix = file.suffix
+    The directory is scanned once, afterwards the used numbers are tracked
+    in memory. A changed directory mtime means someone else wrote into the
+    directory and triggers a rescan. Names are claimed by creating an empty
+    placeholder with O_EXCL, so two sessions never get the same number.
+    """
 
-    existing_numbers.sort()
+    def __init__(self, target_dir: Path):
+        self.target_dir = target_dir
+        self.used: set[int] = set()
+        self.next_number: int = 1
+        self.suffix: str = ".jpg"
+        self.mtime_ns: int | None = None
+        self._lock = threading.Lock()
 
-    next_number: int = 1
-    for num in existing_numbers:
-        if num == next_number:
-            next_number += 1
-        else:
-            break
+    def scan(self) -> None:
+        self.used.clear()
+        self.suffix = ".jpg"
 
-    return f"{next_number}{file_suffix}"
+        with os.scandir(self.target_dir) as entries:
+            for entry in entries:
+                stem, suffix = os.path.splitext(entry.name)
+                if stem.isdigit() and entry.is_file():
+                    self.used.add(int(stem))
+                    self.suffix = suffix
+
+        self.next_number = 1
+        self.advance()
+        self.mtime_ns = self.directory_mtime()
+
+    def directory_mtime(self) -> int | None:
+        try:
+            return self.target_dir.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def refresh(self) -> None:
+        if self.mtime_ns is None or self.directory_mtime() != self.mtime_ns:
+            self.scan()
+
+    def advance(self) -> None:
+        while self.next_number in self.used:
+            self.next_number += 1
+
+    def peek(self) -> str:
+        """Returns the next free file name without claiming it"""
+        with self._lock:
+            self.refresh()
+            return f"{self.next_number}{self.suffix}"
+
+    def allocate(self) -> Path:
+        """Claims the next free file name with an empty placeholder file"""
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count: int) -> list[Path]:
+        """Claims the next `count` free file names, the directory is checked for changes once"""
+        paths: list[Path] = []
+        with self._lock:
+            self.refresh()
+            while len(paths) < count:
+                number: int = self.next_number
+                path: Path = self.target_dir / f"{number}{self.suffix}"
+                self.used.add(number)
+                self.advance()
+
+                try:
+                    os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                except FileExistsError:
+                    continue  # taken by another session since the last scan
+                paths.append(path)
+            self.mtime_ns = self.directory_mtime()
+        return paths
+
+    def release(self, path: Path) -> None:
+        """Gives a claimed name back after the move into it failed"""
+        with self._lock:
+            try:
+                if path.stat().st_size == 0:
+                    path.unlink()
+            except OSError:
+                pass
+
+            number: int = int(path.stem)
+            self.used.discard(number)
+            self.next_number = min(self.next_number, number)
+            self.mtime_ns = self.directory_mtime()
+
+    def commit(self) -> None:
+        """Records the directory mtime after the claimed name was written"""
+        with self._lock:
+            self.mtime_ns = self.directory_mtime()
+
+
+_allocators: dict[Path, NumberAllocator] = {}
+_allocators_lock = threading.Lock()
+
+
+def get_allocator(target_dir: Path) -> NumberAllocator:
+    """Returns the allocator of a target directory, creating it on first use"""
+    key: Path = Path(target_dir).resolve()
+    with _allocators_lock:
+        allocator: NumberAllocator | None = _allocators.get(key)
+        if allocator is None:
+            allocator = _allocators[key] = NumberAllocator(key)
+        return allocator
+
+
+def get_next_available_filename(target_dir: Path) -> str:
+    """Finds the next avaliable numbered filename in the target directory"""
+    return get_allocator(target_dir).peek()
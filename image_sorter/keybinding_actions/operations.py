@@ -0,0 +1,110 @@
+import threading
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Protocol
+
+
+class JournalHook(Protocol):
+    """Told by a keybinding action about each change before it is applied, see `Journal.run`
+
+    `kind` is "relocate", "copy" or "unlink". With `placeholder` the
+    destination is an empty file claimed for the change, not a file of the user.
+    """
+
+    def __call__(self, kind: str, source: Path, destination: Path | None, placeholder: bool = False) -> None: ...
+
+
+@dataclass
+class Operation:
+    """A file operation executed in the background
+
+    The UI applies the expected result to the file list right away and
+    uses `position` and `new_path` to roll it back if the operation fails.
+    """
+
+    action: str  # "move", "copy", "link", "delete", "rename", "undo" or "redo"
+    file_path: Path
+    position: int = -1
+    new_path: Path | None = None
+    target: str | None = None  # resolved target directory of a move or copy
+    files: list[Path] = field(default_factory=list)  # every file of a bulk operation, `file_path` is the first
+    positions: list[int] = field(default_factory=list)  # their positions in the file list
+    failed_files: list[Path] = field(default_factory=list)  # the files of a bulk operation that failed
+    changes: list[tuple[Path | None, Path | None]] = field(default_factory=list)  # undo, redo: (path left, path listed)
+    group: int | None = None  # journal group of the operation, or of the one an undo or redo reverses
+    message: str = ""
+    level: str = "info"
+    keys: tuple[Hashable, ...] = field(default_factory=tuple)
+
+    @property
+    def failed(self) -> bool:
+        return self.level == "error"
+
+
+class OperationQueue:
+    """Bounded worker pool running keybinding actions off the UI thread
+
+    Operations sharing a key (a file or a target directory) run in the order
+    they were submitted, independent operations run in parallel.
+    """
+
+    def __init__(self, workers: int = 4, on_done: Callable[[Operation], None] | None = None):
+        self.on_done = on_done
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image_sorter-ops")
+        self._last: dict[Hashable, Future] = {}
+        self._pending: int = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def submit(self, operation: Operation, func: Callable[..., tuple[str, str]], *args) -> Future:
+        with self._lock:
+            previous: list[Future] = [self._last[k] for k in operation.keys if k in self._last]
+            self._pending += 1
+            future: Future = self._pool.submit(self.execute, operation, previous, func, *args)
+            for k in operation.keys:
+                self._last[k] = future
+        future.add_done_callback(lambda f: self.forget(operation.keys, f))
+        return future
+
+    def join(self) -> None:
+        """Waits until every operation submitted so far is done"""
+        with self._lock:
+            futures: list[Future] = list(self._last.values())  # the last one of every key waited for the others
+        wait(futures)
+
+    def forget(self, keys: tuple[Hashable, ...], future: Future) -> None:
+        with self._lock:
+            for k in keys:
+                if self._last.get(k) is future:
+                    del self._last[k]
+
+    def execute(
+        self,
+        operation: Operation,
+        previous: list[Future],
+        func: Callable[..., tuple[str, str]],
+        *args,
+    ) -> Operation:
+        # earlier operations were queued first, so they are already running or done
+        wait(previous)
+        try:
+            operation.message, operation.level = func(*args)
+        except Exception as e:
+            operation.message, operation.level = f'{operation.action} "{operation.file_path}": {e}', "error"
+
+        with self._lock:
+            self._pending -= 1
+
+        if self.on_done is not None:
+            self.on_done(operation)
+        return operation
+
+    def shutdown(self, cancel: bool = False) -> None:
+        """Waits for the queued operations, none of them is dropped on exit unless `cancel` is set"""
+        self._pool.shutdown(wait=True, cancel_futures=cancel)
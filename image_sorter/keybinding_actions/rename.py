@@ -1,15 +1,26 @@
 from pathlib import Path
 
+from image_sorter.keybinding_actions.move import taken
+from image_sorter.keybinding_actions.operations import JournalHook
 
-def rename_file(file_path: Path, new_name: str) -> tuple[str, str]:
+
+def rename_file(
+    file_path: Path,
+    new_name: str,
+    journal: JournalHook | None = None,
+) -> tuple[str, str]:
     """Renames a file to a new name within the same directory"""
     if not file_path.exists():
         return (f'File "{file_path}" not found.', "error")
 
     dir_path: Path = file_path.parent
     new_path: Path = dir_path / new_name
+    if taken(file_path, new_path):
+        return (f'File "{new_name}" already exists, "{file_path.name}" not renamed', "error")
 
     try:
+        if journal is not None:
+            journal("relocate", file_path, new_path)
         file_path.rename(new_path)
         return (f'File "{file_path.name}" successfully renamed to "{new_name}"', "success")
     except Exception as e:
@@ -0,0 +1,177 @@
+import errno
+import os
+import shutil
+import sys
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows, where only the plain read and write copy exists
+    fcntl = None
+
+
+FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
+
+# errors meaning a method does not work between two files, not that the copy failed
+UNSUPPORTED = {
+    errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.ENOTTY, errno.EBADF,
+    errno.EOPNOTSUPP, getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+}
+
+
+def reflink(src_fd: int, dst_fd: int, size: int) -> None:
+    """Shares the data blocks of the source (btrfs, XFS), no data is copied"""
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+
+def copy_range(src_fd: int, dst_fd: int, size: int) -> None:
+    """Copies inside the kernel, which may offload it to the file system or the storage"""
+    offset: int = 0
+    while offset < size:
+        copied: int = os.copy_file_range(src_fd, dst_fd, size - offset, offset, offset)
+        if copied == 0:
+            break
+        offset += copied
+
+
+def send_file(src_fd: int, dst_fd: int, size: int) -> None:
+    offset: int = 0
+    while offset < size:
+        sent: int = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+
+
+def read_write(src_fd: int, dst_fd: int, size: int) -> None:
+    while True:
+        chunk: bytes = os.read(src_fd, 1024 * 1024)
+        if not chunk:
+            break
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dst_fd, view):]
+
+
+def available_copiers() -> dict[str, Callable[[int, int, int], None]]:
+    """The copy methods of this platform, the cheapest first and the plain read and write last"""
+    linux: bool = sys.platform.startswith("linux")
+    copiers: dict[str, Callable[[int, int, int], None]] = {}
+    if linux and fcntl is not None:
+        copiers["reflink"] = reflink
+    if hasattr(os, "copy_file_range"):
+        copiers["copy_file_range"] = copy_range
+    if linux and hasattr(os, "sendfile"):  # elsewhere sendfile only writes to sockets
+        copiers["sendfile"] = send_file
+    copiers["read_write"] = read_write
+    return copiers
+
+
+COPIERS = available_copiers()
+COPY_METHODS = tuple(COPIERS)
+
+
+class TransferStrategy:
+    """How files get from one source device into one target directory
+
+    Decided once from the devices of both sides: on the same device moves
+    are a single rename and links are possible, otherwise data is copied.
+    Copies start with the cheapest method and fall back for good as soon as
+    the kernel or the file system reports that a method is not supported.
+    """
+
+    def __init__(self, same_device: bool, copy_method: str = COPY_METHODS[0]):
+        self.same_device = same_device
+        self.copy_method = copy_method
+        self._lock = threading.Lock()
+
+    def move(self, source: Path, destination: Path) -> str:
+        """Moves a file and returns the method used"""
+        if self.same_device:
+            try:
+                os.rename(source, destination)
+                return "rename"
+            except OSError as e:
+                if e.errno != errno.EXDEV:  # e.g. a bind mount of the same device
+                    raise
+                self.same_device = False
+
+        if source.is_symlink():
+            shutil.move(str(source), str(destination))  # recreates the link instead of copying its target
+            return "symlink"
+        method: str = self.copy(source, destination)
+        source.unlink()
+        return method
+
+    def link(self, source: Path, destination: Path) -> str:
+        """Hard links a file into the target directory, or copies it across devices"""
+        if self.same_device:
+            tmp_name: Path = destination.with_name(f".tmp-{os.getpid()}-{threading.get_ident()}-{destination.name}")
+            try:
+                os.link(source, tmp_name)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+            else:
+                try:
+                    os.replace(tmp_name, destination)  # also replaces a placeholder of the allocator
+                finally:
+                    tmp_name.unlink(missing_ok=True)
+                return "link"
+        return self.copy(source, destination)
+
+    def copy(self, source: Path, destination: Path) -> str:
+        """Copies data and metadata like `shutil.copy2`, returns the method used"""
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            size: int = os.fstat(src.fileno()).st_size
+            while True:
+                with self._lock:
+                    method: str = self.copy_method
+                try:
+                    COPIERS[method](src.fileno(), dst.fileno(), size)
+                    break
+                except OSError as e:
+                    if e.errno not in UNSUPPORTED or method == COPY_METHODS[-1]:
+                        raise
+                    self.downgrade(method)
+                    src.seek(0)
+                    dst.seek(0)
+                    dst.truncate()
+
+        shutil.copystat(source, destination)
+        return method
+
+    def downgrade(self, method: str) -> None:
+        with self._lock:
+            if self.copy_method == method:
+                self.copy_method = COPY_METHODS[COPY_METHODS.index(method) + 1]
+
+
+_devices: dict[Path, int] = {}
+_strategies: dict[tuple[int, Path], TransferStrategy] = {}
+_strategies_lock = threading.Lock()
+
+
+def device_of(directory: Path) -> int:
+    """Returns the device of a directory, looked up once per directory"""
+    with _strategies_lock:
+        device: int | None = _devices.get(directory)
+    if device is None:
+        device = os.stat(directory).st_dev
+        with _strategies_lock:
+            _devices[directory] = device
+    return device
+
+
+def get_strategy(file_path: Path, target_dir: Path) -> TransferStrategy:
+    """Returns the strategy for moving a file into a target directory, created on first use"""
+    source_device: int = device_of(file_path.parent)
+    target_device: int = device_of(target_dir)
+    key: tuple[int, Path] = (source_device, target_dir)
+    with _strategies_lock:
+        strategy: TransferStrategy | None = _strategies.get(key)
+        if strategy is None:
+            strategy = _strategies[key] = TransferStrategy(source_device == target_device)
+        return strategy
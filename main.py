@@ -1,67 +1,408 @@
+import contextlib
 import curses
+import curses.textpad
+import fnmatch
+import functools
+import hashlib
+import os
+import queue
+import signal
 import subprocess
 import shutil
-from curses.textpad import rectangle
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
 from pathlib import Path
 from argparse import ArgumentParser, Namespace
 
-from image_sorter.ext.parser import configure_parser
-from image_sorter.ext.loggers import Logger
+from image_sorter.ext.parser import DEFAULT_GRID, configure_parser
+from image_sorter.ext.loggers import Logger, read_keys
+from image_sorter.ext.watcher import DirectoryWatcher
+from image_sorter.ext.thumbnails import Prefetcher, ThumbnailCache
+from image_sorter.ext.thumbnail_store import ThumbnailStore, store_key, warm_cache
+from image_sorter.ext.images import pillow_available
+from image_sorter.ext.duplicates import find_duplicates
+from image_sorter.ext.catalog import CATALOG_DB, Catalog
+from image_sorter.ext.batch import run_batch
+from image_sorter.ext.metadata import Metadata, MetadataCache, MetadataLoader
+from image_sorter.ext.profiler import Histogram, Profiler
+from image_sorter.ext.ordering import FileFilter, SortKey, parse_date, parse_sort, sort_key, sort_needs_metadata
 from image_sorter.gui.ui import UI
+from image_sorter.gui.colorscheme import ColorScheme
+from image_sorter.gui.layout import FileListLayout, GridLayout
+from image_sorter.gui.panes import Pane
+from image_sorter.gui.event_loop import EventLoop, Timer
+from image_sorter.gui.kitty import KittyRenderer
+from image_sorter.gui.input import ReplayInput, TerminalInput
+from image_sorter.gui.virtual_screen import virtual_curses
 from image_sorter.ext import (
-    get_files,
+    FileIndex,
     format_directories,
+    iter_files,
     validate_args,
 )
 from image_sorter.keybinding_actions import (
     move_file,
+    move_files,
     delete_file,
+    delete_files,
     rename_file,
     open_with_system_app,
+    Operation,
+    OperationQueue,
+    Journal,
+    JournalEntry,
 )
 
 
+KEY_SPANS: dict[int, str] = {
+    curses.KEY_DOWN: "key.down", ord("j"): "key.down",
+    curses.KEY_UP: "key.up", ord("k"): "key.up",
+    curses.KEY_DC: "key.delete", ord("d"): "key.delete",
+    curses.KEY_F2: "key.rename", ord("r"): "key.rename",
+    curses.KEY_F5: "key.rescan", ord("R"): "key.rescan",
+    ord("u"): "key.undo", ord("U"): "key.redo",
+    ord("p"): "key.profile",
+    ord("c"): "key.cluster",
+    curses.KEY_LEFT: "key.left", curses.KEY_RIGHT: "key.right",
+    ord("g"): "key.grid",
+    ord("m"): "key.mark", ord("v"): "key.mark", ord("M"): "key.mark", ord("/"): "key.mark",
+    curses.KEY_F1: "key.help", ord("h"): "key.help",
+    curses.KEY_ENTER: "key.open", 10: "key.open", 13: "key.open",
+    27: "key.target", ord("`"): "key.target",
+    **{ord(digit): "key.target" for digit in "0123456789"},
+}  # span names of the key bindings, for --profile and the timing overlay
+
+
 class ImageSorter:
     SCROLL_OFFSET = 8
-
-    def __init__(self, stdscr, args):
+    PREVIEW_DELAY = 0.08  # seconds the cursor has to rest before the preview is rendered
+    ORDER_DELAY = 0.3  # seconds between re-sorts while files and metadata keep arriving
+    TILE_DELAY = 0.05  # seconds thumbnails decoded in the background are collected before they are placed
+
+    def __init__(
+        self,
+        stdscr,
+        args,
+        files: list[Path] | None = None,
+        keys: ReplayInput | None = None,
+        journal_path: Path | None = None,
+    ):
         self.stdscr = stdscr
         self.args = args
-        self.logger = Logger()
+        self.input: TerminalInput | ReplayInput = keys if keys is not None else TerminalInput(stdscr, on_key=self.log_key)
+        self.preset_files = files  # only these files are listed, e.g. the leftovers of --batch
+        self.logger = Logger(level=self.args.log_level)
         self.ui = UI(self.args.theme)
         self.directory_path: str = args.input_dir
         self.target_directories: list[str] = args.output_dirs
-        self.files_avaliable = True
-        self.load_files()
+        self.files_avaliable = False
+        self.loading = False  # files are still streamed in by the background scan
+        self.catalog: Catalog | None = Catalog.open() if self.args.catalog else None
+        self.index = FileIndex(
+            self.directory_path,
+            scan_depth(self.args),
+            self.args.scan_workers,
+            scanner=self.catalog.scanner() if self.catalog is not None else None
+        )
+        self.duplicates: dict[Path, int] = {}  # cluster of each file in --find-duplicates mode
+        self.copies_elsewhere: set[Path] = set()  # files with a duplicate in an output directory
+        self.layout = FileListLayout(
+            self.index,
+            marker=self.cluster_marker if self.args.find_duplicates else None
+        )
+        self.metadata: dict[int, Metadata] = {}  # keyed by FileIndex.key
+        self.sort_order: tuple[str, bool] | None = parse_sort(self.args.sort) if self.args.sort else None
+        self.sort_keys: dict[int, tuple] = {}  # computed sort keys, keyed by FileIndex.key
+        self.make_sort_key: SortKey | None = sort_key(*self.sort_order) if self.sort_order else None
+        self.filters: list[FileFilter] = [FileFilter(expression) for expression in self.args.filter or []]
+        self.order_timer: Timer | None = None
+        self.metadata_loader: MetadataLoader | None = None
+        if (
+            (self.sort_order is not None and sort_needs_metadata(self.sort_order[0]))
+            or any(f.needs_metadata for f in self.filters)
+        ):
+            self.metadata_loader = MetadataLoader(
+                on_done=lambda results: self.loop.call_soon_threadsafe(lambda: self.on_metadata_loaded(results)),
+                cache=MetadataCache.open()
+            )
         self.scroll_pos = 0  # position of the first visible file
-        self.selected_item_pos = 0 if self.num_files > 0 else -1
+        self.selected_item_pos = -1
+        self.marked: set[int] = set()  # FileIndex keys of the files a digit or `d` acts on together
+        self.marks_version: int = 0
+        self.visual_anchor: Path | None = None  # file where the visual selection started
+        self.visual_anchor_at: tuple[int, int] = (-1, -1)  # index version and position of the anchor then
+        self.watcher: DirectoryWatcher | None = None
+        self.rescan_pending = False  # the watcher lost events while the files were still loading
+        self.loop = EventLoop()
+        self.profiler = Profiler(self.args.profile)
+        self.show_profile: bool = False  # the status line shows the breakdown of the last frame
+        if self.profiler.enabled:
+            self.loop.on_iteration = self.profiler.end_frame
+        self.preview_timer: Timer | None = None
+        self.operations = OperationQueue(
+            on_done=lambda op: self.loop.call_soon_threadsafe(lambda: self.on_operation_done(op))
+        )
+        self.status_message: tuple[str, str] | None = None
+        self.failed_operations: int = 0
+        self.journal: Journal | None = self.open_journal(journal_path)
+        # journal groups of the operations `u` and `U` reverse, most recent last, ahead of the journal itself
+        self.undo_groups: list[int] = self.journal.groups() if self.journal is not None else []
+        self.redo_groups: list[int] = self.journal.groups(redo=True) if self.journal is not None else []
+        self.session_operations: dict[int, Operation] = {}  # operations of this session by journal group
+        self.thumbnails = ThumbnailCache(self.args.cache_size * 1024 * 1024)
+        self.prefetcher = Prefetcher(
+            self.thumbnails,
+            self.args.prefetch,
+            store=open_thumbnail_store(self.args),
+            on_done=self.on_thumbnail_decoded
+        )
+        self.renderer = KittyRenderer(loader=self.load_thumbnail, tile_loader=self.load_tile)
+        self.grid_size: tuple[int, int] = grid_size(self.args)
+        self.grid: GridLayout | None = None  # thumbnails of the files around the cursor instead of the preview
+        if self.args.grid is not None:
+            self.toggle_grid()
 
         self.setup_ui()
 
     def run(self):
-        while True:
-            self.stdscr.erase()
-            self.draw_borders()
+        if self.args.watch:
+            self.start_watcher()
+        self.start_loading()
 
-            if self.files_avaliable:
-                self.display_file_list()
-                self.display_image()
-                self.display_directories()
-            else:
-                self.stdscr.addstr(
-                    1, self.cols["col1"][0] + 2,
-                    "No files available",
-                    self.ui.get_color("error")
+        try:
+            self.main_loop()
+        finally:
+            self.close()
+
+    def replay(self) -> list[tuple[int, float]]:
+        """Handles the keys of a replay at full speed, returns each key with its latency in seconds
+
+        A key's latency covers handling it, drawing the frame and the
+        callbacks that became ready meanwhile, file operations still run
+        in the background like in a session.
+        """
+        self.start_loading()  # the same way as a session, so the keys see the same file list
+        while self.loading:
+            self.loop.run_once()
+
+        latencies: list[tuple[int, float]] = []
+        while self.input.pending:
+            key: int = self.input.get_key()
+            start: float = time.perf_counter()
+            with self.profiler.span(KEY_SPANS.get(key, "key.other")):
+                stop: bool = self.handle_keypress(key)
+            if not stop:
+                self.draw()
+            self.loop.run_once(block=False)
+            latencies.append((key, time.perf_counter() - start))
+            if stop:
+                break
+
+        self.operations.shutdown()  # every completion callback is queued once the workers are done
+        self.loop.run_once(block=False)
+        return latencies
+
+    def verify_files(self) -> list[str]:
+        """Compares the file list with a fresh scan of the input directory, returns the differences"""
+        listed: set[Path] = {self.index.path(pos) for pos in range(self.num_files)}
+        scan = FileIndex(self.directory_path, scan_depth(self.args), self.args.scan_workers)
+        scan.scan()
+        on_disk: set[Path] = {scan.path(pos) for pos in range(len(scan))}
+
+        problems: list[str] = [f"listed, but missing on disk: {p}" for p in sorted(listed - on_disk)]
+        if not self.filters and self.preset_files is None and not self.args.find_duplicates:
+            problems.extend(f"on disk, but not listed: {p}" for p in sorted(on_disk - listed))
+        if self.failed_operations:
+            problems.append(f"{self.failed_operations} operation(s) failed, see the log")
+        return problems
+
+    def close(self) -> None:
+        """Waits for the queued operations and releases every background resource"""
+        self.operations.shutdown()
+        if self.journal is not None:
+            self.journal.close()
+        self.renderer.close()
+        self.prefetcher.shutdown()
+        if self.metadata_loader is not None:
+            self.metadata_loader.shutdown(cancel=True)  # headers of a closed list are not needed
+        if self.catalog is not None:
+            self.catalog.close()
+        self.logger.log_custom_event("thumbnail cache", self.thumbnails.stats())
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.loop.close()
+        if self.profiler.enabled:
+            for name, summary in self.profiler.summary().items():
+                self.logger.log_custom_event(f"profile {name}", *(f"{k}={v:g}" for k, v in summary.items()))
+            error: str | None = self.profiler.close()
+            if error is not None:
+                self.logger.log_message(error, "error")
+
+    def main_loop(self):
+        self.loop.add_reader(sys.stdin.fileno(), self.on_input)
+        self.loop.add_signal_handler(signal.SIGWINCH, self.on_resize)
+
+        self.draw()
+        self.loop.run()
+
+    def on_input(self) -> None:
+        with self.profiler.span("input"):
+            stop: bool = self.handle_keys()
+        if stop:
+            self.loop.stop()
+        else:
+            self.draw()
+
+    def on_watch_events(self) -> None:
+        with self.profiler.span("watch"):
+            changed: bool = self.apply_watch_events()
+        if changed:
+            self.draw()
+
+    def on_operation_done(self, operation: Operation) -> None:
+        with self.profiler.span("operation_done"):
+            self.finish_operation(operation)
+        self.draw()
+
+    def finish_operation(self, operation: Operation) -> None:
+        self.logger.log_message(operation.message, operation.level)
+        if operation.action in ("undo", "redo"):
+            self.settle_reversal(operation)
+        elif operation.failed and operation.group in self.undo_groups and not self.journal.entries_of(operation.group):
+            self.undo_groups.remove(operation.group)  # nothing was changed that could be undone
+        if self.catalog is not None:
+            # a bulk operation fails as a whole when one file fails, it reports which ones did;
+            # if it raised instead, none of them is known to be done
+            failed_files: set[Path] = set(operation.failed_files)
+            for file_path in operation.files or [operation.file_path]:
+                failed: bool = operation.failed and (not failed_files or file_path in failed_files)
+                self.catalog.record_decision(
+                    operation.action,
+                    file_path,
+                    operation.target or (str(operation.new_path) if operation.new_path else None),
+                    "failed" if failed else "done",
+                    operation.message
                 )
+        if operation.failed:
+            self.failed_operations += 1
+            self.rollback(operation)
+            self.status_message = (operation.message, "error")
+        elif self.status_message is not None and self.status_message[1] != "error":
+            self.status_message = None
+
+    def on_resize(self) -> None:
+        width, height = shutil.get_terminal_size()
+        curses.resizeterm(height, width)
+        self.resize()
+        self.draw()
+
+    def handle_keys(self) -> bool:
+        """Handles every queued key before the next frame is drawn"""
+        key: int = self.input.get_key()
+        while key != -1:
+            with self.profiler.span(KEY_SPANS.get(key, "key.other")):
+                stop: bool = self.handle_keypress(key)
+            if stop:
+                return True
+            key = self.input.get_key()
+        return False
 
-            self.stdscr.refresh()
+    def next_key(self) -> int:
+        """Waits for the second key of a key sequence"""
+        return self.input.get_key(wait=True)
+
+    def log_key(self, key: int) -> None:
+        with self.profiler.span("log.key"):
+            self.logger.log_key_press(key)
+
+    def invalidate(self) -> None:
+        """Forces a full repaint on the next frame, e.g. after a popup window was closed"""
+        self.drawn = {}
+        self.renderer.clear()
+
+    def draw(self) -> None:
+        """Repaints only the regions whose state changed since the last frame"""
+        with self.profiler.span("draw"):
+            drawn: dict = self.drawn
+            if not drawn:
+                for pane in self.panes.values():
+                    pane.clear()
+
+            files_state: tuple = (
+                self.files_avaliable,
+                self.loading,
+                self.index.version,
+                self.scroll_pos,
+                self.max_visible,
+                self.marks_version,
+                self.selected_item_pos if self.visual_anchor is not None else None
+            )
+            with self.profiler.span("draw.files"):
+                if drawn.get("files") != files_state:
+                    self.display_file_list()
+                elif drawn.get("selected") != self.selected_item_pos:
+                    self.display_file_rows(drawn.get("selected", -1), self.selected_item_pos)
+
+            directories_state: tuple = tuple(self.target_directories)
+            if drawn.get("directories") != directories_state:
+                self.display_directories()
 
-            curses.flushinp()
-            key = self.stdscr.getch()
-            if key == -1:
-                continue
-            if self.handle_keypress(key):
-                break
+            image_state: tuple = (self.files_avaliable, self.selected_file())
+            if self.grid is not None:
+                image_state += (
+                    self.grid.page(self.selected_item_pos, self.num_files),
+                    self.index.version,
+                    self.marks_version
+                )
+            image_changed: bool = drawn.get("image") != image_state
+            if image_changed:
+                self.panes["col2"].clear()
+                if self.grid is not None and self.files_avaliable:
+                    self.display_grid_labels()
+
+            status_state: tuple = (
+                self.num_files,
+                self.marks_version,
+                self.selected_item_pos if self.visual_anchor is not None else None,
+                self.operations.pending,
+                self.status_message,
+                self.profiler.frames if self.show_profile else None
+            )
+            if drawn.get("status") != status_state:
+                self.display_status()
+
+            self.drawn = {
+                "files": files_state,
+                "selected": self.selected_item_pos,
+                "directories": directories_state,
+                "image": image_state,
+                "status": status_state,
+            }
+
+            with self.profiler.span("draw.refresh"):
+                for pane in self.panes.values():
+                    pane.refresh()
+                curses.doupdate()
+
+            if image_changed:
+                self.schedule_preview(delay=0 if not drawn else self.PREVIEW_DELAY)
+
+    def schedule_preview(self, delay: float) -> None:
+        """Debounces the preview, it is rendered once the cursor rested for `delay` seconds"""
+        if self.preview_timer is not None:
+            self.preview_timer.cancel()
+        if self.grid is None or not self.files_avaliable:
+            self.renderer.clear()  # the grid only replaces the tiles that changed
+
+        if not self.files_avaliable:
+            return
+        if delay <= 0:
+            self.display_image()
+        else:
+            self.preview_timer = self.loop.call_later(delay, self.display_image)
 
     def setup_ui(self):
         self.colors = self.ui.load_colors()
@@ -70,9 +411,16 @@ class ImageSorter:
         curses.curs_set(0)        # hide cursor
         curses.raw()
 
+        self.stdscr.nodelay(True)  # keys are read when the event loop reports input
+        self.stdscr.refresh()  # getch() would otherwise repaint the blank stdscr over the panes
+        self.resize()
+
+    def resize(self) -> None:
         self.height, self.width = self.stdscr.getmaxyx()
         self.max_visible = self.height - 4
         self.init_colunms()
+        self.clamp_cursor()
+        self.invalidate()
 
     def init_colunms(self):
         col1_width = self.width // 4
@@ -86,49 +434,350 @@ class ImageSorter:
         }
         self.bottom_y = self.height - 2 if self.height > 1 else self.height - 1
 
-    def draw_borders(self):
-        # TODO: apply colors to borders from the color scheme
-        for col_name, (x, width) in self.cols.items():
-            rectangle(self.stdscr, 0, x, self.bottom_y, x + width - 1)
+        self.panes: dict[str, Pane] = {
+            col_name: Pane(0, x, self.bottom_y + 1, width)
+            for col_name, (x, width) in self.cols.items()
+        }
+        self.panes["status"] = Pane(self.height - 1, 0, 1, self.width, border=False)
+
+    @property
+    def num_files(self) -> int:
+        return len(self.index)
 
     def load_files(self) -> None:
         """Loads files from the main directory"""
-        if self.args.tree:
-            directories: list[Path] = [d for d in Path(self.directory_path).iterdir() if d.is_dir()]
-            directories.append(Path(self.directory_path))
+        with self.profiler.span("load_files"):
+            self.scan_files()
+        self.check_files_avaliable()
+
+    def scan_files(self) -> None:
+        if self.args.find_duplicates:
+            clusters, elsewhere = self.find_duplicates()
+            self.index.clear()
+            self.index.extend(self.set_duplicates(clusters, elsewhere))
+        elif self.preset_files is not None:
+            self.index.clear()
+            self.index.extend(p for p in self.preset_files if p.exists())
+            self.order_files([self.index.path(pos) for pos in range(self.num_files)])
+        else:
+            self.index.scan()
+            self.order_files([self.index.path(pos) for pos in range(self.num_files)])
+
+    def start_loading(self) -> None:
+        """Streams the files in on a background thread, the first batch is shown right away"""
+        self.loading = True
+        threading.Thread(
+            target=self.load_files_in_background,
+            name="image_sorter-loader",
+            daemon=True
+        ).start()
+
+    def load_files_in_background(self) -> None:
+        try:
+            if self.args.find_duplicates:
+                clusters, elsewhere = self.find_duplicates()
+                self.loop.call_soon_threadsafe(
+                    lambda: self.on_files_loaded(self.set_duplicates(clusters, elsewhere))
+                )
+                return
+
+            batches = [self.preset_files] if self.preset_files is not None else self.index.iter_batches()
+            for batch in batches:
+                self.loop.call_soon_threadsafe(lambda batch=batch: self.on_files_loaded(batch))
+        finally:
+            self.loop.call_soon_threadsafe(self.on_loading_done)
+
+    def on_files_loaded(self, batch: list[Path]) -> None:
+        self.index.extend(batch)
+        self.order_files(batch)
+        if self.num_files > 0:
+            self.files_avaliable = True
+            self.clamp_cursor()
+        self.draw()
+
+    def on_loading_done(self) -> None:
+        self.loading = False
+        if self.rescan_pending:
+            self.apply_watch_events()
+        self.check_files_avaliable()
+        self.draw()
+
+    def order_files(self, new_files: list[Path] | None = None) -> None:
+        """Requests the metadata of new files and schedules sorting and filtering of the list
+
+        Without `new_files` the metadata of every file that has none yet is requested.
+        """
+        if self.sort_order is None and not self.filters:
+            return
 
-            raw_files, files = [], []
-            for dir in directories:
-                raw_f, f = get_files(dir)
-                raw_files.extend(raw_f)
-                files.extend(f)
+        if self.metadata_loader is not None:
+            if new_files is None:
+                new_files = [
+                    self.index.path(pos) for pos in range(self.num_files)
+                    if self.index.key(pos) not in self.metadata
+                ]
+            self.metadata_loader.request(new_files)
+        self.schedule_order()
+
+    def schedule_order(self) -> None:
+        """Throttles re-sorting, the list is ordered at most once per ORDER_DELAY"""
+        if self.order_timer is None:
+            self.order_timer = self.loop.call_later(self.ORDER_DELAY, self.apply_order)
+
+    def on_metadata_loaded(self, results: list[tuple[Path, Metadata]]) -> None:
+        with self.profiler.span("metadata"):
+            for file_path, metadata in results:
+                key: int = self.index.key_of(file_path)
+                self.metadata[key] = metadata
+                self.sort_keys.pop(key, None)
+            if self.catalog is not None:
+                self.catalog.record_metadata([(p, m.size, m.mtime, m.width, m.height, m.taken) for p, m in results])
+        self.schedule_order()
+
+    def passes_filters(self, pos: int) -> bool:
+        """Files are only dropped once their metadata proves they do not match"""
+        file_name: str = self.index.name(pos)
+        metadata: Metadata | None = self.metadata.get(self.index.key(pos))
+        return all(f.matches(file_name, metadata) is not False for f in self.filters)
+
+    def apply_order(self) -> None:
+        """Filters and stable-sorts the file list with the metadata known so far"""
+        self.order_timer = None
+        selected: Path | None = self.selected_file() if self.selected_item_pos > 0 else None
+
+        with self.profiler.span("order"):
+            if self.filters:
+                self.index.filter(self.passes_filters)
+            if self.sort_order is not None:
+                self.index.sort(self.sort_key_at, self.sort_order[1])
+
+        # the cursor follows its file, unless it still rests on the first row
+        if selected is not None and selected in self.index:
+            self.selected_item_pos = self.index.position(selected)
+        self.clamp_cursor()
+        self.files_avaliable = self.num_files > 0
+        self.draw()
+
+    def sort_key_at(self, pos: int) -> tuple:
+        """Sort key of an entry, cached until new metadata of the file arrives"""
+        entry: int = self.index.key(pos)
+        key: tuple | None = self.sort_keys.get(entry)
+        if key is None:
+            key = self.sort_keys[entry] = self.make_sort_key(self.index.name(pos), self.metadata.get(entry))
+        return key
+
+    def rekey_metadata(self, old_path: Path, new_path: Path) -> None:
+        """Keeps the metadata of a renamed file"""
+        old_key: int = self.index.key_of(old_path)
+        self.sort_keys.pop(old_key, None)
+        metadata: Metadata | None = self.metadata.pop(old_key, None)
+        if metadata is not None:
+            self.metadata[self.index.key_of(new_path)] = metadata
+
+    def find_duplicates(self) -> tuple[list[list[Path]], set[Path]]:
+        """Scans the input directory and groups similar images, runs off the UI thread
+
+        Returns the clusters reduced to the listed files and the listed files
+        that also have a duplicate in one of the output directories.
+        """
+        paths: list[Path] = [file_path for batch in self.index.iter_batches() for file_path in batch]
+        listed: set[Path] = set(paths)
+        if self.args.duplicates_in_output:
+            for target_dir in self.target_directories:
+                for batch in iter_files(target_dir, scan_depth(self.args)):
+                    paths.extend(file_path for file_path in batch if file_path not in listed)
+
+        clusters: list[list[Path]] = []
+        elsewhere: set[Path] = set()
+        for members in find_duplicates(paths, self.args.find_duplicates, self.args.duplicate_distance):
+            kept: list[Path] = [file_path for file_path in members if file_path in listed]
+            if len(kept) < len(members):
+                elsewhere.update(kept)
+            if len(kept) > 1 or (kept and len(members) > 1):
+                clusters.append(kept)
+        return clusters, elsewhere
+
+    def set_duplicates(self, clusters: list[list[Path]], elsewhere: set[Path]) -> list[Path]:
+        """Remembers the cluster of each file and returns the files in cluster order"""
+        self.duplicates = {
+            file_path: cluster
+            for cluster, members in enumerate(clusters)
+            for file_path in members
+        }
+        self.copies_elsewhere = elsewhere
+        self.logger.log_custom_event(
+            "duplicates",
+            f"{len(self.duplicates)} files in {len(clusters)} clusters, {len(elsewhere)} also in output directories"
+        )
+        return [file_path for members in clusters for file_path in members]
+
+    def cluster_of(self, pos: int) -> int | None:
+        if 0 <= pos < self.num_files:
+            return self.duplicates.get(self.index.path(pos))
+        return None
+
+    def cluster_marker(self, pos: int) -> str:
+        """Draws a bracket joining the rows of the same duplicate cluster"""
+        cluster: int | None = self.cluster_of(pos)
+        if cluster is None:
+            return " "
+
+        joined_above: bool = self.cluster_of(pos - 1) == cluster
+        joined_below: bool = self.cluster_of(pos + 1) == cluster
+        if joined_above and joined_below:
+            return "│"
+        if joined_above:
+            return "└"
+        if joined_below:
+            return "┌"
+        return "=" if self.index.path(pos) in self.copies_elsewhere else "·"
+
+    def cluster_positions(self) -> list[int]:
+        """Returns the positions of the cluster around the cursor, or just the cursor"""
+        cluster: int | None = self.cluster_of(self.selected_item_pos)
+        if cluster is None:
+            return [self.selected_item_pos]
+
+        start: int = self.selected_item_pos
+        while self.cluster_of(start - 1) == cluster:
+            start -= 1
+        stop: int = self.selected_item_pos + 1
+        while self.cluster_of(stop) == cluster:
+            stop += 1
+        return list(range(start, stop))
+
+    def rescan_files(self) -> None:
+        """Rebuilds the file index from disk keeping the selected file if it still exists"""
+        if self.loading:
+            return
 
-            self.raw_files, self.files = raw_files, files
-        else:
-            self.raw_files, self.files = get_files(self.directory_path)
+        selected: Path | None = self.selected_file()
+        self.load_files()
+
+        if selected is not None and selected in self.index:
+            self.selected_item_pos = self.index.position(selected)
+        self.clamp_cursor()
 
-        self.num_files = len(self.files)
+    def check_files_avaliable(self) -> None:
+        self.files_avaliable = self.num_files > 0
 
-        if not self.files:
+        if not self.files_avaliable:
             self.logger.log_message(
                 f"Failed to load files from {self.directory_path}",
                 level="error"
             )
             self.selected_item_pos = -1
-            self.files_avaliable = False
+
+    def selected_file(self) -> Path | None:
+        if 0 <= self.selected_item_pos < self.num_files:
+            return self.index.path(self.selected_item_pos)
+        return None
+
+    def clamp_cursor(self) -> None:
+        """Keeps the cursor inside the file list and the visible window"""
+        self.selected_item_pos = max(0, min(self.selected_item_pos, self.num_files - 1))
+        if self.num_files == 0:
+            self.selected_item_pos = -1
+
+        if self.selected_item_pos < self.scroll_pos:
+            self.scroll_pos = self.selected_item_pos
+        elif self.selected_item_pos >= self.scroll_pos + self.max_visible:
+            self.scroll_pos = self.selected_item_pos - self.max_visible + 1
+        self.scroll_pos = max(0, min(self.scroll_pos, self.num_files - self.max_visible))
+
+    def remove_file(self, pos: int) -> None:
+        """Removes a single entry from the file index after it left the input directory"""
+        self.index.remove(pos)
+        self.clamp_cursor()
+        self.check_files_avaliable()
+
+    def remove_files(self, positions: list[int]) -> None:
+        """Removes several entries from the file index in one pass, the cursor keeps its file if it stays"""
+        removed: set[int] = set(positions)
+        self.selected_item_pos -= sum(1 for pos in removed if pos < self.selected_item_pos)
+        self.index.filter(lambda pos: pos not in removed)
+        self.clamp_cursor()
+        self.check_files_avaliable()
+
+    def start_watcher(self) -> None:
+        """Starts watching the input directory, events are applied from the event loop"""
+        try:
+            self.watcher = DirectoryWatcher(
+                self.directory_path,
+                scan_depth(self.args),
+                notify=lambda: self.loop.call_soon_threadsafe(self.on_watch_events)
+            )
+        except OSError as e:
+            self.logger.log_message(f"Watching {self.directory_path}: {e}", level="error")
+            return
+
+        self.watcher.start()
+
+    def apply_watch_events(self) -> bool:
+        """Applies pending filesystem events to the file index, returns True if it changed"""
+        if self.watcher is None:
+            return False
+
+        selected: Path | None = self.selected_file()
+        changed: bool = False
+        while True:
+            try:
+                kind, path = self.watcher.events.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "created":
+                if path not in self.index and self.index.is_allowed(path) and path.is_file():
+                    self.index.append(path)
+                    self.order_files([path])
+                    changed = True
+            elif kind == "deleted":
+                changed |= self.index.discard(path) >= 0
+            elif kind == "created_dir":
+                depth: int = len(path.relative_to(self.directory_path).parts)
+                self.index.add_directory(path, self.index.depth - depth)
+                self.order_files()
+                changed = True
+            elif kind == "deleted_dir":
+                self.index.discard_directory(path)
+                changed = True
+            elif kind == "rescan":
+                self.rescan_pending = True
+
+        if self.rescan_pending and not self.loading:
+            self.rescan_pending = False
+            self.rescan_files()
+            return True
+
+        if changed:
+            if selected is not None and selected in self.index:
+                self.selected_item_pos = self.index.position(selected)
+            self.clamp_cursor()
+            self.files_avaliable = self.num_files > 0
+        return changed
 
     def handle_keypress(self, key):
+        if key in (ord("u"), ord("U")):
+            self.submit_undo(redo=key == ord("U"))
+            return False
+
+        if key == ord("p"):
+            self.toggle_profile()
+            return False
+
         if not self.files_avaliable:
-            return True
+            waiting: bool = self.loading or self.watcher is not None or self.operations.pending > 0
+            return key == ord("q") if waiting else True
 
-        if self.selected_item_pos >= 0:
-            file_path: Path = self.raw_files[self.selected_item_pos]
-        else:
-            file_path = None
+        file_path: Path | None = self.selected_file()
 
-        self.logger.log_key_press(key)
+        if self.grid is not None and key in (curses.KEY_DOWN, ord("j"), curses.KEY_UP, ord("k")):
+            self.move_in_grid(self.grid.columns if key in (curses.KEY_DOWN, ord("j")) else -self.grid.columns)
 
-        if key in (curses.KEY_DOWN, ord("j")):
+        elif key in (curses.KEY_LEFT, curses.KEY_RIGHT):
+            self.move_in_grid(1 if key == curses.KEY_RIGHT else -1)
+
+        elif key in (curses.KEY_DOWN, ord("j")):
             if self.selected_item_pos < self.num_files - 1:
                 self.selected_item_pos += 1
             else:
@@ -160,27 +809,60 @@ class ImageSorter:
             if self.scroll_pos < 0:
                 self.scroll_pos = 0
 
+        elif key in (curses.KEY_DC, ord("d")) and self.has_selection():
+            self.submit_bulk(self.selected_positions())
+
         elif key in (curses.KEY_DC, ord("d")):
-            self.logger.log_message("Delete is not working", "error")
-            log_message, log_level = delete_file(
-                file_path,
-                self.args.safe_delete
+            self.submit_operation(
+                Operation("delete", file_path, keys=(file_path,)),
+                delete_file, file_path, self.args.safe_delete
             )
-            self.logger.log_message(log_message, log_level)
-            self.load_files()
+
+        elif key == ord("m"):
+            self.toggle_marks([self.selected_item_pos])
+            self.selected_item_pos = min(self.selected_item_pos + 1, self.num_files - 1)
+            self.clamp_cursor()
+
+        elif key == ord("v"):
+            self.toggle_visual()
+
+        elif key == ord("M"):
+            self.clear_marks()
+
+        elif key == ord("g"):
+            self.toggle_grid()
+
+        elif key == ord("/"):
+            self.mark_pattern(self.get_pattern())
+            self.invalidate()
 
         elif key in (curses.KEY_F2, ord("r")):
             new_name = self.get_new_name(file_path)
+            self.invalidate()
+
+            new_path: Path = file_path.parent / new_name
+            if new_path != file_path and new_path in self.index:
+                message: tuple[str, str] = (f'File "{new_name}" already exists, "{file_path.name}" not renamed', "error")
+                self.logger.log_message(*message)
+                self.status_message = message
+            elif new_path != file_path:
+                self.submit_operation(
+                    Operation("rename", file_path, new_path=new_path, keys=(file_path, new_path)),
+                    rename_file, file_path, new_name
+                )
 
-            log_message, log_level = rename_file(file_path, new_name)
-            self.logger.log_message(log_message, log_level)
-            self.load_files()
+        elif key == ord("c") and self.duplicates:
+            self.process_cluster_keypress(self.next_key())
 
-            self.selected_item_pos = self.num_files - 1
-            self.scroll_pos = max(0, self.num_files - self.max_visible)
+        elif key in (curses.KEY_F5, ord("R")):
+            self.rescan_files()
 
         elif key in (curses.KEY_F1, ord("h")):
             self.open_help_menu()
+            self.invalidate()
+
+        elif key == curses.KEY_RESIZE:
+            self.resize()
 
         elif key in (curses.KEY_ENTER, 10, 13):
             open_with_system_app(file_path)
@@ -195,14 +877,114 @@ class ImageSorter:
 
     def process_keypress(self, key: int, file_path: Path) -> None:
         """Handles keypress events for moving or copying files to target directories"""
+        target_dir: str | None = self.target_directory(key)
+        if target_dir is None:
+            return
+        if self.has_selection():
+            self.submit_bulk(self.selected_positions(), target_dir)
+        else:
+            self.submit_move(file_path, target_dir)
+
+    def process_cluster_keypress(self, key: int) -> None:
+        """Deletes, moves, copies or marks every file of the duplicate cluster under the cursor"""
+        positions: list[int] = self.cluster_positions()
+
+        if key == ord("m"):
+            self.toggle_marks(positions)
+            return
+        if key in (curses.KEY_DC, ord("d")):
+            self.submit_bulk(positions)
+        else:
+            target_dir: str | None = self.target_directory(key)
+            if target_dir is None:
+                return
+            self.submit_bulk(positions, target_dir)
+
+        self.selected_item_pos = positions[0]
+        self.clamp_cursor()
+
+    def has_selection(self) -> bool:
+        return bool(self.marked) or self.visual_anchor is not None
+
+    def visual_range(self) -> range:
+        """Positions between the start of the visual selection and the cursor"""
+        if self.visual_anchor is None:
+            return range(0)
+        anchor: int = self.visual_anchor_position()
+        if anchor < 0:  # the file left the list meanwhile
+            anchor = self.selected_item_pos
+        return range(min(anchor, self.selected_item_pos), max(anchor, self.selected_item_pos) + 1)
+
+    def visual_anchor_position(self) -> int:
+        """Position of the visual anchor, looked up again only after the list changed"""
+        version, pos = self.visual_anchor_at
+        if version != self.index.version:
+            pos = self.index.position(self.visual_anchor)
+            self.visual_anchor_at = (self.index.version, pos)
+        return pos
+
+    def selected_positions(self) -> list[int]:
+        """Positions of the marked files and of the visual selection, in list order"""
+        positions: set[int] = set(self.visual_range())
+        for key in self.marked:
+            positions.update(self.index.positions_of(key))
+        return sorted(positions)
+
+    def is_marked(self, pos: int) -> bool:
+        if not self.marked and self.visual_anchor is None:
+            return False
+        return self.index.key(pos) in self.marked or pos in self.visual_range()
+
+    def toggle_marks(self, positions: list[int]) -> None:
+        """Marks the files at the positions, or unmarks them if all of them are marked"""
+        keys: set[int] = {self.index.key(pos) for pos in positions if 0 <= pos < self.num_files}
+        if keys <= self.marked:
+            self.marked -= keys
+        else:
+            self.marked |= keys
+        self.marks_version += 1
+
+    def toggle_visual(self) -> None:
+        """Starts a visual selection at the cursor, or marks the selected range"""
+        if self.visual_anchor is None:
+            self.visual_anchor = self.selected_file()
+            self.visual_anchor_at = (self.index.version, self.selected_item_pos)
+            return
+        self.marked.update(self.index.key(pos) for pos in self.visual_range())
+        self.visual_anchor = None
+        self.marks_version += 1
+
+    def clear_marks(self) -> None:
+        self.marked.clear()
+        self.visual_anchor = None
+        self.marks_version += 1
+
+    def mark_pattern(self, pattern: str) -> None:
+        """Marks the files whose name matches a shell pattern, a plain word matches anywhere in the name"""
+        if not pattern:
+            return
+        if not any(char in pattern for char in "*?["):
+            pattern = f"*{pattern}*"
+        pattern = pattern.lower()
+
+        before: int = len(self.marked)
+        self.marked.update(
+            self.index.key(pos) for pos in range(self.num_files)
+            if fnmatch.fnmatchcase(self.index.name(pos).lower(), pattern)
+        )
+        self.marks_version += 1
+        self.status_message = (f"{len(self.marked) - before} files marked", "info")
+
+    def target_directory(self, key: int) -> str | None:
+        """Resolves the target directory of a key sequence like `3`, `ALT + 3` or `` ` + 3``"""
         target_index: int = -1
         prefix_increment: int = 0
 
         if key == 27:  # ESC, ALT key
-            next_key = self.stdscr.getch()
+            next_key = self.next_key()
             prefix_increment = 10
         elif key == ord("`"):
-            next_key = self.stdscr.getch()
+            next_key = self.next_key()
             prefix_increment = 20
         else:
             next_key = key
@@ -213,91 +995,490 @@ class ImageSorter:
             target_index = prefix_increment + 10
 
         if 1 <= target_index <= len(self.target_directories):
-            target_dir = self.target_directories[target_index - 1]
+            return self.target_directories[target_index - 1]
+        return None
+
+    def submit_move(self, file_path: Path, target_dir: str, position: int = -1) -> None:
+        action: str = "link" if self.args.link else "copy" if self.args.copy_mode else "move"
+        target: str = str(Path(target_dir).resolve())
+        self.submit_operation(
+            Operation(action, file_path, position=position, target=target, keys=(file_path, target)),
+            move_file, file_path, target_dir, self.args.auto_rename, self.args.copy_mode, self.args.on_duplicate,
+            self.args.link
+        )
 
-            log_message, log_level = move_file(
-                file_path,
-                target_dir,
-                self.args.auto_rename,
-                self.args.copy_mode
+    def submit_bulk(self, positions: list[int], target_dir: str | None = None) -> None:
+        """Deletes the files at the positions, or moves or copies them to `target_dir`, as one undoable operation"""
+        files: list[Path] = [self.index.path(pos) for pos in positions]
+        if target_dir is None:
+            operation: Operation = Operation("delete", files[0], files=files, positions=positions, keys=tuple(files))
+            self.submit_operation(
+                operation,
+                functools.partial(delete_files, failed=operation.failed_files), files, self.args.safe_delete
+            )
+        else:
+            action: str = "link" if self.args.link else "copy" if self.args.copy_mode else "move"
+            target: str = str(Path(target_dir).resolve())
+            operation = Operation(action, files[0], target=target, files=files, positions=positions, keys=(*files, target))
+            self.submit_operation(
+                operation,
+                functools.partial(move_files, failed=operation.failed_files), files, target_dir, self.args.auto_rename,
+                self.args.copy_mode, self.args.on_duplicate, self.args.link
+            )
+        self.clear_marks()
+
+    def submit_operation(self, operation: Operation, func, *args) -> None:
+        """Applies the expected result to the file list and runs the operation in the background"""
+        if operation.position < 0:
+            operation.position = self.selected_item_pos
+
+        if operation.action in ("undo", "redo"):
+            self.apply_reversal(operation)
+        elif operation.files:
+            if operation.action in ("move", "delete"):
+                self.remove_files(operation.positions)
+        elif operation.action in ("move", "delete"):
+            self.remove_file(operation.position)
+        elif operation.action == "rename":
+            self.index.rename(operation.position, operation.new_path)
+            self.rekey_metadata(operation.file_path, operation.new_path)
+
+        if self.journal is None or operation.action in ("undo", "redo"):
+            self.operations.submit(operation, func, *args)  # an undo or redo journals its changes itself
+            return
+
+        operation.group = self.journal.new_group()
+        operation.keys += (("group", operation.group),)  # an undo or redo of the operation waits for it
+        if operation.action != "delete" or self.args.safe_delete:
+            self.undo_groups.append(operation.group)
+            for group in self.redo_groups:
+                self.session_operations.pop(group, None)
+            self.redo_groups.clear()
+            self.session_operations[operation.group] = operation
+        run = functools.partial(self.journal.run, group=operation.group)
+        self.operations.submit(operation, run, operation.action, func, *args)
+
+    def open_journal(self, path: Path | None = None) -> Journal | None:
+        """Opens the undo journal, the shared one without `path`, and repairs operations a crash left unfinished"""
+        journal: Journal | None = Journal.open(path) if path is not None else Journal.open()
+        if journal is None:
+            self.logger.log_message("Undo journal is used by another session, undo is disabled", "warning")
+            return None
+
+        repaired: list[str] = journal.repair()
+        for message in repaired:
+            self.logger.log_message(message, "warning")
+        if repaired:
+            self.status_message = (f"Repaired {len(repaired)} interrupted operation(s), see the log", "info")
+        journal.compact()
+        return journal
+
+    def submit_undo(self, redo: bool = False) -> None:
+        """Reverses the last operation, or reapplies the last undone one, in the background
+
+        The file list changes right away like for any other operation. The
+        reversal is queued behind the operation it reverses, which may not
+        have finished yet.
+        """
+        if self.journal is None:
+            self.status_message = ("Undo is disabled, the journal is used by another session", "error")
+            return
+
+        stack, other = (self.redo_groups, self.undo_groups) if redo else (self.undo_groups, self.redo_groups)
+        if not stack:
+            self.status_message = ("Nothing to redo" if redo else "Nothing to undo", "info")
+            return
+        group: int = stack.pop()
+        other.append(group)
+
+        changes, positions = self.expected_changes(group)
+        if not redo:
+            changes = [(new_path, old_path) for old_path, new_path in changes]
+        # spelled like the file list, so later operations on the same files wait for this one
+        paths: list[Path] = [self.listed_path(p) or p for change in changes for p in change if p is not None]
+        self.submit_operation(
+            Operation(
+                "redo" if redo else "undo",
+                next((new_path for _, new_path in changes if new_path is not None), paths[0]),
+                changes=changes,
+                positions=positions,
+                group=group,
+                keys=(("group", group), *paths)
+            ),
+            self.journal.redo_group if redo else self.journal.undo_group, group
+        )
+
+    def expected_changes(self, group: int) -> tuple[list[tuple[Path | None, Path | None]], list[int]]:
+        """Predicts the (old path, new path) of every file of an operation and their positions in the file list
+
+        An operation of this session may still be running, its changes are
+        taken from the operation itself. A new path that is only known once
+        it ran, e.g. a numbered name, is None.
+        """
+        operation: Operation | None = self.session_operations.get(group)
+        if operation is None:
+            entries: list[JournalEntry] = self.journal.entries_of(group)
+            return (
+                [(entry.source if entry.kind == "relocate" else None, entry.destination) for entry in entries],
+                [-1] * len(entries)
             )
 
-            self.logger.log_message(log_message, log_level)
-            self.load_files()
+        if operation.action == "rename":
+            return [(operation.file_path, operation.new_path)], [operation.position]
+
+        files: list[Path] = operation.files or [operation.file_path]
+        positions: list[int] = operation.positions or [operation.position]
+        if operation.action == "delete":
+            return [(file_path, None) for file_path in files], positions
+
+        targets: list[Path | None] = [
+            None if self.args.auto_rename else Path(operation.target) / file_path.name for file_path in files
+        ]
+        if operation.action == "move":
+            return list(zip(files, targets)), positions
+        return [(None, target) for target in targets], positions
+
+    def apply_reversal(self, operation: Operation) -> None:
+        """Applies the changes of an undo or redo to the file list, the old paths leave and the new ones are listed"""
+        restored: list[tuple[int, Path]] = []
+        for (old_path, new_path), pos in zip(operation.changes, operation.positions):
+            old_listed: Path | None = self.listed_path(old_path) if old_path is not None else None
+            new_listed: Path | None = self.listed_path(new_path) if new_path is not None else None
+            if new_listed is not None and new_listed in self.index:
+                new_listed = None
+            old_pos: int = self.index.position(old_listed) if old_listed is not None else -1
+
+            if old_pos >= 0 and new_listed is not None:
+                self.index.rename(old_pos, new_listed)
+                self.rekey_metadata(old_listed, new_listed)
+            elif old_pos >= 0:
+                self.index.remove(old_pos)
+            elif new_listed is not None:
+                restored.append((pos, new_listed))
+
+        # ascending, so every file of the operation gets its old position back
+        for pos, file_path in sorted(restored, key=lambda item: item[0]):
+            self.index.insert(min(pos, self.num_files) if pos >= 0 else max(self.selected_item_pos, 0), file_path)
+        if restored:
+            self.order_files([file_path for _, file_path in restored])
+            self.selected_item_pos = self.index.position(restored[0][1])
+
+        self.files_avaliable = self.num_files > 0
+        self.clamp_cursor()
+
+    def settle_reversal(self, operation: Operation) -> None:
+        """Drops listed paths an undo or redo left empty that could not be expected, e.g. numbered names
+
+        Expected paths are left alone, later operations may already have
+        changed them in the file list.
+        """
+        expected: set[Path] = {p for change in operation.changes for p in change if p is not None}
+        for entry in self.journal.entries_of(operation.group):
+            for file_path in (entry.source, entry.destination):
+                listed: Path | None = self.listed_path(file_path)
+                if listed is None or listed in expected or file_path in expected:
+                    continue
+                pos: int = self.index.position(listed)
+                if pos >= 0 and not listed.exists():
+                    self.index.remove(pos)
+
+        if operation.failed and operation.group in self.journal.groups(redo=operation.action == "redo"):
+            # not reversed, so it can be tried again
+            done, pending = (self.redo_groups, self.undo_groups) if operation.action == "undo" else (self.undo_groups, self.redo_groups)
+            if operation.group in done:
+                done.remove(operation.group)
+                pending.append(operation.group)
+
+    def listed_path(self, file_path: Path) -> Path | None:
+        """Spells a path the way the file list does, or returns None if it is outside the listed tree"""
+        root: Path = Path(self.directory_path)
+        try:
+            relative: Path = file_path.relative_to(os.path.abspath(root))
+        except ValueError:
+            return None
+        if len(relative.parts) - 1 > self.index.depth or not self.index.is_allowed(file_path):
+            return None
+        return root / relative
+
+    def rollback(self, operation: Operation) -> None:
+        """Restores the file list entry of a failed operation"""
+        selected: Path | None = self.selected_file()
+
+        if operation.action in ("undo", "redo"):
+            # files that were not reversed are still at their old paths
+            for (old_path, new_path), pos in sorted(zip(operation.changes, operation.positions), key=lambda item: item[1]):
+                new_listed: Path | None = self.listed_path(new_path) if new_path is not None else None
+                if new_listed is not None and new_listed in self.index and not new_listed.exists():
+                    self.index.remove(self.index.position(new_listed))
+                old_listed: Path | None = self.listed_path(old_path) if old_path is not None else None
+                if old_listed is not None and old_listed.exists() and old_listed not in self.index:
+                    self.index.insert(min(pos, self.num_files) if pos >= 0 else max(self.selected_item_pos, 0), old_listed)
+        elif operation.files:
+            if operation.action in ("move", "delete"):
+                # ascending, so every file gets its old position back
+                for pos, file_path in sorted(zip(operation.positions, operation.files)):
+                    if file_path.exists() and file_path not in self.index:
+                        self.index.insert(min(pos, self.num_files), file_path)
+        elif operation.action in ("move", "delete"):
+            if operation.file_path.exists():
+                self.index.insert(min(operation.position, self.num_files), operation.file_path)
+        elif operation.action == "rename":
+            pos: int = self.index.position(operation.new_path)
+            if pos >= 0:
+                self.index.rename(pos, operation.file_path)
+                self.rekey_metadata(operation.new_path, operation.file_path)
+
+        self.files_avaliable = self.num_files > 0
+        if selected is not None and selected in self.index:
+            self.selected_item_pos = self.index.position(selected)
+        self.clamp_cursor()
 
     def display_file_list(self) -> None:
         """Display a list of files in the first column with scrolling functionality"""
-        for i in range(min(self.max_visible, len(self.files) - self.scroll_pos)):
-            file_index: int = self.scroll_pos + i
-            if file_index >= self.num_files:
-                break
+        pane: Pane = self.panes["col1"]
+        pane.clear()
 
-            file_index_length: int = len(str(self.num_files))
-            file_index_str: str = f"{file_index:>{file_index_length}}"
-            max_line_length: int = max(len(f) for f in self.files)
-            file_name: str = self.files[file_index]
+        if not self.files_avaliable:
+            if self.loading:
+                message: str = "Finding duplicates..." if self.args.find_duplicates else "Loading files..."
+                pane.addstr(1, 2, message, self.ui.get_color("text"))
+            else:
+                pane.addstr(1, 2, "No files available", self.ui.get_color("error"))
+            return
 
-            formatted_line: str = f"{file_index_str}  {file_name:<{max_line_length}}"
-            formatted_line = formatted_line.ljust(self.cols["col1"][0] - 4)
+        rows: list[str] = self.layout.rows(
+            self.scroll_pos,
+            self.max_visible,
+            self.cols["col1"][0] - 4
+        )
+        for i, formatted_line in enumerate(rows):
+            self.display_file_row(self.scroll_pos + i, formatted_line)
 
-            if file_index == self.selected_item_pos:
-                attr = self.ui.get_color("text_highlight", self.ui.elements.get("cursor", "normal"))
-            else:
-                attr = self.ui.get_color("text")
-            self.stdscr.addstr(1 + i, self.cols["col1"][0] + 2, formatted_line, attr)
+    def display_file_rows(self, *positions: int) -> None:
+        """Repaints single rows of the file list, e.g. after the cursor moved"""
+        if not self.files_avaliable:
+            return
+
+        for file_index in positions:
+            if self.scroll_pos <= file_index < min(self.num_files, self.scroll_pos + self.max_visible):
+                self.panes["col1"].clear_row(1 + file_index - self.scroll_pos)
+                self.display_file_row(
+                    file_index,
+                    self.layout.row(file_index, self.cols["col1"][0] - 4)
+                )
+
+    def display_file_row(self, file_index: int, formatted_line: str) -> None:
+        if file_index == self.selected_item_pos:
+            attr = self.ui.get_color("text_highlight", self.ui.elements.get("cursor", "normal"))
+        else:
+            attr = self.ui.get_color("text")
+        if self.is_marked(file_index):
+            width: int = self.layout.index_width
+            formatted_line = f"{formatted_line[:width]}*{formatted_line[width + 1:]}"
+            attr |= curses.A_BOLD
+        self.panes["col1"].addstr(1 + file_index - self.scroll_pos, 2, formatted_line, attr)
+
+    def display_status(self) -> None:
+        pane: Pane = self.panes["status"]
+        pane.clear()
 
         file_label: str = "No files" if self.num_files == 0 else f"Total files: {self.num_files}"
-        self.stdscr.addstr(
-            self.height - 1,
-            self.cols["col1"][0] + 2,
-            file_label,
-            self.ui.get_color("text_highlight")
-        )
+        if self.has_selection():
+            file_label += f"  {len(self.selected_positions())} marked"
+        pane.addstr(0, self.cols["col1"][0] + 2, file_label, self.ui.get_color("text_highlight"))
+
+        message, level = self.status_message or ("", "info")
+        pending: int = self.operations.pending
+        if pending:
+            message = f"{pending} operation{'s' if pending > 1 else ''} pending  {message}"
+        if message:
+            color: str = "error" if level == "error" else "text"
+            pane.addstr(0, self.cols["col2"][0] + 2, message, self.ui.get_color(color))
+
+        if self.show_profile:  # right-aligned, but never over the message
+            timings: str = self.profiler.breakdown()
+            x: int = max(self.cols["col2"][0] + 2 + len(message) + 2, self.width - len(timings) - 1)
+            pane.addstr(0, x, timings, self.ui.get_color("text_highlight"))
+
+    def toggle_profile(self) -> None:
+        """Shows or hides the timing overlay, spans are only recorded while it is shown or with --profile"""
+        self.show_profile = not self.show_profile
+        self.profiler.enabled = self.show_profile or self.profiler.trace_file is not None
+        self.loop.on_iteration = self.profiler.end_frame if self.profiler.enabled else None
 
     def display_image(self) -> None:
-        """Displays an image using Kitty's icat with a dynamically sized picture"""
-        if self.selected_item_pos < 0:
+        """Displays the selected image through the kitty graphics protocol"""
+        with self.profiler.span("preview"):
+            self.preview_timer = None
+            if self.selected_item_pos < 0:
+                self.renderer.clear()
+                return
+
+            if self.grid is not None:
+                self.display_grid()
+                return
+
+            file_path: Path = self.index.path(self.selected_item_pos)
+            img_pos_left, img_pos_top, img_width, img_height = self.preview_geometry()
+
+            mirror: str = self.get_mirror()
+            with self.profiler.span("preview.kitty"):
+                shown: bool = self.renderer.show(file_path, img_pos_left, img_pos_top, img_width, img_height, mirror)
+            self.prefetch_neighbours()
+            if shown:
+                self.record_thumbnail(file_path, mirror)
+                return
+
+            # the image format needs Pillow to be decoded, let kitty convert it instead
+            self.renderer.clear()
+            if not sys.stdout.isatty():  # e.g. during --replay, kitty icat would draw on the real terminal
+                return
+            try:
+                with self.profiler.span("preview.icat"):
+                    subprocess.run([
+                        "kitty", "icat",
+                        "--align", "left",
+                        "--place", f"{img_width}x{img_height}@{img_pos_left}x{img_pos_top}",
+                        "--no-trailing-newline", "--silent",
+                        "--mirror", mirror,
+                        "--clear",
+                        str(file_path)
+                    ], stderr=subprocess.DEVNULL, check=True)
+            except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                error_message: str = "Error displaying image"  # : {e}"
+                self.panes["col2"].addstr(1, 2, error_message, self.ui.get_color("error"))
+                self.panes["col2"].refresh()
+                curses.doupdate()
+
+    def toggle_grid(self) -> None:
+        """Switches the preview between the selected image and a grid of thumbnails around it"""
+        if self.grid is not None:
+            self.grid = None
+            return
+        self.grid = GridLayout(*self.grid_size)
+        # the pages before and after stay in the terminal, so scrolling back does not transmit them again
+        self.renderer.max_images = max(KittyRenderer.MAX_IMAGES, 3 * self.grid.size)
+
+    def move_in_grid(self, step: int) -> None:
+        """Moves the focus to another tile, by a row or a single file"""
+        self.selected_item_pos = max(0, min(self.selected_item_pos + step, self.num_files - 1))
+        self.clamp_cursor()
+
+    def grid_tiles(self) -> list[tuple[int, tuple[int, int, int, int]]]:
+        """Returns the position and the cell box of every tile of the grid page"""
+        positions: range = self.grid.page(self.selected_item_pos, self.num_files)
+        return list(zip(positions, self.grid.tiles(*self.preview_geometry())))
+
+    def display_grid_labels(self) -> None:
+        """Writes the position and name of every file under its tile, the focused tile is highlighted"""
+        pane: Pane = self.panes["col2"]
+        for pos, (left, top, width, height) in self.grid_tiles():
+            if pos == self.selected_item_pos:
+                attr = self.ui.get_color("text_highlight", self.ui.elements.get("cursor", "normal"))
+            else:
+                attr = self.ui.get_color("text")
+            prefix: str = f"{pos}{'*' if self.is_marked(pos) else ' '}"
+            name: str = self.index.label(pos)
+            room: int = max(0, width - 1 - len(prefix))
+            if len(name) > room:  # the end of a name tells similar names apart
+                name = name[len(name) - room:]
+            pane.addstr(top + height - 1, left - pane.x, f"{prefix}{name}"[:width - 1], attr)
+
+    def display_grid(self) -> None:
+        """Displays the thumbnails of the grid page, missing ones are decoded in the background
+
+        Tiles are placed as soon as their thumbnail is ready, so a page of
+        large images never blocks the keys.
+        """
+        mirror: str = self.get_mirror()
+        box: tuple[int, int] = self.tile_box()
+        tiles: list[tuple[Path, int, int, int, int] | None] = []
+        waiting: list[Path] = []
+        for pos, (left, top, width, height) in self.grid_tiles():
+            file_path: Path = self.index.path(pos)
+            ready: bool = (
+                not self.prefetcher.enabled
+                or self.prefetcher.ready(file_path, box, mirror)
+                or self.renderer.transmitted(file_path, mirror, tile=True)
+            )
+            if ready:
+                tiles.append((file_path, left, top, width - 1, height - 1))  # a column gap, a row for the label
+            else:
+                tiles.append(None)
+                waiting.append(file_path)
+
+        with self.profiler.span("preview.grid"):
+            self.renderer.show_tiles(tiles, mirror)
+
+        # the missing tiles first, then the pages after and before
+        start, size = self.grid.start, self.grid.size
+        ahead: list[int] = [
+            pos for pos in (*range(start + size, start + 2 * size), *range(start - 1, start - size - 1, -1))
+            if 0 <= pos < self.num_files
+        ]
+        self.prefetcher.prefetch(waiting + [self.index.path(pos) for pos in ahead], box, mirror)
+
+    def on_thumbnail_decoded(self, file_path: Path) -> None:
+        """Called by the prefetch workers, the grid collects the decoded tiles and places them together"""
+        if self.grid is not None and self.loop.running:
+            self.loop.call_soon_threadsafe(self.on_thumbnails_ready)
+
+    def on_thumbnails_ready(self) -> None:
+        if self.grid is not None and self.files_avaliable and self.preview_timer is None:
+            self.preview_timer = self.loop.call_later(self.TILE_DELAY, self.display_image)
+
+    def tile_box(self) -> tuple[int, int]:
+        """Returns the size of the image area of a grid tile in pixels"""
+        _, _, width, height = self.grid.tiles(*self.preview_geometry())[0]
+        return preview_box(width - 1, height - 1, self.renderer.cell_size())
+
+    def load_tile(self, file_path: Path, mirror: str):
+        return self.prefetcher.load(file_path, self.tile_box(), mirror)
+
+    def record_thumbnail(self, file_path: Path, mirror: str) -> None:
+        """Points the catalog entry of a file to its thumbnail in the thumbnail store"""
+        if self.catalog is None or self.prefetcher.store is None:
             return
+        key: str | None = store_key(file_path, self.preview_box(), mirror)
+        if key is not None:
+            self.catalog.record_thumbnail(file_path, key)
+
+    def preview_geometry(self) -> tuple[int, int, int, int]:
+        """Returns the left, top, width and height of the preview box in cells"""
+        return preview_geometry(self.cols["col2"][0])
 
-        file_path: Path = self.raw_files[self.selected_item_pos]
-        col2_x: int = self.cols["col2"][0]
+    def preview_box(self) -> tuple[int, int]:
+        """Returns the size of the preview box in pixels"""
+        _, _, img_width, img_height = self.preview_geometry()
+        return preview_box(img_width, img_height, self.renderer.cell_size())
 
-        term_width, term_height = shutil.get_terminal_size()
-        img_width: int = max(10, term_width - 2 * col2_x - 5)
-        img_height: int = max(10, term_height - 4)
-        img_pos_left: int = col2_x + 1  # col2_x + border width
-        img_pos_top: int = 1  # border width
+    def load_thumbnail(self, file_path: Path, mirror: str):
+        return self.prefetcher.load(file_path, self.preview_box(), mirror)
 
-        # subprocess.run(["clear"])
-        self.stdscr.refresh()
+    def prefetch_neighbours(self) -> None:
+        """Queues decoding of the files around the cursor, nearest first"""
+        if not self.prefetcher.enabled or self.selected_item_pos < 0:
+            return
 
-        mirror = "none"
-        mirror_horizontal = self.ui.elements.get("mirror", False)
-        mirror_vertical = self.ui.elements.get("mirror_vertical", False)
+        mirror: str = self.get_mirror()
+        paths: list[Path] = []
+        for distance in range(1, self.prefetcher.radius + 1):
+            for pos in (self.selected_item_pos + distance, self.selected_item_pos - distance):
+                if 0 <= pos < self.num_files:
+                    paths.append(self.index.path(pos))
 
-        if mirror_horizontal and mirror_vertical:
-            mirror = "both"
-        elif mirror_horizontal:
-            mirror = "horizontal"
-        elif mirror_vertical:
-            mirror = "vertical"
+        if mirror == "none":  # PNG files are read by the terminal directly
+            paths = [p for p in paths if p.suffix.lower() != ".png"]
+        self.prefetcher.prefetch(paths, self.preview_box(), mirror)
 
-        try:
-            subprocess.run([
-                "kitty", "icat",
-                "--align", "left",
-                "--place", f"{img_width}x{img_height}@{img_pos_left}x{img_pos_top}",
-                "--no-trailing-newline", "--silent",
-                "--mirror", mirror,
-                "--clear",
-                str(file_path)
-            ], stderr=subprocess.DEVNULL, check=True)
-        except subprocess.CalledProcessError as e:
-            error_message: str = "Error displaying image"  # : {e}"
-            self.stdscr.addstr(1, col2_x + 2, error_message, self.ui.get_color("error"))
+    def get_mirror(self) -> str:
+        return mirror_mode(self.ui.elements)
 
     def display_directories(self) -> None:
         """Displays formatted target directories with indexed previews"""
+        pane: Pane = self.panes["col3"]
+        pane.clear()
+
         MAX_DISPLAY = 30
         PREFIX_MAP = {21: "`+", 11: "a+"}
 
@@ -316,13 +1497,10 @@ class ImageSorter:
             preview: str = f"{prefix}{i % 10}" if prefix else str(i % 10)
             formatted_line: str = f"{preview:<{max_index_length}}  {dir}"
 
-            self.stdscr.addstr(
-                i, self.cols["col3"][0] + 2,
-                formatted_line,
-                self.ui.get_color("text")
-            )
+            pane.addstr(i, 2, formatted_line, self.ui.get_color("text"))
 
     def open_help_menu(self) -> None:
+        self.renderer.clear()
         help_win = curses.newwin(self.height, self.width, 3, 0)
         help_win.box()
 
@@ -344,18 +1522,30 @@ class ImageSorter:
         help_win.addstr(8, 4, "[ENTER]  - Open image")
         help_win.addstr(9, 4, "[q]      - Exit")
         help_win.addstr(10, 4, "[F1/h]   - Open help menu")
-
-        help_win.addstr(12, 2, "Keys - Move File:")
-        help_win.addstr(13, 4, "[1-9, 0]        - Move to directories 1-10")
-        help_win.addstr(14, 4, "[ALT + 1-9, 0]  - Move to directories 11-20")
-        help_win.addstr(15, 4, "[` + 1-9, 0]    - Move to directories 21-30")
+        help_win.addstr(11, 4, "[F5/R]   - Rescan input directory")
+        help_win.addstr(12, 4, "[u/U]    - Undo / redo the last operation")
+        help_win.addstr(13, 4, "[p]      - Show / hide frame timings")
+        help_win.addstr(14, 4, "[g]      - Show / hide the thumbnail grid, arrows move between tiles")
+
+        help_win.addstr(16, 2, "Keys - Move File:")
+        help_win.addstr(17, 4, "[1-9, 0]        - Move to directories 1-10")
+        help_win.addstr(18, 4, "[ALT + 1-9, 0]  - Move to directories 11-20")
+        help_win.addstr(19, 4, "[` + 1-9, 0]    - Move to directories 21-30")
+        help_win.addstr(20, 4, "[c + 1-9, 0, d] - Move / delete a duplicate cluster")
+
+        help_win.addstr(22, 2, "Keys - Select Files (digits and d act on all of them):")
+        help_win.addstr(23, 4, "[m]      - Mark / unmark image")
+        help_win.addstr(24, 4, "[v]      - Start / mark a visual range")
+        help_win.addstr(25, 4, "[/]      - Mark by name pattern")
+        help_win.addstr(26, 4, "[c + m]  - Mark a duplicate cluster")
+        help_win.addstr(27, 4, "[M]      - Clear marks")
 
         title_win.refresh()
         help_win.refresh()
 
         while True:
-            key = help_win.getch()
-            if key in (27, curses.KEY_F1, ord('h'), ord('q')):
+            key = self.input.get_key(wait=True)
+            if key in (-1, 27, curses.KEY_F1, ord('h'), ord('q')):
                 help_win.clear()
                 title_win.clear()
                 help_win.refresh()
@@ -382,28 +1572,220 @@ class ImageSorter:
             self.ui.get_color("text", "reverse")
         )
 
-        key = prompt_win.getch()
-        if key in (27, curses.KEY_F2):
+        prompt_win.refresh()
+        key = self.input.get_key(wait=True)
+        if key in (-1, 27, curses.KEY_F2):
             prompt_win.clear()
             prompt_win.refresh()
             del prompt_win
             return name
 
-        prompt_win.clear()
-        prompt_win.addstr(chr(key))
-
-        textbox = curses.textpad.Textbox(prompt_win, insert_mode=True)
-        textbox.edit()
-
-        new_name = textbox.gather().strip()
+        new_name = self.edit_line(prompt_win, key)
         if not new_name:
             new_name = name_without_suffix
 
         return f"{new_name}{suffix}"
 
+    def get_pattern(self) -> str:
+        """Prompts for a file name pattern in the status line"""
+        label: str = "Mark files matching: "
+        label_win = curses.newwin(1, len(label) + 1, self.height - 1, 0)
+        label_win.addstr(0, 0, label, self.ui.get_color("text_highlight"))
+        label_win.refresh()
+        prompt_win = curses.newwin(1, max(2, self.width - len(label) - 1), self.height - 1, len(label))
+        prompt_win.clear()
+        prompt_win.refresh()
+
+        key = self.input.get_key(wait=True)
+        if key in (-1, 27):
+            return ""
+        return self.edit_line(prompt_win, key)
+
+    def edit_line(self, window, key: int) -> str:
+        """Edits a line starting with `key` until ENTER, or the end of a replay"""
+        window.clear()
+        window.addstr(chr(key))
+
+        textbox = curses.textpad.Textbox(window, insert_mode=True)
+        window.refresh()
+        key = self.input.get_key(wait=True)
+        while key != -1 and textbox.do_command(key):
+            window.refresh()
+            key = self.input.get_key(wait=True)
+        return textbox.gather().strip()
+
+
+def scan_depth(args: Namespace) -> int:
+    """Returns how many subdirectory levels are listed"""
+    return args.depth if args.tree else 0
+
+
+def grid_size(args: Namespace) -> tuple[int, int]:
+    """Returns the columns and rows of the thumbnail grid"""
+    columns, rows = (args.grid or DEFAULT_GRID).split("x")
+    return int(columns), int(rows)
+
+
+def preview_geometry(col2_x: int) -> tuple[int, int, int, int]:
+    """Returns the left, top, width and height of the preview box in cells"""
+    term_width, term_height = shutil.get_terminal_size()
+    img_width: int = max(10, term_width - 2 * col2_x - 5)
+    img_height: int = max(10, term_height - 4)
+    img_pos_left: int = col2_x + 1  # col2_x + border width
+    img_pos_top: int = 1  # border width
+    return img_pos_left, img_pos_top, img_width, img_height
+
+
+def preview_box(img_width: int, img_height: int, cell_size: tuple[int, int]) -> tuple[int, int]:
+    """Converts the preview box from cells to pixels, guessing the cell size if it is unknown"""
+    cell_width, cell_height = cell_size
+    return (img_width * (cell_width or 10), img_height * (cell_height or 20))
+
+
+def mirror_mode(elements: dict) -> str:
+    mirror = "none"
+    mirror_horizontal = elements.get("mirror", False)
+    mirror_vertical = elements.get("mirror_vertical", False)
+
+    if mirror_horizontal and mirror_vertical:
+        mirror = "both"
+    elif mirror_horizontal:
+        mirror = "horizontal"
+    elif mirror_vertical:
+        mirror = "vertical"
+    return mirror
+
+
+def open_thumbnail_store(args: Namespace) -> ThumbnailStore | None:
+    if args.thumbnail_cache_size <= 0:
+        return None
+    return ThumbnailStore(max_bytes=args.thumbnail_cache_size * 1024 * 1024)
+
+
+def warm_thumbnail_cache(args: Namespace) -> None:
+    """Pre-generates thumbnails of the input directory for the current terminal size"""
+    store: ThumbnailStore | None = open_thumbnail_store(args)
+    if store is None or not pillow_available():
+        print("Warming the thumbnail cache needs Pillow and a non-zero --thumbnail-cache-size")
+        return
+
+    term_width, _ = shutil.get_terminal_size()
+    _, _, img_width, img_height = preview_geometry(term_width // 4)
+    box: tuple[int, int] = preview_box(img_width, img_height, KittyRenderer().cell_size())
+    mirror: str = mirror_mode(ColorScheme(args.theme).get_elements())
+
+    index = FileIndex(args.input_dir, scan_depth(args), args.scan_workers)
+    index.scan()
+    paths: list[Path] = [
+        index.path(i) for i in range(len(index))
+        if mirror != "none" or index.path(i).suffix.lower() != ".png"
+    ]
+
+    generated, total = warm_cache(store, paths, box, mirror)
+    print(f"Generated {generated} of {total} thumbnails in {store.directory}")
+
+
+def print_history(args: Namespace) -> None:
+    """Prints the sorting decisions recorded in the catalog, e.g. what went to target 3 today"""
+    if not CATALOG_DB.exists():
+        print(f"No catalog found at {CATALOG_DB}, start a session with --catalog to create it")
+        return
+    catalog: Catalog | None = Catalog.open()
+    if catalog is None:
+        print(f"Could not open the catalog at {CATALOG_DB}")
+        return
+
+    since: float = (
+        parse_date(args.history_since) if args.history_since
+        else datetime.combine(date.today(), datetime.min.time()).timestamp()
+    )
+    target: str | None = None
+    if args.history != "all":
+        target = args.output_dirs[int(args.history) - 1] if args.history.isdigit() else args.history
+        target = str(Path(target).resolve())
+
+    try:
+        for timestamp, action, source, destination, status in catalog.decisions(since, target):
+            line: str = f"{datetime.fromtimestamp(timestamp):%Y-%m-%d %H:%M:%S}  {action:<6}  {source}"
+            if destination is not None:
+                line += f" -> {destination}"
+            print(line if status == "done" else f"{line}  ({status})")
+    finally:
+        catalog.close()
+
+
+def directory_state(directories: list[str]) -> tuple[list[int], str]:
+    """Returns the number of files in each directory and a fingerprint of all their names"""
+    digest = hashlib.blake2b(digest_size=8)
+    counts: list[int] = []
+    for i, directory in enumerate(directories):
+        names: list[str] = sorted(
+            os.path.relpath(os.path.join(root, name), directory)
+            for root, _, files in os.walk(directory) for name in files
+        )
+        counts.append(len(names))
+        for name in names:
+            digest.update(f"{i}/{name}\n".encode())
+    return counts, digest.hexdigest()
+
+
+def replay_keys(args: Namespace) -> int:
+    """Replays a key stream against a virtual screen and reports the latency of every key
+
+    Returns the exit status, 1 if the file list and the input directory
+    disagree afterwards or an operation failed.
+    """
+    keys: list[int] = read_keys(args.replay)
+    width, height = shutil.get_terminal_size()
+
+    with (
+        open(os.devnull, "w") as devnull,
+        contextlib.redirect_stdout(devnull),
+        virtual_curses(height, width) as stdscr,
+        tempfile.TemporaryDirectory(prefix="image_sorter-replay-") as journal_dir,
+    ):
+        # a journal of its own, so a replayed undo never reverses an operation of a real session
+        app: ImageSorter = ImageSorter(
+            stdscr, args, keys=ReplayInput(keys), journal_path=Path(journal_dir, "journal.jsonl")
+        )
+        try:
+            start: float = time.perf_counter()
+            latencies: list[tuple[int, float]] = app.replay()
+            elapsed: float = time.perf_counter() - start
+        finally:
+            app.close()
+        problems: list[str] = app.verify_files()
+
+    histograms: dict[str, Histogram] = {"all": Histogram()}
+    for key, seconds in latencies:
+        nanoseconds: int = int(seconds * 1e9)
+        histograms["all"].add(nanoseconds)
+        histograms.setdefault(KEY_SPANS.get(key, "key.other"), Histogram()).add(nanoseconds)
+
+    print(f"Replayed {len(latencies)} of {len(keys)} keys in {elapsed:.2f}s ({len(latencies) / max(elapsed, 1e-9):.0f} keys/s)")
+    print(f"{'key':<14}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, histogram in histograms.items():
+        summary: dict[str, float] = histogram.summary()
+        print(
+            f"{name:<14}{summary['count']:>8}{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}"
+            f"{summary['p99_ms']:>10.3f}{summary['max_ms']:>10.3f}"
+        )
+
+    counts, fingerprint = directory_state([args.input_dir, *args.output_dirs])
+    print(f"Files left in the input directory: {counts[0]}")
+    for i, count in enumerate(counts[1:], start=1):
+        print(f"Files in target {i}: {count}")
+    print(f"State fingerprint: {fingerprint}")
+
+    for problem in problems:
+        print(f"MISMATCH {problem}")
+    if not problems:
+        print("The file list matches the input directory")
+    return 1 if problems else 0
+
 
-def main(stdscr, args):
-    app: ImageSorter = ImageSorter(stdscr, args)
+def main(stdscr, args, files: list[Path] | None = None):
+    app: ImageSorter = ImageSorter(stdscr, args, files)
     app.run()
 
 
@@ -415,5 +1797,15 @@ if __name__ == "__main__":
 
     if args.help:
         parser.print_help()
+    elif args.history is not None:
+        print_history(args)
+    elif args.replay is not None:
+        sys.exit(replay_keys(args))
+    elif args.batch is not None:
+        leftovers: list[Path] = run_batch(args)
+        if leftovers and not args.dry_run and sys.stdin.isatty():
+            curses.wrapper(main, args, leftovers)
     else:
+        if args.warm_cache:
+            warm_thumbnail_cache(args)
         curses.wrapper(main, args)
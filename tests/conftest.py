@@ -0,0 +1,8 @@
+from pathlib import Path
+
+
+def write(path: Path, data: bytes = b"x") -> Path:
+    """Writes a file, creating its parent directories"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
@@ -0,0 +1,134 @@
+import json
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+from conftest import write
+from image_sorter.ext import batch, metadata
+from image_sorter.ext.batch import BatchSorter
+from image_sorter.ext.images import PNG_SIGNATURE
+from image_sorter.ext.loggers import Logger
+from image_sorter.ext.rules import load_rules, match_rules
+from image_sorter.keybinding_actions import Journal
+
+
+@pytest.fixture
+def sorter_args(tmp_path, monkeypatch):
+    """Arguments of a --batch run over tmp_path/in, with the journal and progress files in tmp_path"""
+    monkeypatch.setattr(batch, "BATCH_DIR", tmp_path / "batch")
+    monkeypatch.setattr(Journal, "open", classmethod(lambda cls: cls(tmp_path / "journal.jsonl")))
+    monkeypatch.setattr(metadata.MetadataCache, "open", classmethod(lambda cls: None))
+    (tmp_path / "in").mkdir()
+    rules_file: Path = tmp_path / "rules.json"
+    rules_file.write_text(json.dumps({"rules": [{"match": ["ext == jpg"], "target": 1}]}))
+    return Namespace(
+        input_dir=str(tmp_path / "in"),
+        output_dirs=[str(tmp_path / "o1")],
+        batch=str(rules_file),
+        dry_run=False,
+        catalog=False,
+        tree=True,
+        depth=1,
+        scan_workers=1,
+        batch_workers=2,
+        link=False,
+        copy_mode=False,
+        auto_rename=0,
+        on_duplicate="copy",
+        log_level="off",
+    )
+
+
+def run(args: Namespace, tmp_path: Path) -> tuple[BatchSorter, list[Path]]:
+    sorter = BatchSorter(args, load_rules(args.batch, args.output_dirs), Logger(log_dir=tmp_path, level="off"))
+    return sorter, sorter.run()
+
+
+def test_rules_match_in_order(tmp_path):
+    rules_file: Path = tmp_path / "rules.json"
+    rules_file.write_text(json.dumps([
+        {"match": ["name ~ IMG_*", "ext == png"], "target": 2},
+        {"match": "ext == png", "target": "~/photos"},
+        {"target": 1},
+    ]))
+    rules = load_rules(str(rules_file), ["/o1", "/o2"])
+
+    assert match_rules(rules, Path("IMG_1.PNG"), None).target == "/o2"
+    assert match_rules(rules, Path("scan.png"), None).target == str(Path("~/photos").expanduser())
+    assert match_rules(rules, Path("IMG_1.jpg"), None).target == "/o1"
+
+
+@pytest.mark.parametrize("rules", [
+    [],
+    [{"match": ["ext == png"]}],
+    [{"match": ["ext == png"], "target": 3}],
+    [{"match": ["size ~ 2M"], "target": 1}],
+])
+def test_invalid_rules_are_rejected(tmp_path, rules):
+    rules_file: Path = tmp_path / "rules.json"
+    rules_file.write_text(json.dumps({"rules": rules}))
+    with pytest.raises(ValueError):
+        load_rules(str(rules_file), ["/o1"])
+
+
+def test_same_name_from_two_directories_is_not_overwritten(sorter_args, tmp_path):
+    first: Path = write(tmp_path / "in/a/IMG1.jpg", b"first")
+    second: Path = write(tmp_path / "in/b/IMG1.jpg", b"second")
+
+    sorter, leftovers = run(sorter_args, tmp_path)
+
+    moved: Path = tmp_path / "o1/IMG1.jpg"
+    assert moved.read_bytes() in (b"first", b"second")
+    assert sorter.stats.files == 1
+    assert sorter.stats.failed == 1
+    left, = leftovers
+    assert left in (first, second) and left.exists()
+    assert left.read_bytes() != moved.read_bytes()
+
+
+def test_auto_rename_keeps_both_files(sorter_args, tmp_path):
+    write(tmp_path / "in/a/IMG1.jpg", b"first")
+    write(tmp_path / "in/b/IMG1.jpg", b"second")
+    sorter_args.auto_rename = 10
+
+    sorter, leftovers = run(sorter_args, tmp_path)
+
+    assert leftovers == []
+    assert sorted(p.read_bytes() for p in (tmp_path / "o1").iterdir()) == [b"first", b"second"]
+
+
+def png(width: int, height: int) -> bytes:
+    return PNG_SIGNATURE + b"\0\0\0\rIHDR" + width.to_bytes(4, "big") + height.to_bytes(4, "big")
+
+
+def use_rules(args: Namespace, rules: list[dict]) -> None:
+    Path(args.batch).write_text(json.dumps(rules))
+
+
+def test_every_metadata_batch_is_evaluated(sorter_args, tmp_path, monkeypatch):
+    monkeypatch.setattr(metadata.MetadataLoader, "BATCH_SIZE", 4)
+    for i in range(100):
+        write(tmp_path / f"in/{i}.png", png(2, 2))
+    use_rules(sorter_args, [{"match": ["width >= 1"], "target": 1}])
+
+    sorter, leftovers = run(sorter_args, tmp_path)
+
+    assert leftovers == []
+    assert sorter.stats.files == 100
+    assert not any((tmp_path / "in").iterdir())
+    assert not sorter.progress.path.exists()
+
+
+def test_files_without_metadata_are_left_for_review(sorter_args, tmp_path, monkeypatch):
+    unread: Path = write(tmp_path / "in/unread.png", png(2, 2))
+    write(tmp_path / "in/read.png", png(2, 2))
+    read_metadata = metadata.read_metadata
+    monkeypatch.setattr(metadata, "read_metadata", lambda p, cache=None: None if p == unread else read_metadata(p, cache))
+    use_rules(sorter_args, [{"match": ["width >= 1"], "target": 1}])
+
+    sorter, leftovers = run(sorter_args, tmp_path)
+
+    assert leftovers == [unread]
+    assert sorter.stats.files == 1
+    assert sorter.progress.path.exists()  # the next run picks the unread file up again
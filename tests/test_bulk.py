@@ -0,0 +1,106 @@
+import os
+from pathlib import Path
+
+from conftest import write
+from image_sorter.keybinding_actions.bulk import delete_files, move_files, summarize
+from image_sorter.keybinding_actions.move import NumberAllocator
+from image_sorter.keybinding_actions.rename import rename_file
+
+
+def test_allocator_claims_the_lowest_free_numbers(tmp_path):
+    write(tmp_path / "1.png", b"x")
+    write(tmp_path / "3.png", b"x")
+    allocator = NumberAllocator(tmp_path)
+
+    claimed: list[Path] = allocator.allocate_many(3)
+
+    assert [p.name for p in claimed] == ["2.png", "4.png", "5.png"]
+    assert all(p.stat().st_size == 0 for p in claimed)  # placeholders keep other sessions off the names
+
+
+def test_allocator_skips_a_name_claimed_by_another_session(tmp_path):
+    allocator = NumberAllocator(tmp_path)
+    assert allocator.peek() == "1.jpg"
+    mtime_ns: int | None = allocator.mtime_ns
+
+    # another session claims 1.jpg without changing the directory mtime this allocator saw
+    os.close(os.open(tmp_path / "1.jpg", os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+
+    assert allocator.allocate() == tmp_path / "2.jpg"
+
+
+def test_allocator_release_gives_the_number_back(tmp_path):
+    allocator = NumberAllocator(tmp_path)
+    first, second = allocator.allocate_many(2)
+
+    allocator.release(first)
+
+    assert not first.exists()
+    assert second.exists()
+    assert allocator.allocate() == first
+
+
+def test_move_files_does_not_overwrite_a_file_of_the_same_name(tmp_path):
+    first: Path = write(tmp_path / "in/a/IMG1.jpg", b"first")
+    second: Path = write(tmp_path / "in/b/IMG1.jpg", b"second")
+
+    message, level = move_files([first, second], str(tmp_path / "out"), 0, False)
+
+    assert level == "error"
+    assert "1 of 2 files moved" in message
+    assert "twice" in message  # decided before the transfers race on the name
+    assert (tmp_path / "out/IMG1.jpg").read_bytes() == b"first"
+    assert not first.exists()
+    assert second.read_bytes() == b"second"
+
+
+def test_move_files_numbers_every_file_with_auto_rename(tmp_path):
+    files: list[Path] = [write(tmp_path / f"in/{n}/IMG1.jpg", n.encode()) for n in "abc"]
+    write(tmp_path / "out/1.jpg", b"old")
+
+    message, level = move_files(files, str(tmp_path / "out"), 1, False)
+
+    assert (message, level) == (f"3 files moved to {tmp_path / 'out'}", "success")
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["1.jpg", "2.jpg", "3.jpg", "4.jpg"]
+    assert sorted(p.read_bytes() for p in (tmp_path / "out").iterdir()) == [b"a", b"b", b"c", b"old"]
+
+
+
+def test_move_files_lists_the_files_that_failed(tmp_path):
+    first: Path = write(tmp_path / "in/a/IMG1.jpg", b"first")
+    second: Path = write(tmp_path / "in/b/IMG1.jpg", b"second")
+    failed: list[Path] = []
+
+    move_files([first, second], str(tmp_path / "out"), 0, True, failed=failed)
+
+    assert first.exists()  # copied, so the source is left even though it succeeded
+    assert failed == [second]
+
+def test_delete_files_reports_the_files_that_failed(tmp_path):
+    kept: Path = write(tmp_path / "a.jpg", b"a")
+
+    failed: list[Path] = []
+
+    message, level = delete_files([kept, tmp_path / "missing.jpg"], safe=False, failed=failed)
+
+    assert level == "error"
+    assert message.startswith("1 of 2 files permanently deleted, 1 failed")
+    assert not kept.exists()
+    assert failed == [tmp_path / "missing.jpg"]
+
+
+def test_summarize_without_errors():
+    assert summarize([("ok", "success")] * 2, "copied to /o") == ("2 files copied to /o", "success")
+
+
+def test_rename_does_not_overwrite_a_file_of_the_same_name(tmp_path):
+    source: Path = write(tmp_path / "a.jpg", b"a")
+    existing: Path = write(tmp_path / "b.jpg", b"b")
+    changes: list = []
+
+    message, level = rename_file(source, "b.jpg", journal=lambda *change: changes.append(change))
+
+    assert level == "error"
+    assert source.read_bytes() == b"a" and existing.read_bytes() == b"b"
+    assert changes == []
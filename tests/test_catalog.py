@@ -0,0 +1,108 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from conftest import write
+from image_sorter.ext import catalog
+from image_sorter.ext.catalog import Catalog
+
+
+def settle(*directories: Path) -> None:
+    """Moves the mtime of directories into the past, so their listings are trusted"""
+    past: float = time.time() - 60
+    for directory in directories:
+        os.utime(directory, (past, past))
+
+
+def scan(db_path: Path, directory: Path) -> tuple[list[Path], list[Path]]:
+    """Scans a directory through a fresh catalog, its writes are committed on return"""
+    cat = Catalog(db_path)
+    try:
+        files, subdirs = cat.scanner()(directory)
+    finally:
+        cat.close()
+    return sorted(files), sorted(subdirs)
+
+
+@pytest.fixture
+def no_disk_scan(monkeypatch):
+    def fail(*args):
+        pytest.fail("the directory was listed again")
+    return lambda: monkeypatch.setattr(catalog, "scan_directory", fail)
+
+
+def test_unchanged_directories_are_listed_from_the_catalog(tmp_path, no_disk_scan):
+    root: Path = tmp_path / "in"
+    a: Path = write(root / "a.jpg")
+    write(root / "notes.txt")
+    (root / "sub").mkdir()
+    settle(root)
+    db: Path = tmp_path / "catalog.sqlite3"
+
+    first = scan(db, root)
+    no_disk_scan()
+
+    assert first == ([a], [root / "sub"])
+    assert scan(db, root) == first
+
+
+def test_a_changed_directory_is_reconciled(tmp_path):
+    root: Path = tmp_path / "in"
+    a: Path = write(root / "a.jpg")
+    b: Path = write(root / "b.jpg")
+    (root / "old").mkdir()
+    settle(root)
+    db: Path = tmp_path / "catalog.sqlite3"
+    scan(db, root)
+
+    b.unlink()
+    c: Path = write(root / "c.jpg")
+    (root / "old").rmdir()
+    (root / "new").mkdir()
+    settle(root)
+
+    assert scan(db, root) == ([a, c], [root / "new"])
+    cat = Catalog(db)
+    try:
+        assert sorted(cat.cached_listing(root, root.stat().st_mtime_ns)[0]) == [a, c]
+    finally:
+        cat.close()
+
+
+def test_recently_modified_directories_are_not_trusted(tmp_path):
+    root: Path = tmp_path / "in"
+    write(root / "a.jpg")  # written just now, a file added in the same second would not change the mtime
+    db: Path = tmp_path / "catalog.sqlite3"
+    scan(db, root)
+
+    cat = Catalog(db)
+    try:
+        assert cat.cached_listing(root, root.stat().st_mtime_ns) is None
+    finally:
+        cat.close()
+
+
+def test_decisions_are_queried_by_time_and_target(tmp_path):
+    cat = Catalog(tmp_path / "catalog.sqlite3")
+    start: float = time.time()
+    cat.record_decision("move", Path("/in/a.jpg"), "/out/1", "done")
+    cat.record_decision("move", Path("/in/b.jpg"), "/out/2", "failed", "exists")
+    cat.close()
+
+    cat = Catalog(tmp_path / "catalog.sqlite3")
+    try:
+        assert [row[1:] for row in cat.decisions(start)] == [
+            ("move", "/in/a.jpg", "/out/1", "done"),
+            ("move", "/in/b.jpg", "/out/2", "failed"),
+        ]
+        assert [row[2] for row in cat.decisions(start, target="/out/2")] == ["/in/b.jpg"]
+        assert cat.decisions(time.time() + 60) == []
+    finally:
+        cat.close()
+
+
+def test_an_unusable_catalog_is_not_opened(tmp_path):
+    (tmp_path / "catalog.sqlite3").write_bytes(b"not a database" * 100)
+    assert Catalog.open(tmp_path / "catalog.sqlite3") is None
@@ -0,0 +1,103 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from image_sorter.ext import duplicates
+from image_sorter.ext.duplicates import BKTree, HashCache, find_clusters, find_duplicates, hamming
+
+
+def test_bk_tree_finds_the_same_hashes_as_a_linear_scan():
+    rng = random.Random(7)
+    values: list[int] = [rng.getrandbits(64) for _ in range(300)]
+    values += [v ^ (1 << rng.randrange(64)) for v in values[:50]]  # near duplicates one bit away
+    tree = BKTree()
+    for n, value in enumerate(values):
+        tree.add(value, n)
+
+    for query in values[:60]:
+        for radius in (0, 1, 6):
+            expected: list[int] = [n for n, value in enumerate(values) if hamming(query, value) <= radius]
+            assert sorted(tree.search(query, radius)) == expected
+
+
+def test_bk_tree_keeps_every_item_of_an_equal_hash():
+    tree = BKTree()
+    tree.add(0b1010, "a")
+    tree.add(0b1010, "b")
+    assert sorted(tree.search(0b1010, 0)) == ["a", "b"]
+    assert BKTree().search(0, 64) == []
+
+
+def test_clusters_join_chains_of_close_hashes():
+    hashes: dict[Path, int] = {
+        Path("a"): 0b0000,
+        Path("b"): 0b0001,  # one bit from a
+        Path("c"): 0b0011,  # one bit from b, two from a
+        Path("far"): (1 << 64) - 1,
+        Path("alone"): 0b1111 << 20,
+    }
+
+    assert find_clusters(hashes, 1) == [[Path("a"), Path("b"), Path("c")]]
+    assert find_clusters(hashes, 0) == []
+
+
+def test_hash_cache_is_invalidated_by_a_changed_file(tmp_path):
+    image: Path = tmp_path / "a.jpg"
+    image.write_bytes(b"jpeg")
+    cache = HashCache(tmp_path / "hashes")
+    try:
+        cache.put(image, "phash", image.stat(), 0xDEADBEEF)
+        assert cache.get(image, "phash", image.stat()) == 0xDEADBEEF
+        assert cache.get(image, "dhash", image.stat()) is None
+
+        image.write_bytes(b"changed jpeg")
+        assert cache.get(image, "phash", image.stat()) is None
+    finally:
+        cache.close()
+
+
+def test_exact_method_needs_no_image_decoding(tmp_path, monkeypatch):
+    monkeypatch.setattr(duplicates, "compute_hashes", lambda *args: pytest.fail("images were decoded"))
+    paths: list[Path] = []
+    for name, data in (("a.jpg", b"same"), ("b.jpg", b"same"), ("c.jpg", b"other")):
+        (tmp_path / name).write_bytes(data)
+        paths.append(tmp_path / name)
+
+    assert find_duplicates(paths, method="exact") == [[tmp_path / "a.jpg", tmp_path / "b.jpg"]]
+
+
+@pytest.mark.skipif(not duplicates.duplicates_available(), reason="needs NumPy and Pillow")
+def test_perceptual_hashes_of_a_resized_image_are_close(tmp_path):
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize((256, 256))
+    gradient.save(tmp_path / "big.png")
+    gradient.resize((64, 64)).save(tmp_path / "small.png")
+
+    for method in duplicates.HASH_METHODS:
+        big, small = (duplicates.image_hash(tmp_path / name, method) for name in ("big.png", "small.png"))
+        assert hamming(big, small) <= 6
+
+
+def test_hash_workers_are_not_forked_from_the_threaded_interface(tmp_path, monkeypatch):
+    start_methods: list[str] = []
+
+    class Pool:
+        def __init__(self, max_workers=None, mp_context=None):
+            start_methods.append(mp_context.get_start_method())
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def map(self, function, *iterables, chunksize=1):
+            return [None for _ in zip(*iterables)]
+
+    monkeypatch.setattr(duplicates, "ProcessPoolExecutor", Pool)
+    (tmp_path / "a.jpg").write_bytes(b"jpeg")
+
+    assert duplicates.compute_hashes([tmp_path / "a.jpg"]) == {}
+    assert start_methods and start_methods[0] in ("forkserver", "spawn")
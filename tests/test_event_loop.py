@@ -0,0 +1,23 @@
+import os
+import signal
+
+from image_sorter.gui.event_loop import EventLoop
+
+
+def test_signal_arriving_while_the_loop_lock_is_held_runs_its_handler_later():
+    loop = EventLoop()
+    calls: list[str] = []
+    loop.add_signal_handler(signal.SIGUSR1, lambda: calls.append("resize"))
+    try:
+        with loop._lock:  # like a signal interrupting call_soon_threadsafe
+            os.kill(os.getpid(), signal.SIGUSR1)
+            os.kill(os.getpid(), signal.SIGUSR1)
+        assert calls == []
+
+        loop.run_once()
+
+        assert calls == ["resize"]
+    finally:
+        loop.close()
+
+    assert signal.getsignal(signal.SIGUSR1) == signal.SIG_DFL
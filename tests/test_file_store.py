@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import pytest
+
+from image_sorter.ext import file_store
+from image_sorter.ext.file_store import FileStore
+
+
+def make_store(*paths: str) -> FileStore:
+    store = FileStore()
+    store.extend(Path(p) for p in paths)
+    return store
+
+
+def paths(store: FileStore) -> list[Path]:
+    return [store.path(pos) for pos in range(len(store))]
+
+
+def test_insert_keeps_order_and_skips_stored_paths():
+    store = make_store("/in/a.jpg", "/in/c.jpg")
+    assert store.insert(1, Path("/in/b.jpg"))
+    assert not store.insert(0, Path("/in/c.jpg"))
+    assert paths(store) == [Path("/in/a.jpg"), Path("/in/b.jpg"), Path("/in/c.jpg")]
+    assert store.position(Path("/in/c.jpg")) == 2
+    assert store.positions_of(FileStore.key(Path("/in/c.jpg"))) == [2]
+    assert store.positions_of(FileStore.key(Path("/in/missing.jpg"))) == []
+
+
+def test_replace_and_remove_update_positions_and_membership():
+    store = make_store("/in/a.jpg", "/in/b.jpg", "/in/c.jpg")
+    assert store.replace(1, Path("/in/sub/renamed.jpg"))
+    assert Path("/in/b.jpg") not in store
+    assert store.position(Path("/in/sub/renamed.jpg")) == 1
+
+    assert store.remove(0) == Path("/in/a.jpg")
+    assert paths(store) == [Path("/in/sub/renamed.jpg"), Path("/in/c.jpg")]
+    assert store.key_at(1) == FileStore.key(Path("/in/c.jpg"))
+
+
+def test_replace_refuses_a_path_stored_at_another_position():
+    store = make_store("/in/a.jpg", "/in/b.jpg")
+    assert not store.replace(1, Path("/in/a.jpg"))
+    assert paths(store) == [Path("/in/a.jpg"), Path("/in/b.jpg")]
+    assert store.replace(1, Path("/in/b.jpg"))
+
+
+def test_removing_most_entries_compacts_without_losing_any():
+    store = make_store(*(f"/in/{n}.jpg" for n in range(10)))
+    for _ in range(7):
+        store.remove(0)
+    assert paths(store) == [Path(f"/in/{n}.jpg") for n in (7, 8, 9)]
+    assert all(store.position(p) == pos for pos, p in enumerate(paths(store)))
+
+
+def test_filter_and_sort_rebuild_membership():
+    store = make_store("/in/b.jpg", "/in/a.jpg", "/in/c.jpg")
+    assert store.filter(lambda pos: store.name(pos) != "c.jpg")
+    assert Path("/in/c.jpg") not in store
+    assert store.sort(key=store.name)
+    assert paths(store) == [Path("/in/a.jpg"), Path("/in/b.jpg")]
+
+
+def test_relative_paths_round_trip():
+    store = make_store("f1.jpg", "sub/f2.jpg", "./f3.jpg", "/f4.jpg")
+    store.insert(0, Path("f0.jpg"))
+    store.replace(1, Path("renamed.jpg"))
+    assert paths(store) == [Path("f0.jpg"), Path("renamed.jpg"), Path("sub/f2.jpg"), Path("f3.jpg"), Path("/f4.jpg")]
+    assert store.position(Path("f3.jpg")) == 3
+    assert store.directory(0) == ""
+
+
+@pytest.fixture
+def colliding(monkeypatch):
+    """Every path gets the same key"""
+    monkeypatch.setattr(file_store, "hash", lambda encoded: 7, raising=False)
+
+
+def test_paths_with_the_same_key_are_all_kept(colliding):
+    store = make_store("/in/a.jpg", "/in/b.jpg", "/in/c.jpg")
+    assert store.insert(0, Path("/in/first.jpg"))
+    assert not store.insert(0, Path("/in/b.jpg"))
+    assert Path("/in/missing.jpg") not in store
+    assert [store.position(p) for p in paths(store)] == [0, 1, 2, 3]
+
+    store.remove(1)  # the path the key maps to, another one takes it over
+    assert store.replace(0, Path("/in/renamed.jpg"))
+    assert paths(store) == [Path("/in/renamed.jpg"), Path("/in/b.jpg"), Path("/in/c.jpg")]
+    assert [store.position(p) for p in paths(store)] == [0, 1, 2]
+    assert Path("/in/a.jpg") not in store and Path("/in/first.jpg") not in store
+
+    store.sort(key=store.name, reverse=True)
+    assert [store.position(p) for p in paths(store)] == [0, 1, 2]
+    assert sorted(store.positions_of(7)) == [0, 1, 2]
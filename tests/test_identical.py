@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+
+from conftest import write
+from image_sorter.ext import identical
+from image_sorter.ext.identical import find_identical, group_identical
+
+
+def test_files_are_grouped_by_content(tmp_path):
+    a: Path = write(tmp_path / "a.jpg", b"same")
+    b: Path = write(tmp_path / "sub/b.jpg", b"same")
+    write(tmp_path / "c.jpg", b"diff")  # same size, other content
+    write(tmp_path / "d.jpg", b"longer")
+    e: Path = write(tmp_path / "e.jpg", b"longer!")
+    f: Path = write(tmp_path / "f.jpg", b"longer!")
+
+    assert group_identical(tmp_path.rglob("*.jpg")) == [[a, b], [e, f]]
+
+
+def test_empty_missing_and_hard_linked_files_are_not_duplicates(tmp_path):
+    write(tmp_path / "empty1.jpg", b"")
+    write(tmp_path / "empty2.jpg", b"")
+    original: Path = write(tmp_path / "original.jpg", b"data")
+    os.link(original, tmp_path / "link.jpg")
+
+    paths: list[Path] = [*tmp_path.iterdir(), tmp_path / "missing.jpg"]
+
+    assert group_identical(paths) == []
+
+
+def test_large_files_differing_only_in_the_middle_are_told_apart(tmp_path, monkeypatch):
+    monkeypatch.setattr(identical, "BLOCK_SIZE", 4)
+    monkeypatch.setattr(identical, "CHUNK_SIZE", 3)
+    a: Path = write(tmp_path / "a.bin", b"head" + b"x" * 10 + b"tail")
+    b: Path = write(tmp_path / "b.bin", b"head" + b"y" * 10 + b"tail")
+    c: Path = write(tmp_path / "c.bin", b"head" + b"x" * 10 + b"tail")
+
+    assert group_identical([a, b, c]) == [[a, c]]
+
+
+def test_find_identical_looks_for_a_copy_in_a_directory(tmp_path):
+    source: Path = write(tmp_path / "in/a.jpg", b"photo")
+    copy: Path = write(tmp_path / "out/renamed.jpg", b"photo")
+    write(tmp_path / "out/other.jpg", b"other")
+
+    assert find_identical(source, tmp_path / "out") == copy
+    assert find_identical(write(tmp_path / "in/new.jpg", b"new!!"), tmp_path / "out") is None
+    assert find_identical(source, tmp_path / "missing") is None
@@ -0,0 +1,175 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from conftest import write
+from image_sorter.keybinding_actions import Journal, delete_file, move_files
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return Journal(tmp_path / "journal.jsonl")
+
+
+def repair(journal: Journal) -> tuple[str, list[str]]:
+    """Repairs the only entry of a crashed session like the next session does, returns its state and the messages"""
+    journal.close()
+    journal = Journal(journal.path)
+    try:
+        messages: list[str] = journal.repair()
+        entry, = journal.entries.values()
+        return entry.state, messages
+    finally:
+        journal.close()
+
+
+def test_existing_destination_of_the_same_size_survives_a_repair(journal, tmp_path):
+    source: Path = write(tmp_path / "in/a.jpg", b"aaaa")
+    destination: Path = write(tmp_path / "out/a.jpg", b"bbbb")
+    journal.begin("relocate", "move", source, destination)
+
+    state, messages = repair(journal)
+
+    assert state == "failed"
+    assert source.read_bytes() == b"aaaa"
+    assert destination.read_bytes() == b"bbbb"
+
+
+def test_existing_destination_of_another_size_survives_a_repair(journal, tmp_path):
+    source: Path = write(tmp_path / "in/a.jpg", b"aaaa")
+    destination: Path = write(tmp_path / "out/a.jpg", b"bb")
+    journal.begin("copy", "copy", source, destination)
+
+    state, messages = repair(journal)
+
+    assert (state, messages) == ("failed", [f'Interrupted copy of "{source}" was not applied'])
+    assert destination.read_bytes() == b"bb"
+
+
+def test_replaced_destination_is_left_unresolved(journal, tmp_path):
+    source: Path = write(tmp_path / "in/a.jpg", b"aaaa")
+    destination: Path = write(tmp_path / "out/a.jpg", b"old")
+    journal.begin("relocate", "move", source, destination)
+    destination.unlink()
+    write(destination, b"aaaa")  # same content, but not a file this operation created
+
+    state, messages = repair(journal)
+
+    assert state == "failed"
+    assert "unresolved" in messages[0]
+    assert source.read_bytes() == b"aaaa"
+    assert destination.read_bytes() == b"aaaa"
+
+
+def test_finished_copy_across_devices_removes_the_source(journal, tmp_path):
+    source: Path = write(tmp_path / "in/a.jpg", b"aaaa")
+    destination: Path = tmp_path / "out/a.jpg"
+    journal.begin("relocate", "move", source, destination)
+    write(destination, b"aaaa")
+
+    assert repair(journal)[0] == "done"
+    assert not source.exists()
+    assert destination.read_bytes() == b"aaaa"
+
+
+def test_partial_copy_of_the_same_size_is_rolled_back(journal, tmp_path):
+    source: Path = write(tmp_path / "in/a.jpg", b"aaaa")
+    destination: Path = tmp_path / "out/a.jpg"
+    journal.begin("relocate", "move", source, destination)
+    write(destination, b"aa\0\0")
+
+    assert repair(journal)[0] == "failed"
+    assert source.read_bytes() == b"aaaa"
+    assert not destination.exists()
+
+
+def test_finished_rename_is_kept(journal, tmp_path):
+    source: Path = write(tmp_path / "in/a.jpg", b"aaaa")
+    destination: Path = tmp_path / "in/b.jpg"
+    journal.begin("relocate", "rename", source, destination)
+    source.rename(destination)
+
+    assert repair(journal)[0] == "done"
+    assert destination.read_bytes() == b"aaaa"
+
+
+def test_untouched_placeholder_is_removed(journal, tmp_path):
+    source: Path = write(tmp_path / "in/a.jpg", b"aaaa")
+    destination: Path = write(tmp_path / "out/1.jpg", b"")
+    journal.begin("relocate", "move", source, destination, placeholder=True)
+
+    assert repair(journal)[0] == "failed"
+    assert source.read_bytes() == b"aaaa"
+    assert not destination.exists()
+
+
+def test_placeholder_filled_by_the_copy_completes_the_move(journal, tmp_path):
+    source: Path = write(tmp_path / "in/a.jpg", b"aaaa")
+    destination: Path = write(tmp_path / "out/1.jpg", b"")
+    journal.begin("relocate", "move", source, destination, placeholder=True)
+    destination.write_bytes(b"aaaa")
+
+    assert repair(journal)[0] == "done"
+    assert not source.exists()
+
+
+def test_trash_keeps_files_of_the_same_name(journal, tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    first: Path = write(tmp_path / "in/a/IMG1.jpg", b"first")
+    second: Path = write(tmp_path / "in/b/IMG1.jpg", b"second")
+
+    for file_path in (first, second):
+        assert journal.run("delete", delete_file, file_path)[1] == "success"
+
+    trash: Path = tmp_path / ".trash/image_sorter"
+    assert sorted(p.read_bytes() for p in trash.iterdir()) == [b"first", b"second"]
+    destinations: list[Path] = [entry.destination for entry in journal.entries.values()]
+    assert len(set(destinations)) == 2
+    assert all(os.path.exists(destination) for destination in destinations)
+    journal.close()
+
+
+def test_an_operation_is_undone_and_redone_as_a_whole(journal, tmp_path):
+    files: list[Path] = [write(tmp_path / f"in/{name}.jpg", name.encode()) for name in "ab"]
+    group: int = journal.new_group()
+    journal.run("move", move_files, files, str(tmp_path / "out"), 0, False, group=group)
+    later: Path = write(tmp_path / "in/c.jpg", b"c")
+    journal.run("move", move_files, [later], str(tmp_path / "out"), 0, False)
+
+    assert journal.groups() == [group, journal.groups()[-1]]
+    assert journal.undo_group(group) == ("2 files undone", "success")
+    assert all(file_path.exists() for file_path in files)
+    assert not later.exists()  # undone by group, not by the top of the history
+    assert journal.groups(redo=True) == [group]
+
+    assert journal.redo_group(group) == ("2 files redone", "success")
+    assert not any(file_path.exists() for file_path in files)
+    assert journal.undo_group(journal.new_group())[1] == "info"
+    journal.close()
+
+
+def test_failed_undo_stays_in_the_history(journal, tmp_path):
+    source: Path = write(tmp_path / "in/a.jpg", b"a")
+    group: int = journal.new_group()
+    journal.run("move", move_files, [source], str(tmp_path / "out"), 0, False, group=group)
+    write(source, b"new")  # the undo would overwrite it
+
+    assert journal.undo_group(group)[1] == "error"
+    assert source.read_bytes() == b"new"
+    assert journal.groups() == [group]
+    journal.close()
+
+
+def test_files_moved_by_a_partly_failed_bulk_move_can_be_undone(journal, tmp_path):
+    moved: Path = write(tmp_path / "in/a/IMG1.jpg", b"first")
+    refused: Path = write(tmp_path / "in/b/IMG1.jpg", b"second")
+    group: int = journal.new_group()
+
+    assert journal.run("move", move_files, [moved, refused], str(tmp_path / "out"), 0, False, group=group)[1] == "error"
+    assert journal.groups() == [group]
+
+    assert journal.undo_group(group)[1] == "success"
+    assert moved.read_bytes() == b"first"
+    assert refused.read_bytes() == b"second"
+    journal.close()
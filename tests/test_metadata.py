@@ -0,0 +1,178 @@
+import struct
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from image_sorter.ext import metadata
+from image_sorter.ext.images import PNG_SIGNATURE
+from image_sorter.ext.metadata import (
+    DATE_TIME,
+    DATE_TIME_ORIGINAL,
+    EXIF_IFD,
+    IMAGE_LENGTH,
+    IMAGE_WIDTH,
+    MODEL,
+    ORIENTATION,
+    Metadata,
+    MetadataCache,
+    MetadataLoader,
+    parse_exif_date,
+    read_header,
+    read_metadata,
+)
+
+
+ASCII, SHORT, LONG = 2, 3, 4
+TAKEN: bytes = b"2024:05:06 07:08:09\0"
+
+
+def ifd(endian: str, start: int, entries: list[tuple[int, int, int, bytes]]) -> bytes:
+    """An IFD at offset `start`, values longer than 4 bytes follow it"""
+    data_offset: int = start + 2 + 12 * len(entries) + 4
+    table: bytes = struct.pack(endian + "H", len(entries))
+    data: bytes = b""
+    for tag, kind, count, value in entries:
+        if len(value) <= 4:
+            field: bytes = value.ljust(4, b"\0")
+        else:
+            field = struct.pack(endian + "I", data_offset + len(data))
+            data += value
+        table += struct.pack(endian + "HHI", tag, kind, count) + field
+    return table + b"\0\0\0\0" + data
+
+
+def tiff(entries: list[tuple[int, int, int, bytes]], exif: list[tuple[int, int, int, bytes]] = (), endian: str = "<") -> bytes:
+    header: bytes = (b"II*\0" if endian == "<" else b"MM\0*") + struct.pack(endian + "I", 8)
+    if not exif:
+        return header + ifd(endian, 8, entries)
+
+    pointer = lambda offset: (EXIF_IFD, LONG, 1, struct.pack(endian + "I", offset))
+    first: bytes = ifd(endian, 8, [*entries, pointer(0)])
+    return header + ifd(endian, 8, [*entries, pointer(8 + len(first))]) + ifd(endian, 8 + len(first), list(exif))
+
+
+def short(endian: str, value: int) -> bytes:
+    return struct.pack(endian + "H", value)
+
+
+def jpeg(width: int, height: int, exif: bytes | None = None) -> bytes:
+    data: bytes = b"\xff\xd8"
+    data += b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0" + bytes(9)
+    if exif is not None:
+        payload: bytes = b"Exif\0\0" + exif
+        data += b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+    data += b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + bytes(3)
+    return data + b"\xff\xda" + bytes(20) + b"\xff\xd9"
+
+
+def write(tmp_path: Path, name: str, data: bytes) -> Path:
+    path: Path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_png_bmp_and_tiff_sizes(tmp_path):
+    png: bytes = PNG_SIGNATURE + b"\0\0\0\rIHDR" + struct.pack(">II", 640, 480) + bytes(8)
+    bmp: bytes = b"BM" + bytes(16) + struct.pack("<ii", 300, -200) + bytes(8)  # top-down rows
+    big_endian: bytes = tiff([(IMAGE_WIDTH, SHORT, 1, short(">", 12)), (IMAGE_LENGTH, LONG, 1, struct.pack(">I", 34))], endian=">")
+
+    assert read_header(write(tmp_path, "a.png", png)) == (640, 480, None, "")
+    assert read_header(write(tmp_path, "a.bmp", bmp)) == (300, 200, None, "")
+    assert read_header(write(tmp_path, "a.tif", big_endian)) == (12, 34, None, "")
+
+
+def test_jpeg_with_exif(tmp_path):
+    exif: bytes = tiff(
+        [(MODEL, ASCII, 6, b"Pixel\0"), (ORIENTATION, SHORT, 1, short("<", 1)), (DATE_TIME, ASCII, 20, b"2000:01:01 00:00:00\0")],
+        exif=[(DATE_TIME_ORIGINAL, ASCII, 20, TAKEN)],
+    )
+
+    width, height, taken, camera = read_header(write(tmp_path, "a.jpg", jpeg(4000, 3000, exif)))
+
+    assert (width, height, camera) == (4000, 3000, "Pixel")
+    assert taken == datetime(2024, 5, 6, 7, 8, 9).timestamp()  # DateTimeOriginal wins over DateTime
+
+
+def test_jpeg_rotated_by_exif_swaps_the_size(tmp_path):
+    exif: bytes = tiff([(ORIENTATION, SHORT, 1, short("<", 6))])
+    assert read_header(write(tmp_path, "a.jpg", jpeg(4000, 3000, exif)))[:2] == (3000, 4000)
+
+
+def test_jpeg_without_exif(tmp_path):
+    assert read_header(write(tmp_path, "a.jpg", jpeg(10, 20))) == (10, 20, None, "")
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"\xff\xd8",  # truncated after the start of image
+    jpeg(10, 20)[:26],  # truncated inside the frame header
+    b"\xff\xd8\xff\xe1\xff\xff" + b"Exif\0\0II*\0",  # segment longer than the file
+    b"\xff\xd8\x00\x00\x00\x00",  # garbage instead of a marker
+    b"II*\0" + struct.pack("<I", 1 << 30),  # first IFD far beyond the end
+    b"MM\0*\0\0\0\x08\xff\xff",  # IFD claims 65535 entries
+    PNG_SIGNATURE + b"\0\0\0\rIHDR\0\0",  # truncated IHDR
+    b"BM\0\0",
+    b"GIF89a",
+])
+def test_malformed_headers_give_no_size(tmp_path, data):
+    assert read_header(write(tmp_path, "broken", data)) == (0, 0, None, "")
+
+
+def test_ifd_loops_and_bad_values_are_survived(tmp_path):
+    looping: bytes = tiff([(IMAGE_WIDTH, SHORT, 1, short("<", 5)), (EXIF_IFD, LONG, 1, struct.pack("<I", 8))])
+    unknown_type: bytes = tiff([(IMAGE_WIDTH, 12, 1, bytes(4)), (IMAGE_LENGTH, SHORT, 1, short("<", 7))])
+    bad_date: bytes = tiff([(DATE_TIME, ASCII, 20, b"not a date at all!!\0")])
+    value_out_of_file: bytes = tiff([(MODEL, ASCII, 64, struct.pack("<I", 1 << 20))])
+
+    assert read_header(write(tmp_path, "loop.tif", looping)) == (5, 0, None, "")
+    assert read_header(write(tmp_path, "type.tif", unknown_type)) == (0, 7, None, "")
+    assert read_header(write(tmp_path, "date.tif", bad_date)) == (0, 0, None, "")
+    assert read_header(write(tmp_path, "value.tif", value_out_of_file)) == (0, 0, None, "")
+
+
+
+def test_tags_of_the_wrong_type_are_ignored(tmp_path):
+    text_size: bytes = tiff([(IMAGE_WIDTH, ASCII, 3, b"12\0"), (IMAGE_LENGTH, ASCII, 4, b"abc\0")])
+    negative_size: bytes = tiff([(IMAGE_WIDTH, 9, 1, struct.pack("<i", -5)), (IMAGE_LENGTH, SHORT, 1, short("<", 7))])
+    text_orientation: bytes = tiff([(ORIENTATION, ASCII, 2, b"6\0")])
+
+    assert read_header(write(tmp_path, "text.tif", text_size)) == (0, 0, None, "")
+    assert read_header(write(tmp_path, "negative.tif", negative_size)) == (0, 7, None, "")
+    assert read_header(write(tmp_path, "a.jpg", jpeg(4000, 3000, text_orientation)))[:2] == (4000, 3000)
+
+
+def test_a_failing_file_does_not_lose_its_batch(tmp_path, monkeypatch):
+    good: Path = write(tmp_path, "good.jpg", jpeg(10, 20))
+    bad: Path = write(tmp_path, "bad.jpg", jpeg(10, 20))
+    read_header = metadata.read_header
+    monkeypatch.setattr(metadata, "read_header", lambda p: 1 / 0 if p == bad else read_header(p))
+    batches: list[list[tuple[Path, Metadata]]] = []
+
+    MetadataLoader(batches.append, workers=1).load_batch([bad, good])
+
+    assert [[(p, m.width, m.height) for p, m in batch] for batch in batches] == [[(good, 10, 20)]]
+
+def test_exif_dates():
+    assert parse_exif_date(TAKEN) == datetime(2024, 5, 6, 7, 8, 9).timestamp()
+    assert parse_exif_date(b"0000:00:00 00:00:00\0") is None
+    assert parse_exif_date(b"\xff\xfe") is None
+
+
+def test_metadata_cache_round_trip_and_invalidation(tmp_path):
+    image: Path = write(tmp_path, "a.jpg", jpeg(10, 20))
+    cache = MetadataCache(tmp_path / "metadata")
+    try:
+        first: Metadata | None = read_metadata(image, cache)
+        assert first is not None and (first.width, first.height) == (10, 20)
+
+        cache.put(image, image.stat(), first._replace(width=99, camera="Kamera é"))
+        cached: Metadata | None = read_metadata(image, cache)
+        assert (cached.width, cached.camera, cached.taken) == (99, "Kamera é", None)
+
+        image.write_bytes(jpeg(30, 40) + b"\0")
+        assert read_metadata(image, cache).width == 30
+    finally:
+        cache.close()
+
+    assert read_metadata(tmp_path / "missing.jpg") is None
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from conftest import write
+from image_sorter.keybinding_actions.move import NumberAllocator, get_next_available_filename, move_file
+
+
+def test_auto_rename_numbers_the_moved_files_in_order(tmp_path):
+    sources: list[Path] = [write(tmp_path / f"in/{name}.jpg", name.encode()) for name in "abc"]
+
+    for source in sources:
+        message, level = move_file(source, str(tmp_path / "out"), auto_rename=1, copy_mode=False)
+        assert level == "success", message
+
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["1.jpg", "2.jpg", "3.jpg"]
+    assert (tmp_path / "out/2.jpg").read_bytes() == b"b"
+
+
+def test_allocator_keeps_the_suffix_and_ignores_other_names(tmp_path):
+    write(tmp_path / "1.png", b"x")
+    write(tmp_path / "2.png", b"x")
+    write(tmp_path / "holiday.png", b"x")
+    (tmp_path / "3").mkdir()  # a directory does not take a number
+
+    assert get_next_available_filename(tmp_path) == "3.png"
+
+
+def test_allocator_rescans_a_directory_changed_by_someone_else(tmp_path):
+    allocator = NumberAllocator(tmp_path)
+    assert allocator.peek() == "1.jpg"
+
+    write(tmp_path / "1.jpg", b"x")
+    write(tmp_path / "2.jpg", b"x")
+
+    assert allocator.peek() == "3.jpg"
+
+
+def test_a_failed_move_gives_the_number_back(tmp_path):
+    missing: Path = tmp_path / "in/missing.jpg"
+
+    message, level = move_file(missing, str(tmp_path / "out"), auto_rename=1, copy_mode=False)
+
+    assert level == "error"
+    assert list((tmp_path / "out").iterdir()) == []  # no empty placeholder is left behind
+    assert get_next_available_filename(tmp_path / "out") == "1.jpg"
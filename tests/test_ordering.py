@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+
+from image_sorter.ext.metadata import Metadata
+from image_sorter.ext.ordering import FileFilter, parse_size, parse_sort, sort_key
+
+
+def meta(size: int = 0, width: int = 0, height: int = 0, taken: float | None = None, camera: str = "") -> Metadata:
+    return Metadata(size, 1000.0, width, height, taken, camera)
+
+
+@pytest.mark.parametrize("expression, file_name, metadata, expected", [
+    ("ext == JPG", "a.jpg", None, True),
+    ("ext == .png", "a.jpg", None, False),
+    ("name ~ img_*", "IMG_1.jpg", None, True),
+    ("name != a.jpg", "a.jpg", None, False),
+    ("width >= 1920", "a.jpg", meta(width=1920), True),
+    ("pixels < 100", "a.jpg", meta(width=10, height=10), False),
+    ("size < 2M", "a.jpg", meta(size=2 * 1024 ** 2 - 1), True),
+    ("size >= 1.5k", "a.jpg", meta(size=1500), False),
+    ("camera ~ *pixel*", "a.jpg", meta(camera="Google Pixel 8"), True),
+    ("date >= 2024-01-01", "a.jpg", meta(taken=datetime(2024, 1, 1).timestamp()), True),
+    ("date < 2024-01-01", "a.jpg", meta(), True),  # no capture time, the modification time counts
+])
+def test_filters_match(expression, file_name, metadata, expected):
+    assert FileFilter(expression).matches(file_name, metadata) is expected
+
+
+def test_filters_on_metadata_wait_for_it():
+    file_filter = FileFilter("width > 100")
+    assert file_filter.needs_metadata
+    assert file_filter.matches("a.jpg", None) is None
+    assert not FileFilter("name ~ *.jpg").needs_metadata
+
+
+@pytest.mark.parametrize("expression", [
+    "width",
+    "width >= ",
+    "colour == red",
+    "name < b",
+    "size ~ 2M",
+    "width == wide",
+    "size < 2T",
+    "date >= yesterday",
+])
+def test_invalid_filters_are_rejected(expression):
+    with pytest.raises(ValueError):
+        FileFilter(expression)
+
+
+def test_sizes_accept_units():
+    assert parse_size("500") == 500
+    assert parse_size("2KiB") == 2048
+    assert parse_size("1.5 MB") == int(1.5 * 1024 ** 2)
+
+
+def test_sort_specs():
+    assert parse_sort("-size") == ("size", True)
+    assert parse_sort("natural") == ("natural", False)
+    with pytest.raises(ValueError):
+        parse_sort("colour")
+
+
+def test_natural_sort_orders_numbers_by_value():
+    key = sort_key("natural")
+    assert sorted(["img10.jpg", "IMG2.jpg", "img1.jpg"], key=lambda name: key(name, None)) == [
+        "img1.jpg", "IMG2.jpg", "img10.jpg"
+    ]
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_files_without_metadata_stay_at_the_end(reverse):
+    key = sort_key("size", reverse)
+    files: dict[str, Metadata | None] = {"small": meta(size=1), "pending": None, "big": meta(size=9)}
+
+    ordered: list[str] = sorted(files, key=lambda name: key(name, files[name]), reverse=reverse)
+
+    assert ordered == (["big", "small", "pending"] if reverse else ["small", "big", "pending"])
+
+
+def test_dimensions_sort_by_pixels_then_width():
+    key = sort_key("dimensions")
+    files: dict[str, Metadata] = {"tall": meta(width=10, height=40), "wide": meta(width=40, height=10), "small": meta(width=5, height=5)}
+    assert sorted(files, key=lambda name: key(name, files[name])) == ["small", "tall", "wide"]
@@ -0,0 +1,185 @@
+import queue
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import main
+from image_sorter.ext import loggers
+from image_sorter.ext.catalog import Catalog
+from image_sorter.ext.parser import configure_parser
+from image_sorter.gui.input import ReplayInput
+from image_sorter.gui.virtual_screen import virtual_curses
+from image_sorter.keybinding_actions import Journal
+
+
+@pytest.fixture
+def sorter(tmp_path, monkeypatch):
+    """Runs the interface over tmp_path/in with a key stream, the journal, logs and trash live in tmp_path"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(loggers, "DATA_DIR", tmp_path / "data")
+    monkeypatch.setattr(Journal, "open", classmethod(lambda cls, path=tmp_path / "journal.jsonl": cls(path)))
+    (tmp_path / "in").mkdir()
+
+    def run(keys: str, *options: str) -> main.ImageSorter:
+        args = configure_parser().parse_args(["-i", str(tmp_path / "in"), "--log-level", "off", *options])
+        with virtual_curses(24, 80) as stdscr:
+            app = main.ImageSorter(stdscr, args, keys=ReplayInput([ord(key) for key in keys]))
+            try:
+                app.latencies = dict(zip(keys, (seconds for _, seconds in app.replay())))
+            finally:
+                app.close()
+        return app
+
+    return run
+
+
+def listed(app: main.ImageSorter) -> list[str]:
+    return [app.index.path(pos).name for pos in range(app.num_files)]
+
+
+def scan_order(tmp_path: Path) -> list[str]:
+    return [entry.name for entry in (tmp_path / "in").iterdir()]
+
+
+def test_failed_bulk_move_restores_every_file_at_its_position(sorter, tmp_path):
+    for name in "abc":
+        (tmp_path / f"in/{name}.jpg").write_bytes(name.encode())
+    (tmp_path / "blocked").write_text("a file, so the target directory cannot be created")
+    order: list[str] = scan_order(tmp_path)
+
+    app = sorter("mjm1", "-o", str(tmp_path / "blocked/out"))  # marks the first and the last file
+
+    assert listed(app) == order
+    assert app.failed_operations == 1
+    assert app.verify_files() == ["1 operation(s) failed, see the log"]
+
+
+def test_bulk_move_removes_only_the_marked_files(sorter, tmp_path):
+    for name in "abc":
+        (tmp_path / f"in/{name}.jpg").write_bytes(name.encode())
+    order: list[str] = scan_order(tmp_path)
+
+    app = sorter("mjm1", "-o", str(tmp_path / "out"))
+
+    assert listed(app) == [order[1]]
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == sorted([order[0], order[2]])
+    assert app.verify_files() == []
+
+
+
+
+def test_bulk_move_takes_the_marked_files_and_the_visual_selection(sorter, tmp_path):
+    for name in "abcde":
+        (tmp_path / f"in/{name}.jpg").write_bytes(name.encode())
+    order: list[str] = scan_order(tmp_path)
+
+    app = sorter("mjvj1", "-o", str(tmp_path / "out"))  # marks the first file, selects the third and the fourth
+
+    assert listed(app) == [order[1], order[4]]
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == sorted([order[0], order[2], order[3]])
+
+def test_catalog_records_the_result_of_every_file_of_a_bulk_copy(sorter, tmp_path, monkeypatch):
+    monkeypatch.setattr(Catalog, "open", classmethod(lambda cls: cls(tmp_path / "catalog.sqlite3")))
+    for name in "abc":
+        (tmp_path / f"in/{name}.jpg").write_bytes(name.encode())
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out/b.jpg").write_bytes(b"b")  # b is skipped, a and c are copied
+    order: list[str] = scan_order(tmp_path)
+
+    sorter("mmm1", "-o", str(tmp_path / "out"), "-c", "--on-duplicate", "skip", "--catalog")
+
+    catalog = Catalog(tmp_path / "catalog.sqlite3")
+    try:
+        statuses: dict[str, str] = {Path(source).name: status for _, _, source, _, status in catalog.decisions(0)}
+    finally:
+        catalog.close()
+    assert statuses == {name: "failed" if name == "b.jpg" else "done" for name in order}
+
+@pytest.mark.parametrize("keys", ["1u", "1uUu", "m1uUu", "rnew\nu", "rnew\nuUu"])
+def test_undo_and_redo_right_after_an_operation(sorter, tmp_path, keys):
+    (tmp_path / "in/a.jpg").write_bytes(b"a")
+
+    for _ in range(5):  # the reversals are queued before the operations they reverse have finished
+        app = sorter(keys, "-o", str(tmp_path / "out"))
+
+        assert listed(app) == ["a.jpg"]
+        assert app.verify_files() == []
+        assert list((tmp_path / "out").glob("*")) == []
+
+
+def test_undo_reverses_an_operation_of_an_earlier_session(sorter, tmp_path):
+    for name in "abc":
+        (tmp_path / f"in/{name}.jpg").write_bytes(name.encode())
+    order: list[str] = scan_order(tmp_path)
+
+    sorter("mjm1", "-o", str(tmp_path / "out"))
+    app = sorter("u", "-o", str(tmp_path / "out"))
+
+    assert sorted(listed(app)) == sorted(order)
+    assert app.verify_files() == []
+    app = sorter("uU", "-o", str(tmp_path / "out"))
+    assert listed(app) == [order[1]]
+
+
+def test_undo_does_not_wait_for_the_operation_it_reverses(sorter, tmp_path, monkeypatch):
+    (tmp_path / "in/a.jpg").write_bytes(b"a")
+    release = threading.Event()
+    move_file = main.move_file
+
+    def slow_move(*args, **kwargs):
+        release.wait(5)
+        return move_file(*args, **kwargs)
+
+    monkeypatch.setattr(main, "move_file", slow_move)
+    timer = threading.Timer(0.5, release.set)
+    timer.start()
+    try:
+        app = sorter("1u", "-o", str(tmp_path / "out"))
+    finally:
+        timer.cancel()
+        release.set()
+
+    assert app.latencies["u"] < 0.25
+    assert listed(app) == ["a.jpg"]
+    assert app.verify_files() == []
+
+
+def test_rename_onto_a_listed_name_is_refused(sorter, tmp_path):
+    for name in "ab":
+        (tmp_path / f"in/{name}.jpg").write_bytes(name.encode())
+    first, second = scan_order(tmp_path)
+
+    app = sorter(f"r{Path(second).stem}\n", "-o", str(tmp_path / "out"))
+
+    assert sorted(listed(app)) == ["a.jpg", "b.jpg"]
+    assert (tmp_path / "in" / first).read_bytes() == first[0].encode()
+    assert (tmp_path / "in" / second).read_bytes() == second[0].encode()
+    assert app.status_message[1] == "error"
+    assert app.verify_files() == []
+
+
+def test_lost_watch_events_rescan_the_tree(sorter, tmp_path):
+    (tmp_path / "in/a.jpg").write_bytes(b"a")
+    app = sorter("", "-o", str(tmp_path / "out"))
+    (tmp_path / "in/b.jpg").write_bytes(b"b")  # its event was dropped with the overflowed queue
+
+    app.watcher = SimpleNamespace(events=queue.Queue())
+    app.watcher.events.put(("rescan", tmp_path / "in"))
+
+    assert app.apply_watch_events()
+    assert sorted(listed(app)) == ["a.jpg", "b.jpg"]
+
+
+def test_replay_does_not_undo_an_operation_of_a_real_session(sorter, tmp_path):
+    (tmp_path / "in/a.jpg").write_bytes(b"a")
+    sorter("1", "-o", str(tmp_path / "out"))
+    (tmp_path / "keys").write_text("u\n")
+
+    args = configure_parser().parse_args([
+        "-i", str(tmp_path / "in"), "-o", str(tmp_path / "out"), "--log-level", "off", "--replay", str(tmp_path / "keys")
+    ])
+    main.replay_keys(args)
+
+    assert [p.name for p in (tmp_path / "out").iterdir()] == ["a.jpg"]
@@ -0,0 +1,28 @@
+import os
+
+from image_sorter.ext.thumbnail_store import ThumbnailStore
+
+
+def test_overwriting_a_thumbnail_counts_its_bytes_once(tmp_path):
+    store = ThumbnailStore(tmp_path, max_bytes=1000)
+    assert store.size() == 0
+
+    for _ in range(5):
+        store.put("aa01", (b"x" * 100, 1, 1))
+
+    assert store.size() == 100
+    assert store.path("aa01").exists()
+
+
+def test_least_recently_used_thumbnails_are_evicted(tmp_path):
+    store = ThumbnailStore(tmp_path, max_bytes=250)
+    store.size()
+    for n, key in enumerate(("aa01", "bb02")):
+        store.put(key, (b"x" * 100, 1, 1))
+        os.utime(store.path(key), (n, n))
+
+    store.put("cc03", (b"x" * 100, 1, 1))
+
+    assert not store.path("aa01").exists()
+    assert store.path("bb02").exists() and store.path("cc03").exists()
+    assert store.size() == 200
@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pytest
+
+from image_sorter.ext import thumbnails
+from image_sorter.ext.images import PNG_SIGNATURE, Thumbnail
+from image_sorter.ext.thumbnail_store import ThumbnailStore
+from image_sorter.ext.thumbnails import Prefetcher, ThumbnailCache, thumbnail_key
+
+
+def thumb(size: int) -> Thumbnail:
+    """PNG data of `size` bytes, only the header is valid"""
+    header: bytes = PNG_SIGNATURE + b"\0\0\0\rIHDR" + (1).to_bytes(4, "big") * 2
+    return header + b"x" * (size - len(header)), 1, 1
+
+
+def test_cache_evicts_least_recently_used_entries_by_bytes():
+    cache = ThumbnailCache(max_bytes=250)
+    cache.put(("a",), thumb(100))
+    cache.put(("b",), thumb(100))
+    assert cache.get(("a",)) is not None  # b is now the least recently used
+
+    cache.put(("c",), thumb(100))
+
+    assert ("b",) not in cache
+    assert ("a",) in cache and ("c",) in cache
+    assert cache.stats() == {"hits": 1, "misses": 0, "entries": 2, "bytes": 200}
+
+
+def test_cache_replaces_an_entry_and_skips_oversized_ones():
+    cache = ThumbnailCache(max_bytes=250)
+    cache.put(("a",), thumb(100))
+    cache.put(("a",), thumb(50))
+    cache.put(("big",), thumb(300))
+
+    assert cache.size == 50
+    assert ("big",) not in cache
+    assert cache.get(("big",)) is None
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.fixture
+def decoded(monkeypatch) -> list[Path]:
+    """Files decoded by a fake encoder, Pillow is not needed"""
+    calls: list[Path] = []
+
+    def encode(file_path: Path, mirror: str = "none", max_size: tuple[int, int] | None = None) -> Thumbnail:
+        calls.append(file_path)
+        return thumb(40)
+
+    monkeypatch.setattr(thumbnails, "encode_png", encode)
+    return calls
+
+
+def test_load_decodes_once_and_writes_through_to_the_store(tmp_path, decoded):
+    image: Path = tmp_path / "a.jpg"
+    image.write_bytes(b"jpeg")
+    store = ThumbnailStore(tmp_path / "store")
+    prefetcher = Prefetcher(ThumbnailCache(), store=store)
+    try:
+        assert prefetcher.load(image, (80, 60)) == thumb(40)
+        assert prefetcher.load(image, (80, 60)) == thumb(40)
+        assert prefetcher.ready(image, (80, 60))
+    finally:
+        prefetcher.shutdown()
+
+    assert decoded == [image]
+    assert len(store.entries()) == 1
+
+
+def test_a_later_session_reads_the_store_instead_of_decoding(tmp_path, decoded):
+    image: Path = tmp_path / "a.jpg"
+    image.write_bytes(b"jpeg")
+    store = ThumbnailStore(tmp_path / "store")
+    for _ in range(2):
+        prefetcher = Prefetcher(ThumbnailCache(), store=store)
+        try:
+            prefetcher.load(image, (80, 60))
+        finally:
+            prefetcher.shutdown()
+
+    assert decoded == [image]
+
+
+def test_a_changed_file_gets_a_new_key(tmp_path):
+    image: Path = tmp_path / "a.jpg"
+    image.write_bytes(b"jpeg")
+    before: tuple | None = thumbnail_key(image, (80, 60))
+    image.write_bytes(b"a longer jpeg")
+
+    assert thumbnail_key(image, (80, 60)) != before
+    assert thumbnail_key(tmp_path / "missing.jpg", (80, 60)) is None
@@ -0,0 +1,122 @@
+import errno
+import os
+from pathlib import Path
+
+import pytest
+
+from conftest import write
+from image_sorter.keybinding_actions import transfer
+from image_sorter.keybinding_actions.transfer import COPY_METHODS, TransferStrategy, get_strategy
+
+
+def failing(code: int):
+    def copier(src_fd: int, dst_fd: int, size: int) -> None:
+        os.write(dst_fd, b"partial")  # must not survive the fallback
+        raise OSError(code, os.strerror(code))
+    return copier
+
+
+@pytest.fixture
+def copiers(monkeypatch) -> dict:
+    """COPIERS of this test, changes are undone afterwards"""
+    patched: dict = dict(transfer.COPIERS)
+    monkeypatch.setattr(transfer, "COPIERS", patched)
+    return patched
+
+
+def test_exdev_on_rename_falls_back_to_copy_and_delete(tmp_path, monkeypatch):
+    source: Path = write(tmp_path / "in/a.jpg", b"data")
+    destination: Path = tmp_path / "out/a.jpg"
+    destination.parent.mkdir()
+
+    def cross_device(src, dst):
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(transfer.os, "rename", cross_device)
+    strategy = TransferStrategy(same_device=True, copy_method="read_write")
+
+    assert strategy.move(source, destination) == "read_write"
+    assert destination.read_bytes() == b"data"
+    assert not source.exists()
+    assert not strategy.same_device  # the next move copies right away
+
+
+def test_unsupported_copy_methods_are_given_up_for_good(tmp_path, copiers):
+    copiers["reflink"] = failing(errno.EOPNOTSUPP)
+    copiers["copy_file_range"] = failing(errno.EXDEV)
+    strategy = TransferStrategy(same_device=False)
+
+    method: str = strategy.copy(write(tmp_path / "a.jpg", b"data"), tmp_path / "b.jpg")
+
+    assert method == "sendfile"
+    assert strategy.copy_method == "sendfile"
+    assert (tmp_path / "b.jpg").read_bytes() == b"data"
+
+
+
+def test_methods_the_platform_lacks_are_never_tried(tmp_path, monkeypatch):
+    monkeypatch.delattr(transfer.os, "copy_file_range", raising=False)
+    copiers: dict = transfer.available_copiers()
+    monkeypatch.setattr(transfer, "COPIERS", copiers)
+    monkeypatch.setattr(transfer, "COPY_METHODS", tuple(copiers))
+    for method in transfer.COPY_METHODS[:-1]:
+        copiers[method] = failing(errno.ENOSYS)
+    strategy = TransferStrategy(same_device=False, copy_method=transfer.COPY_METHODS[0])
+
+    method: str = strategy.copy(write(tmp_path / "a.jpg", b"data"), tmp_path / "b.jpg")
+
+    assert "copy_file_range" not in copiers
+    assert method == "read_write"
+    assert (tmp_path / "b.jpg").read_bytes() == b"data"
+
+def test_a_real_copy_error_is_raised_without_fallback(tmp_path, copiers):
+    copiers["reflink"] = failing(errno.EIO)
+    strategy = TransferStrategy(same_device=False)
+
+    with pytest.raises(OSError) as raised:
+        strategy.copy(write(tmp_path / "a.jpg", b"data"), tmp_path / "b.jpg")
+
+    assert raised.value.errno == errno.EIO
+    assert strategy.copy_method == "reflink"
+
+
+def test_the_last_method_is_not_downgraded(tmp_path, copiers):
+    copiers["read_write"] = failing(errno.EINVAL)
+    strategy = TransferStrategy(same_device=False, copy_method=COPY_METHODS[-1])
+
+    with pytest.raises(OSError):
+        strategy.copy(write(tmp_path / "a.jpg", b"data"), tmp_path / "b.jpg")
+    assert strategy.copy_method == COPY_METHODS[-1]
+
+
+def test_link_falls_back_to_a_copy(tmp_path, monkeypatch):
+    source: Path = write(tmp_path / "a.jpg", b"data")
+
+    def refused(src, dst):
+        raise OSError(errno.EPERM, os.strerror(errno.EPERM))
+
+    monkeypatch.setattr(transfer.os, "link", refused)
+    strategy = TransferStrategy(same_device=True, copy_method="read_write")
+
+    assert strategy.link(source, tmp_path / "b.jpg") == "read_write"
+    assert (tmp_path / "b.jpg").read_bytes() == b"data"
+    assert list(tmp_path.glob(".tmp-*")) == []
+
+
+def test_link_on_the_same_device_shares_the_inode(tmp_path):
+    source: Path = write(tmp_path / "a.jpg", b"data")
+    placeholder: Path = write(tmp_path / "1.jpg", b"")  # claimed by the --auto-rename allocator
+
+    assert TransferStrategy(same_device=True).link(source, placeholder) == "link"
+    assert placeholder.stat().st_ino == source.stat().st_ino
+
+
+def test_strategies_are_shared_per_target_directory(tmp_path):
+    write(tmp_path / "in/a.jpg", b"a")
+    (tmp_path / "out").mkdir()
+
+    strategy: TransferStrategy = get_strategy(tmp_path / "in/a.jpg", tmp_path / "out")
+
+    assert strategy.same_device
+    assert get_strategy(tmp_path / "in/b.jpg", tmp_path / "out") is strategy
+    assert get_strategy(tmp_path / "in/a.jpg", tmp_path / "in") is not strategy
@@ -0,0 +1,111 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from image_sorter.ext import watcher
+from image_sorter.ext.watcher import (
+    EVENT_HEADER,
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_IGNORED,
+    IN_ISDIR,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+    DirectoryWatcher,
+)
+
+
+pytestmark = pytest.mark.skipif(not watcher.inotify_available(), reason="inotify is not available")
+
+
+def event(wd: int, mask: int, name: str = "") -> bytes:
+    encoded: bytes = os.fsencode(name)
+    padded: bytes = encoded + b"\0" * (16 - len(encoded) % 16) if encoded else b""
+    return EVENT_HEADER.pack(wd, mask, 0, len(padded)) + padded
+
+
+def wd_of(w: DirectoryWatcher, directory: Path) -> int:
+    return next(wd for wd, (watched, _) in w._watches.items() if watched == directory)
+
+
+def drain(w: DirectoryWatcher) -> list[tuple[str, Path]]:
+    events: list[tuple[str, Path]] = []
+    while not w.events.empty():
+        events.append(w.events.get_nowait())
+    return events
+
+
+@pytest.fixture
+def make_watcher(tmp_path):
+    watchers: list[DirectoryWatcher] = []
+
+    def make(depth: int = 0) -> DirectoryWatcher:
+        w = DirectoryWatcher(str(tmp_path), depth)
+        watchers.append(w)
+        return w
+
+    yield make
+    for w in watchers:
+        os.close(w._fd)
+        os.close(w._stop_read)
+        os.close(w._stop_write)
+
+
+def test_file_events_map_to_created_and_deleted(make_watcher, tmp_path):
+    w = make_watcher()
+    root: int = wd_of(w, tmp_path)
+
+    w.parse_events(
+        event(root, IN_CLOSE_WRITE, "a.jpg")
+        + event(root, IN_MOVED_TO, "b.jpg")
+        + event(root, IN_CREATE, "partial.jpg")  # listed once it is written and closed
+        + event(root, IN_DELETE, "c.jpg")
+        + event(root, IN_MOVED_FROM, "d.jpg")
+    )
+
+    assert drain(w) == [
+        ("created", tmp_path / "a.jpg"),
+        ("created", tmp_path / "b.jpg"),
+        ("deleted", tmp_path / "c.jpg"),
+        ("deleted", tmp_path / "d.jpg"),
+    ]
+
+
+def test_directories_are_followed_down_to_the_depth(make_watcher, tmp_path):
+    w = make_watcher(depth=1)
+    root: int = wd_of(w, tmp_path)
+    (tmp_path / "sub/deeper").mkdir(parents=True)
+
+    w.parse_events(event(root, IN_CREATE | IN_ISDIR, "sub"))
+    assert drain(w) == [("created_dir", tmp_path / "sub")]
+
+    sub: int = wd_of(w, tmp_path / "sub")
+    w.parse_events(event(sub, IN_CREATE | IN_ISDIR, "deeper") + event(sub, IN_CLOSE_WRITE, "a.jpg"))
+    assert drain(w) == [("created", tmp_path / "sub/a.jpg")]  # deeper is below the depth
+    assert tmp_path / "sub/deeper" not in {watched for watched, _ in w._watches.values()}
+
+    w.parse_events(event(root, IN_MOVED_FROM | IN_ISDIR, "sub"))
+    assert drain(w) == [("deleted_dir", tmp_path / "sub")]
+    assert list(w._watches) == [root]
+
+
+def test_events_of_removed_watches_are_ignored(make_watcher, tmp_path):
+    w = make_watcher()
+    root: int = wd_of(w, tmp_path)
+
+    w.parse_events(event(root, IN_IGNORED) + event(root, IN_CLOSE_WRITE, "a.jpg"))
+
+    assert drain(w) == []
+
+
+def test_queue_overflow_asks_for_a_rescan_and_watches_new_directories(make_watcher, tmp_path):
+    w = make_watcher(depth=1)
+    (tmp_path / "sub").mkdir()  # created while the events were lost
+
+    w.parse_events(event(-1, IN_Q_OVERFLOW))
+
+    assert drain(w) == [("rescan", tmp_path)]
+    assert tmp_path / "sub" in {watched for watched, _ in w._watches.values()}